@@ -1,4 +1,4 @@
-from .core.weather_system import WeatherSystem, WeatherData
+from .core.weather_system import WeatherSystem, WeatherData, WeatherSeries
 
 __version__ = "1.0.0"
-__all__ = ['WeatherSystem', 'WeatherData']
+__all__ = ['WeatherSystem', 'WeatherData', 'WeatherSeries']
@@ -1,3 +1,3 @@
-from .weather_system import WeatherSystem, WeatherData
+from .weather_system import WeatherSystem, WeatherData, WeatherSeries
 
-__all__ = ['WeatherSystem', 'WeatherData']
+__all__ = ['WeatherSystem', 'WeatherData', 'WeatherSeries']
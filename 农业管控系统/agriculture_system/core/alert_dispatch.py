@@ -0,0 +1,347 @@
+# agriculture_system/core/alert_dispatch.py
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+
+from .alert_system import AlertControl, TokenBucket
+from ..utils.time_utils import now_ms
+
+
+class AlertSink:
+    """报警通知目的地
+
+    deliver() 在该目的地自己的分发线程中按批调用，抛出异常时整批重试。
+    records_all 为 True 的目的地（日志、数据库）接收全部触发/解除事件且不限速，
+    其余只接收需要通知的新报警，并受 alert_control.rate_limits 中按名称配置的令牌桶限速；
+    receives_resolved 为 True 时另外接收全部解除事件（不限速）。
+    """
+
+    name = 'sink'
+    records_all = False
+    receives_resolved = False
+
+    def deliver(self, events: List[Dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LogSink(AlertSink):
+    """写入日志"""
+
+    name = 'log'
+    records_all = True
+
+    LEVELS = {'info': logging.INFO, 'warning': logging.WARNING, 'critical': logging.CRITICAL}
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('agriculture_system.alerts')
+
+    def deliver(self, events: List[Dict]):
+        for event in events:
+            if event['event'] == 'resolved':
+                self.logger.info(f"报警解除 [{event['channel']}] {event['rule']}")
+            else:
+                self.logger.log(self.LEVELS.get(event['severity'], logging.WARNING),
+                                f"[{event['channel']}] {event['message']}")
+
+
+class SQLiteSink(AlertSink):
+    """写入 alert_records：触发插入未解除的记录，解除按报警键标记 resolved"""
+
+    name = 'sqlite'
+    records_all = True
+
+    def __init__(self, database):
+        self.database = database
+
+    def deliver(self, events: List[Dict]):
+        self.database.save_alert_events([
+            ('raise', event['epoch_ms'], event['key'], event['rule'],
+             event['severity'], event['message'])
+            if event['event'] == 'raised' else
+            ('resolve', event['epoch_ms'], event['key'])
+            for event in events
+        ])
+
+
+class WebhookSink(AlertSink):
+    """以 JSON {"alerts": [...]} 批量 POST 到 webhook，复用 keep-alive 连接"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 5.0, name: str = 'webhook',
+                 session: Optional[requests.Session] = None):
+        self.url = url
+        self.timeout = timeout
+        self.name = name
+        self.session = session or requests.Session()
+
+    def deliver(self, events: List[Dict]):
+        response = self.session.post(self.url, json={'alerts': events}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class SSESink(AlertSink):
+    """Server-Sent Events 扇出：每个订阅的客户端一个有界队列
+
+    推送需要通知的新报警与全部解除事件，客户端可据此更新当前报警列表。
+    慢客户端的队列满时丢弃其最早的事件，不影响其他客户端与分发线程。
+    """
+
+    name = 'sse'
+    receives_resolved = True
+
+    def __init__(self, client_queue: int = 100, max_clients: int = 100):
+        self.client_queue = client_queue
+        self.max_clients = max_clients
+        self._clients: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    @property
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def subscribe(self) -> queue.Queue:
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                raise RuntimeError("报警订阅客户端已达上限")
+            client = queue.Queue(self.client_queue)
+            self._clients.append(client)
+        return client
+
+    def unsubscribe(self, client: queue.Queue):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def deliver(self, events: List[Dict]):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            for event in events:
+                while True:
+                    try:
+                        client.put_nowait(event)
+                        break
+                    except queue.Full:
+                        try:
+                            client.get_nowait()
+                        except queue.Empty:
+                            pass
+
+    def stream(self, client: queue.Queue, heartbeat: float = 15.0) -> Iterator[str]:
+        """按 SSE 格式产出客户端的事件，空闲时发送注释行保持连接；结束时自动退订"""
+        try:
+            while True:
+                try:
+                    event = client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield self.format_event(event)
+        finally:
+            self.unsubscribe(client)
+
+    @staticmethod
+    def format_event(event: Dict) -> str:
+        data = json.dumps(event, ensure_ascii=False, default=str)
+        return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+class _SinkWorker:
+    """单个目的地的有界队列与批量分发线程"""
+
+    def __init__(self, sink: AlertSink, max_queue: int, batch_size: int,
+                 batch_interval: float, max_retries: int, retry_backoff: float):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.bucket: Optional[TokenBucket] = None
+
+        self._queue = deque()
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._stats = {'enqueued': 0, 'delivered': 0, 'batches': 0, 'dropped': 0,
+                       'rate_limited': 0, 'errors': 0, 'failed': 0}
+        self.last_error: Optional[Exception] = None
+
+        self._thread = threading.Thread(target=self._run, name=f'alert-{sink.name}', daemon=True)
+        self._thread.start()
+
+    def offer(self, events: Sequence[Dict]):
+        """放入队列，不阻塞；队列满时丢弃最早的事件"""
+        with self._cond:
+            for event in events:
+                if len(self._queue) >= self.max_queue:
+                    self._queue.popleft()
+                    self._stats['dropped'] += 1
+                self._queue.append(event)
+            self._stats['enqueued'] += len(events)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        self.flush(timeout)
+        self._closed.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.sink.close()
+
+    def count(self, name: str, value: int = 1):
+        with self._cond:
+            self._stats[name] += value
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed.is_set():
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # 攒批：等到 batch_size 条或 batch_interval 秒
+                deadline = time.monotonic() + self.batch_interval
+                while len(self._queue) < self.batch_size and not self._closed.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._inflight = len(batch)
+
+            delivered = self._deliver(batch)
+            with self._cond:
+                self._inflight = 0
+                self._stats['delivered' if delivered else 'failed'] += len(batch)
+                self._stats['batches'] += 1
+                self._cond.notify_all()
+
+    def _deliver(self, batch: List[Dict]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.deliver(batch)
+                return True
+            except Exception as e:
+                self.last_error = e
+                self.count('errors')
+                if attempt < self.max_retries and self._closed.wait(self.retry_backoff * 2 ** attempt):
+                    break
+        return False
+
+
+class AlertDispatcher:
+    """异步报警分发
+
+    报警评估只调用 submit() 把事件放入各目的地的有界队列，立即返回；
+    每个目的地一个分发线程攒批后调用 deliver()，失败按指数退避重试，
+    慢速的 webhook 不会拖慢日志、数据库或 SSE。队列满时丢弃最早的事件。
+    """
+
+    def __init__(self, sinks: Sequence[AlertSink] = (), control: Optional[AlertControl] = None,
+                 max_queue: int = 1000, batch_size: int = 50, batch_interval: float = 0.5,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        self.control = control or AlertControl.from_config(None)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._workers: Dict[str, _SinkWorker] = {}
+        for sink in sinks:
+            self.add_sink(sink)
+
+    @property
+    def sinks(self) -> List[AlertSink]:
+        return [worker.sink for worker in self._workers.values()]
+
+    def sink(self, name: str) -> AlertSink:
+        return self._workers[name].sink
+
+    def add_sink(self, sink: AlertSink):
+        if sink.name in self._workers:
+            raise ValueError(f"报警目的地名称重复: {sink.name}")
+        worker = _SinkWorker(sink, self.max_queue, self.batch_size, self.batch_interval,
+                             self.max_retries, self.retry_backoff)
+        self._workers[sink.name] = worker
+        self._configure_worker(worker)
+
+    def configure(self, control: AlertControl):
+        """规则重新加载后更新各目的地的令牌桶"""
+        self.control = control
+        for worker in self._workers.values():
+            self._configure_worker(worker)
+
+    def submit(self, events: Sequence[Dict]):
+        """提交一批触发/解除事件，不阻塞"""
+        if not events:
+            return
+        notifications = [e for e in events if e['event'] == 'raised' and e['notify']]
+        reference = now_ms()
+        for worker in self._workers.values():
+            if worker.sink.records_all:
+                worker.offer(events)
+                continue
+            allowed = notifications
+            if worker.bucket is not None:
+                allowed = [e for e in notifications if worker.bucket.try_acquire(reference)]
+                if len(allowed) < len(notifications):
+                    worker.count('rate_limited', len(notifications) - len(allowed))
+            if worker.sink.receives_resolved:
+                # 保持事件的原始顺序
+                passed = {id(e) for e in allowed}
+                allowed = [e for e in events if id(e) in passed or e['event'] == 'resolved']
+            if allowed:
+                worker.offer(allowed)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的事件分发完毕（含重试），超时返回 False"""
+        return all(worker.flush(timeout) for worker in self._workers.values())
+
+    def close(self, timeout: Optional[float] = None):
+        for worker in self._workers.values():
+            worker.close(timeout)
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {name: worker.metrics() for name, worker in self._workers.items()}
+
+    def _configure_worker(self, worker: _SinkWorker):
+        if worker.sink.records_all:
+            return
+        limit = self.control.rate_limit(worker.sink.name)
+        if limit is None:
+            worker.bucket = None
+        elif worker.bucket is None:
+            worker.bucket = TokenBucket(*limit)
+        else:
+            worker.bucket.configure(*limit)
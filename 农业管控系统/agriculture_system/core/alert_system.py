@@ -1,2 +1,574 @@
+# agriculture_system/core/alert_system.py
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..utils.config_loader import DEFAULT_CONFIG_PATH, ConfigLoader
+from ..utils.time_utils import TimestampLike, from_epoch_ms, now_ms, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ('info', 'warning', 'critical')
+
+# 每条 (通道, 规则) 的状态数组：条件开始满足的时间、开始触发的时间、
+# 上次通知的时间（0 表示无），以及是否处于触发状态
+_RULE_STATE = {
+    'since': np.int64,
+    'fired_at': np.int64,
+    'notified': np.int64,
+    'firing': bool,
+}
+
+# 阈值规则默认报警信息中使用的指标名称与单位
+METRIC_LABELS = {
+    'temperature': ('温度', '°C'),
+    'humidity': ('湿度', '%'),
+    'soil_humidity': ('土壤湿度', '%'),
+}
+
+# 比较运算统一表示为区间 (下限, 含下限, 上限, 含上限)
+_OPERATORS = {
+    '>': lambda v: (v, False, np.inf, False),
+    '>=': lambda v: (v, True, np.inf, False),
+    '<': lambda v: (-np.inf, False, v, False),
+    '<=': lambda v: (-np.inf, False, v, True),
+    '==': lambda v: (v, True, v, True),
+    'between': lambda v: (v[0], True, v[1], True),
+}
+
+
+@dataclass
+class AlertControl:
+    """报警风暴控制参数（配置段 alert_control）
+
+    hysteresis 为各指标的回差：规则触发后，条件的区间向外放宽该值，
+    读数回到放宽后的区间之外才解除；min_hold_ms 为触发后的最短保持时间；
+    同一 (规则, 通道) 在 dedup_ms 内重复触发只记录、不再通知；
+    rate_limits 为各通知目的地（AlertDispatcher 中的 sink 名称）的令牌桶参数
+    {名称: (每分钟条数, 突发条数)}，未单独配置的目的地使用 'default'。
+    """
+    hysteresis: Dict[str, float]
+    min_hold_ms: int = 0
+    dedup_ms: int = 0
+    rate_limits: Dict[str, Tuple[float, int]] = None
+
+    @classmethod
+    def from_config(cls, spec: Optional[Dict]) -> 'AlertControl':
+        spec = spec or {}
+        rate_limits = {
+            name: (float(limit['per_minute']), int(limit.get('burst', limit['per_minute'])))
+            for name, limit in spec.get('rate_limits', {}).items()
+        }
+        return cls(
+            hysteresis=dict(spec.get('hysteresis', {})),
+            min_hold_ms=int(spec.get('min_hold_minutes', 0) * 60_000),
+            dedup_ms=int(spec.get('dedup_minutes', 0) * 60_000),
+            rate_limits=rate_limits,
+        )
+
+    def rate_limit(self, destination: str) -> Optional[Tuple[float, int]]:
+        return self.rate_limits.get(destination, self.rate_limits.get('default'))
+
+
+class TokenBucket:
+    """令牌桶：平均每分钟 per_minute 个令牌，最多累积 burst 个"""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.tokens = float(burst)
+        self.updated: Optional[int] = None
+        self.configure(per_minute, burst)
+
+    def configure(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60_000.0
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+
+    def try_acquire(self, now: int) -> bool:
+        """now 为 epoch毫秒；有令牌时取走一个并返回 True"""
+        if self.updated is not None and now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now if self.updated is None else max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+@dataclass
+class Condition:
+    """单个指标的区间条件，hysteresis 为触发后放宽的回差"""
+    metric: str
+    low: float
+    low_inclusive: bool
+    high: float
+    high_inclusive: bool
+    hysteresis: float = 0.0
+
+    @classmethod
+    def from_config(cls, spec: Dict, hysteresis: Optional[Dict[str, float]] = None) -> 'Condition':
+        """{"metric": "humidity", "op": ">", "value": 85} 或
+        {"metric": "temperature", "between": [20, 30]}；
+        可带 "hysteresis"，否则使用 alert_control 中该指标的回差"""
+        if 'metric' not in spec:
+            raise ValueError(f"报警条件缺少 metric: {spec}")
+        if 'between' in spec:
+            op, value = 'between', spec['between']
+        else:
+            op, value = spec.get('op', '>'), spec.get('value')
+        if op not in _OPERATORS:
+            raise ValueError(f"不支持的比较运算: {op}")
+        if value is None or (op == 'between' and len(value) != 2):
+            raise ValueError(f"报警条件缺少比较值: {spec}")
+        band = spec.get('hysteresis', (hysteresis or {}).get(spec['metric'], 0.0))
+        return cls(spec['metric'], *_OPERATORS[op](value), hysteresis=float(band))
+
+
+@dataclass
+class AlertRule:
+    """报警规则：条件全部（all）或任一（any）满足，并持续 for_ms 毫秒后触发
+
+    触发后至少保持 min_hold_ms 毫秒；解除后 dedup_ms 内再次触发不重复通知。
+    """
+    name: str
+    conditions: List[Condition]
+    mode: str = 'all'
+    for_ms: int = 0
+    severity: str = 'warning'
+    message: str = ''
+    min_hold_ms: int = 0
+    dedup_ms: int = 0
+
+    @classmethod
+    def from_config(cls, spec: Dict, control: Optional[AlertControl] = None) -> 'AlertRule':
+        control = control or AlertControl.from_config(None)
+        mode = 'any' if 'any' in spec else 'all'
+        conditions = [Condition.from_config(c, control.hysteresis) for c in spec.get(mode, [])]
+        if not spec.get('name') or not conditions:
+            raise ValueError(f"报警规则须包含 name 与 all/any 条件: {spec}")
+        severity = spec.get('severity', 'warning')
+        if severity not in SEVERITIES:
+            raise ValueError(f"未知的报警级别: {severity}")
+        for_ms = int(spec.get('for_hours', 0) * 3_600_000 + spec.get('for_minutes', 0) * 60_000)
+        min_hold_ms = int(spec['min_hold_minutes'] * 60_000) if 'min_hold_minutes' in spec \
+            else control.min_hold_ms
+        dedup_ms = int(spec['dedup_minutes'] * 60_000) if 'dedup_minutes' in spec \
+            else control.dedup_ms
+        return cls(spec['name'], conditions, mode, for_ms, severity,
+                   spec.get('message', spec['name']), min_hold_ms, dedup_ms)
+
+
+def threshold_rules(thresholds: Dict[str, float],
+                    control: Optional[AlertControl] = None) -> List[AlertRule]:
+    """alert_thresholds 中的 {metric}_high / {metric}_low 转换为单条件规则"""
+    control = control or AlertControl.from_config(None)
+    rules = []
+    for key, value in thresholds.items():
+        metric, _, side = key.rpartition('_')
+        if side not in ('high', 'low') or not metric:
+            continue
+        label, unit = METRIC_LABELS.get(metric, (metric, ''))
+        op, word = ('>', '过高') if side == 'high' else ('<', '过低')
+        condition = {'metric': metric, 'op': op, 'value': value}
+        rules.append(AlertRule(
+            name=key,
+            conditions=[Condition.from_config(condition, control.hysteresis)],
+            message=f"{label}{word}！当前{label}: {{{metric}:.1f}}{unit}（阈值 {value}）",
+            min_hold_ms=control.min_hold_ms,
+            dedup_ms=control.dedup_ms,
+        ))
+    return rules
+
+
+class CompiledRules:
+    """编译后的规则集
+
+    所有规则的条件展开为 K 个区间条件，保存为按条件排列的数组；
+    规则与条件的对应关系是 K×R 的关联矩阵。评估时一次取出所有通道
+    相关指标的 (C, K) 矩阵做区间比较，再乘关联矩阵得到每条规则满足的
+    条件数，与所需条件数比较即为 (C, R) 的规则结果。
+    已触发的 (通道, 规则) 使用按回差放宽后的区间，避免读数在阈值附近
+    来回穿越时反复触发。
+    """
+
+    def __init__(self, rules: Sequence[AlertRule], metric_index: Dict[str, int]):
+        self.rules = list(rules)
+        conditions = [(r, c) for r, rule in enumerate(self.rules) for c in rule.conditions]
+        self.columns = np.array([metric_index[c.metric] for _, c in conditions], dtype=np.intp)
+        self.low = np.array([c.low for _, c in conditions], dtype=np.float64)
+        self.high = np.array([c.high for _, c in conditions], dtype=np.float64)
+        self.low_inclusive = np.array([c.low_inclusive for _, c in conditions], dtype=bool)
+        self.high_inclusive = np.array([c.high_inclusive for _, c in conditions], dtype=bool)
+        band = np.array([c.hysteresis for _, c in conditions], dtype=np.float64)
+        self.relaxed_low = self.low - band
+        self.relaxed_high = self.high + band
+        self.incidence = np.zeros((len(conditions), len(self.rules)), dtype=np.int32)
+        self.incidence[np.arange(len(conditions)), [r for r, _ in conditions]] = 1
+        self.required = np.array(
+            [len(rule.conditions) if rule.mode == 'all' else 1 for rule in self.rules],
+            dtype=np.int32)
+        self.for_ms = np.array([rule.for_ms for rule in self.rules], dtype=np.int64)
+        self.min_hold_ms = np.array([rule.min_hold_ms for rule in self.rules], dtype=np.int64)
+        self.dedup_ms = np.array([rule.dedup_ms for rule in self.rules], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate(self, values: np.ndarray, firing: Optional[np.ndarray] = None) -> np.ndarray:
+        """values 为 (通道, 指标) 矩阵，返回 (通道, 规则) 的布尔矩阵；NaN 不满足任何条件
+
+        firing 为 (通道, 规则) 的当前触发状态，已触发的使用放宽后的区间。
+        """
+        v = values[:, self.columns]
+        matched = self._match(v, self.low, self.high)
+        if firing is not None and firing.any():
+            matched = np.where(firing, self._match(v, self.relaxed_low, self.relaxed_high), matched)
+        return matched
+
+    def _match(self, v: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid='ignore'):
+            ok = ((v > low) | (self.low_inclusive & (v == low))) \
+                & ((v < high) | (self.high_inclusive & (v == high)))
+        return ok.astype(np.int32) @ self.incidence >= self.required
+
+
+class RecentAlerts:
+    """最近报警的定长环形缓冲区，按级别与通道建立索引
+
+    capacity 个槽位循环覆盖；级别/通道索引保存报警的序号，覆盖最早的
+    报警时从其所在索引的队首移除，已没有报警的通道从索引中删除，
+    内存只与 capacity 有关。Web 线程读取与评估线程写入用锁互斥。
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于0")
+        self.capacity = capacity
+        self._slots: List[Optional[Dict]] = [None] * capacity
+        self._next = 0
+        self._by_severity: Dict[str, deque] = {}
+        self._by_channel: Dict[Hashable, deque] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._next, self.capacity)
+
+    def append(self, alert: Dict):
+        with self._lock:
+            seq = self._next
+            slot = seq % self.capacity
+            old = self._slots[slot]
+            if old is not None:
+                self._unindex(self._by_severity, old['severity'])
+                self._unindex(self._by_channel, old['channel'])
+            self._slots[slot] = alert
+            self._by_severity.setdefault(alert['severity'], deque()).append(seq)
+            self._by_channel.setdefault(alert['channel'], deque()).append(seq)
+            self._next = seq + 1
+
+    def latest(self, limit: Optional[int] = None, severity: Optional[str] = None,
+               channel: Optional[Hashable] = None) -> List[Dict]:
+        """最近 limit 条（按时间升序）报警，可按级别和/或通道筛选"""
+        with self._lock:
+            if severity is None and channel is None:
+                count = len(self) if limit is None else min(limit, len(self))
+                seqs = range(self._next - count, self._next)
+            else:
+                # 从较短的索引出发，逐条核对另一个条件
+                candidates = [index.get(key, ()) for index, key in
+                              ((self._by_severity, severity), (self._by_channel, channel))
+                              if key is not None]
+                seqs = []
+                for seq in reversed(min(candidates, key=len)):
+                    alert = self._slots[seq % self.capacity]
+                    if (severity is None or alert['severity'] == severity) \
+                            and (channel is None or alert['channel'] == channel):
+                        seqs.append(seq)
+                        if limit is not None and len(seqs) >= limit:
+                            break
+                seqs.reverse()
+            return [self._slots[seq % self.capacity] for seq in seqs]
+
+    def counts(self) -> Dict[str, int]:
+        """缓冲区内各级别的报警数"""
+        with self._lock:
+            return {severity: len(seqs) for severity, seqs in self._by_severity.items()}
+
+    @staticmethod
+    def _unindex(index: Dict, key):
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+
 class AlertSystem:
-    pass
\ No newline at end of file
+    """报警系统：由 alert_thresholds 与 alert_rules 配置驱动的向量化规则引擎
+
+    各通道（如温室分区、探头）的最新指标值保存在 (通道, 指标) 矩阵中，
+    evaluate() 一次评估所有通道的所有规则；带 for_hours 的规则需要条件
+    持续满足才触发。规则可随时通过 load_rules()/reload() 替换，
+    同名规则的持续时间与触发状态会保留。
+
+    alert_control 配置的回差、最短保持时间与去重窗口抑制报警风暴：
+    状态只按 (通道, 规则) 保存在定长数组中，最近的报警保存在
+    max_alerts 条的环形缓冲区 recent 中，读数再频繁地穿越阈值内存也不会增长。
+    传入 dispatcher（AlertDispatcher）时触发/解除事件交给它异步分发到
+    日志、数据库、webhook 等目的地，评估本身不等待任何投递。
+    """
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None,
+                 rules: Sequence[Dict] = (), max_alerts: int = 1000,
+                 max_age: Optional[float] = None, config_path: Optional[str] = None,
+                 control: Optional[Dict] = None, dispatcher=None):
+        # 超过 max_age 秒未更新的指标视为缺失，不满足任何条件
+        self.max_age_ms = None if max_age is None else int(max_age * 1000)
+        self.config_path = config_path
+        self.dispatcher = dispatcher
+        self.recent = RecentAlerts(max_alerts)
+        self.counters = {'raised': 0, 'resolved': 0, 'deduplicated': 0}
+        # 最近一次自动重新加载失败的原因，成功加载后清空
+        self.last_reload_error: Optional[Exception] = None
+        self._config_mtimes: Tuple = ()
+        self._channel_index: Dict[Hashable, int] = {}
+        self._channels: List[Hashable] = []
+        self._metric_index: Dict[str, int] = {}
+        self._values = np.full((16, 0), np.nan)
+        self._updated = np.zeros((16, 0), dtype=np.int64)
+        self._compiled = CompiledRules([], {})
+        self._state = {name: np.zeros((16, 0), dtype=dtype) for name, dtype in _RULE_STATE.items()}
+        self.control = AlertControl.from_config(control)
+        self.load_rules(thresholds or {}, rules, control)
+
+    @classmethod
+    def from_config(cls, config: Dict, config_path: Optional[str] = None,
+                    dispatcher=None) -> 'AlertSystem':
+        system = cls(config.get('alert_thresholds', {}), config.get('alert_rules', []),
+                     max_alerts=config.get('alert_dispatch', {}).get('recent_alerts', 1000),
+                     max_age=config.get('alert_max_age'), config_path=config_path,
+                     control=config.get('alert_control'), dispatcher=dispatcher)
+        system._config_mtimes = system._read_mtimes()
+        return system
+
+    @property
+    def alerts(self) -> List[Dict]:
+        """环形缓冲区中的全部报警（按时间升序）"""
+        return self.recent.latest()
+
+    @property
+    def rules(self) -> List[AlertRule]:
+        return list(self._compiled.rules)
+
+    @property
+    def channels(self) -> List[Hashable]:
+        return list(self._channels)
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(self._metric_index)
+
+    def load_rules(self, thresholds: Dict[str, float], rules: Sequence[Dict] = (),
+                   control: Optional[Dict] = None):
+        """编译并替换规则集；配置有误时抛出 ValueError，原规则保持不变
+
+        control 为 alert_control 配置段，省略时沿用当前的风暴控制参数。
+        """
+        alert_control = self.control if control is None else AlertControl.from_config(control)
+        compiled_rules = threshold_rules(thresholds, alert_control) + [
+            AlertRule.from_config(r, alert_control) for r in rules
+        ]
+        names = [rule.name for rule in compiled_rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"报警规则名称重复: {names}")
+        for rule in compiled_rules:
+            for condition in rule.conditions:
+                self._add_metric(condition.metric)
+
+        compiled = CompiledRules(compiled_rules, self._metric_index)
+        # 同名规则沿用原来的持续时间、触发与通知状态
+        old = {rule.name: i for i, rule in enumerate(self._compiled.rules)}
+        rows = self._values.shape[0]
+        state = {}
+        for name, dtype in _RULE_STATE.items():
+            state[name] = np.zeros((rows, len(compiled)), dtype=dtype)
+            for r, rule_name in enumerate(names):
+                if rule_name in old:
+                    state[name][:, r] = self._state[name][:, old[rule_name]]
+        self._compiled, self._state, self.control = compiled, state, alert_control
+        if self.dispatcher is not None:
+            self.dispatcher.configure(alert_control)
+
+    def reload(self) -> bool:
+        """重新读取配置文件并替换规则，无需重启系统"""
+        config = ConfigLoader.load_config(self.config_path)
+        self.load_rules(config.get('alert_thresholds', {}), config.get('alert_rules', []),
+                        config.get('alert_control', {}))
+        self._config_mtimes = self._read_mtimes()
+        self.last_reload_error = None
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """配置文件的修改时间变化时重新加载规则
+
+        文件无法解析或规则有误（如编辑器保存到一半）时记录日志并保留原规则，
+        同时记下这次的修改时间，文件再次修改前不再重试。
+        """
+        mtimes = self._read_mtimes()
+        if mtimes == self._config_mtimes:
+            return False
+        try:
+            return self.reload()
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            logger.warning(f"报警规则重新加载失败，继续使用原规则: {e}")
+            self.last_reload_error = e
+            self._config_mtimes = mtimes
+            return False
+
+    def update(self, channel: Hashable, metrics: Dict[str, float],
+               timestamp: TimestampLike = None):
+        """写入一个通道的若干指标的最新值"""
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        row = self._add_channels([channel])[0]
+        for metric, value in metrics.items():
+            column = self._add_metric(metric)
+            self._values[row, column] = np.nan if value is None else value
+            self._updated[row, column] = ts
+
+    def update_many(self, channels: Sequence[Hashable], metric: str, values: Sequence[float],
+                    timestamps: Union[TimestampLike, Sequence[int]] = None):
+        """同一指标在多个通道上的最新值（如一次多探头轮询的结果）
+
+        timestamps 可以是共用的时间（省略时为当前时间），也可以是与
+        channels 等长的 epoch毫秒数组。
+        """
+        rows = self._add_channels(channels)
+        column = self._add_metric(metric)
+        self._values[rows, column] = values
+        if isinstance(timestamps, (np.ndarray, list, tuple)):
+            self._updated[rows, column] = timestamps
+        else:
+            self._updated[rows, column] = now_ms() if timestamps is None else to_epoch_ms(timestamps)
+
+    def evaluate(self, now: TimestampLike = None) -> List[Dict]:
+        """评估所有通道的所有规则，返回本次新触发且需要通知的报警
+
+        去重窗口内的重复触发与解除照常交给分发器记录，但不返回、不通知。
+        """
+        reference = now_ms() if now is None else to_epoch_ms(now)
+        n = len(self._channels)
+        if not n or not len(self._compiled):
+            return []
+
+        values = self._values[:n]
+        if self.max_age_ms is not None:
+            values = np.where(reference - self._updated[:n] > self.max_age_ms, np.nan, values)
+        rules = self._compiled
+        since, fired_at, notified, firing = (
+            self._state[name][:n] for name in ('since', 'fired_at', 'notified', 'firing')
+        )
+        matched = rules.evaluate(values, firing)
+
+        since[:] = np.where(matched, np.where(since == 0, reference, since), 0)
+        started = matched & ~firing & (reference - since >= rules.for_ms)
+        stopped = firing & ~matched & (reference - fired_at >= rules.min_hold_ms)
+        firing[:] = (firing | started) & ~stopped
+        fired_at[:] = np.where(started, reference, fired_at)
+
+        # 去重：同一 (通道, 规则) 距上次通知不足 dedup_ms 时不再通知
+        notify = started & ((notified == 0) | (reference - notified >= rules.dedup_ms))
+        notified[:] = np.where(notify, reference, notified)
+
+        started_pairs = list(zip(*np.nonzero(started)))
+        stopped_pairs = list(zip(*np.nonzero(stopped)))
+        self.counters['raised'] += len(started_pairs)
+        self.counters['resolved'] += len(stopped_pairs)
+        self.counters['deduplicated'] += len(started_pairs) - int(notify.sum())
+
+        alerts, events = [], []
+        for c, r in started_pairs:
+            alert = self._make_alert(c, r, reference)
+            if notify[c, r]:
+                alerts.append(alert)
+                self.recent.append(alert)
+            events.append(self._event(alert, 'raised', c, r, reference, bool(notify[c, r])))
+        for c, r in stopped_pairs:
+            events.append(self._event(self._make_alert(c, r, reference), 'resolved',
+                                      c, r, reference, False))
+        if self.dispatcher is not None and events:
+            self.dispatcher.submit(events)
+        return alerts
+
+    def active_alerts(self) -> List[Dict]:
+        """当前处于触发状态的 (通道, 规则)"""
+        n = len(self._channels)
+        fired_at = self._state['fired_at']
+        return [
+            self._make_alert(c, r, int(fired_at[c, r]))
+            for c, r in zip(*np.nonzero(self._state['firing'][:n]))
+        ]
+
+    def _event(self, alert: Dict, kind: str, row: int, rule_index: int,
+               reference: int, notify: bool) -> Dict:
+        """分发器事件：报警内容加上事件类型、报警键（规则:通道）与 epoch毫秒"""
+        return dict(alert, event=kind, notify=notify, epoch_ms=reference,
+                    key=f"{self._compiled.rules[rule_index].name}:{self._channels[row]}")
+
+    def _make_alert(self, row: int, rule_index: int, timestamp: int) -> Dict:
+        rule = self._compiled.rules[rule_index]
+        channel = self._channels[row]
+        values = {
+            condition.metric: float(self._values[row, self._metric_index[condition.metric]])
+            for condition in rule.conditions
+        }
+        try:
+            message = rule.message.format(channel=channel, **values)
+        except (KeyError, ValueError, IndexError):
+            message = rule.message
+        return {
+            'rule': rule.name,
+            'channel': channel,
+            'severity': rule.severity,
+            'message': message,
+            'values': values,
+            'timestamp': from_epoch_ms(timestamp).isoformat(),
+        }
+
+    def _add_channels(self, channels: Sequence[Hashable]) -> np.ndarray:
+        for channel in channels:
+            if channel not in self._channel_index:
+                self._channel_index[channel] = len(self._channels)
+                self._channels.append(channel)
+        rows = len(self._channels)
+        if rows > self._values.shape[0]:
+            self._grow(max(rows, 2 * self._values.shape[0]), self._values.shape[1])
+        return np.fromiter((self._channel_index[c] for c in channels),
+                           dtype=np.intp, count=len(channels))
+
+    def _add_metric(self, metric: str) -> int:
+        column = self._metric_index.get(metric)
+        if column is None:
+            column = self._metric_index[metric] = len(self._metric_index)
+            if column >= self._values.shape[1]:
+                self._grow(self._values.shape[0], max(4, 2 * self._values.shape[1]))
+        return column
+
+    def _grow(self, rows: int, columns: int):
+        old_rows, old_columns = self._values.shape
+        values = np.full((rows, columns), np.nan)
+        values[:old_rows, :old_columns] = self._values
+        updated = np.zeros((rows, columns), dtype=np.int64)
+        updated[:old_rows, :old_columns] = self._updated
+        self._values, self._updated = values, updated
+        if rows > old_rows:
+            for name, array in self._state.items():
+                grown = np.zeros((rows, array.shape[1]), dtype=array.dtype)
+                grown[:old_rows] = array
+                self._state[name] = grown
+
+    def _read_mtimes(self) -> Tuple:
+        paths = [DEFAULT_CONFIG_PATH] + ([self.config_path] if self.config_path else [])
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
@@ -1,10 +1,19 @@
 # agriculture_system/core/data_analyzer.py
 import random
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..database.columnar_archive import ColumnarArchive
+from ..database.rollups import HOUR_MS
+
+# 日照时数按光照强度超过该值（勒克斯，约合 120 W/m² 直射辐射）的时长计
+SUNSHINE_LUX_THRESHOLD = 12000.0
 
 
 class DataAnalyzer:
-    def __init__(self):
+    def __init__(self, archive: Optional[ColumnarArchive] = None):
+        self.archive = archive
         self.crop_database = {
             '水稻': {'optimal_temp': (20, 35), 'water_requirement': '高'},
             '小麦': {'optimal_temp': (15, 25), 'water_requirement': '中'},
@@ -33,6 +42,42 @@ class DataAnalyzer:
         recommendations.sort(key=lambda x: x['suitability_score'], reverse=True)
         return recommendations
 
+    def season_features(self, start, end, location: Optional[str] = None) -> Dict:
+        """从列式归档计算一个生长季的产量预测特征
+
+        逐天读取内存映射的列文件并累加，内存占用与历史长度无关。
+        返回 avg_temperature、total_rainfall、sunlight_hours、soil_ph，
+        可直接作为 YieldPredictionModel.prepare_yield_data 的一行输入。
+        """
+        if self.archive is None:
+            raise ValueError("未配置列式归档")
+
+        temp_sum, temp_count = 0.0, 0
+        ph_sum, ph_count = 0.0, 0
+        sunshine_ms = 0
+        for _, day in self.archive.iter_days(
+                'sensor_data', start, end,
+                ('timestamp', 'air_temperature', 'soil_ph', 'light_intensity')):
+            temperature = day['air_temperature']
+            temp_sum += float(np.nansum(temperature))
+            temp_count += int(np.count_nonzero(~np.isnan(temperature)))
+            soil_ph = day['soil_ph']
+            ph_sum += float(np.nansum(soil_ph))
+            ph_count += int(np.count_nonzero(~np.isnan(soil_ph)))
+            # 每个样本代表到下一个样本之间的时长
+            intervals = np.diff(day['timestamp'])
+            sunny = day['light_intensity'][:-1] >= SUNSHINE_LUX_THRESHOLD
+            sunshine_ms += int(intervals[sunny].sum())
+
+        weather = self.archive.load('weather_data', start, end, ('rainfall',), location=location)
+
+        return {
+            'avg_temperature': temp_sum / temp_count if temp_count else None,
+            'total_rainfall': float(np.nansum(weather['rainfall'])),
+            'sunlight_hours': sunshine_ms / HOUR_MS,
+            'soil_ph': ph_sum / ph_count if ph_count else None,
+        }
+
     def generate_implementation_report(self, crop: str, location: str) -> Dict:
         """生成实施过程建议报告"""
         crop_info = self.crop_database.get(crop, {})
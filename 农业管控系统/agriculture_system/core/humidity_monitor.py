@@ -1,2 +1,284 @@
+# agriculture_system/core/humidity_monitor.py
+import random
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..utils.anomaly_detection import FLAG_OK, AnomalyDetector
+from ..utils.ring_buffer import RingBuffer
+from ..utils.time_utils import TimestampLike, now_ms, to_epoch_ms
+from .multi_channel_monitor import ChannelSelector, MultiChannelMonitor
+from .temperature_monitor import DEFAULT_READING_CAPACITY, TemperatureMonitor
+
+# Magnus 公式系数（Alduchov & Eskridge 1996），适用于 -45~60°C
+MAGNUS_B = 17.625
+MAGNUS_C = 243.04
+
+# 相对湿度达到该值时视为叶面湿润
+LEAF_WETNESS_RH = 90.0
+
+
+def saturation_vapour_pressure(temperature):
+    """饱和水汽压（kPa），temperature 为°C，支持数组"""
+    temperature = np.asarray(temperature, dtype=np.float64)
+    return 0.61094 * np.exp(MAGNUS_B * temperature / (temperature + MAGNUS_C))
+
+
+def dew_point(temperature, relative_humidity):
+    """露点温度（°C），relative_humidity 为百分比，支持数组"""
+    temperature = np.asarray(temperature, dtype=np.float64)
+    rh = np.clip(np.asarray(relative_humidity, dtype=np.float64), 1e-6, 100.0)
+    gamma = np.log(rh / 100.0) + MAGNUS_B * temperature / (temperature + MAGNUS_C)
+    return MAGNUS_C * gamma / (MAGNUS_B - gamma)
+
+
+def vapour_pressure_deficit(temperature, relative_humidity):
+    """饱和水汽压差 VPD（kPa），支持数组"""
+    rh = np.clip(np.asarray(relative_humidity, dtype=np.float64), 0.0, 100.0)
+    return saturation_vapour_pressure(temperature) * (1.0 - rh / 100.0)
+
+
+def leaf_wetness_duration(timestamps: np.ndarray, humidity: np.ndarray, end_ms: int,
+                          rh_threshold: float = LEAF_WETNESS_RH, max_gap: float = 3600):
+    """叶面湿润（相对湿度 ≥ rh_threshold）的累计小时数
+
+    humidity 的最后一维与升序的 timestamps 对应，可为 (T,) 或 (N, T)，
+    结果对最后一维求和。每个读数代表到下一个读数之间的时长，超过 max_gap 秒
+    的间隔只计 max_gap 秒；最新读数计到 end_ms。缺失值（NaN）不计为湿润。
+    """
+    humidity = np.asarray(humidity, dtype=np.float64)
+    if not len(timestamps):
+        return np.zeros(humidity.shape[:-1])
+    intervals = np.diff(timestamps, append=max(end_ms, int(timestamps[-1])))
+    intervals = np.minimum(intervals, int(max_gap * 1000))
+    return np.where(humidity >= rh_threshold, intervals, 0).sum(axis=-1) / 3_600_000
+
+
 class HumidityMonitor:
-    pass
\ No newline at end of file
+    """空气/土壤湿度监控系统
+
+    读数保存在定长环形缓冲区中；空气湿度与同一时刻的气温成对记录
+    （缺少气温时为 NaN），露点、VPD 与叶面湿润时长都对历史数组向量化计算。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_READING_CAPACITY,
+                 temperature_monitor: Optional[TemperatureMonitor] = None):
+        self.air_humidity_readings = RingBuffer(capacity)
+        self.air_temperature_readings = RingBuffer(capacity)
+        self.soil_humidity_readings = RingBuffer(capacity)
+        # 尖峰/超量程的读数在入库和报警检查之前被剔除；
+        # 湿度可能长时间饱和在100%，不检测卡值
+        self.anomaly_detector = AnomalyDetector(['air_humidity', 'soil_humidity'],
+                                                valid_range=(0.0, 100.0))
+        # 模拟读数时从温度监控取同一时刻的气温
+        self.temperature_monitor = temperature_monitor
+        self.max_humidity_threshold = 85
+        self.min_humidity_threshold = 30
+        self.min_soil_humidity_threshold = 20
+
+    def read_air_humidity(self) -> float:
+        """模拟读取空气湿度传感器数据"""
+        humidity = random.uniform(30, 95)
+        temperature = None
+        if self.temperature_monitor is not None:
+            latest = self.temperature_monitor.temperature_readings.last()
+            temperature = latest[1] if latest else None
+        self.record_air_humidity(humidity, temperature)
+        return humidity
+
+    def read_soil_humidity(self) -> float:
+        """模拟读取土壤湿度传感器数据"""
+        humidity = random.uniform(20, 80)
+        self.record_soil_humidity(humidity)
+        return humidity
+
+    def record_air_humidity(self, humidity: float, temperature: Optional[float] = None,
+                            timestamp: TimestampLike = None) -> int:
+        """记录一次空气湿度读数及同一时刻的气温（如来自 DHT22）
+
+        返回异常检测的标记位；被标记的读数不记录。
+        """
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        flags = self.anomaly_detector.check_one('air_humidity', humidity, ts)
+        if flags != FLAG_OK:
+            return flags
+        self.air_humidity_readings.append(humidity, ts)
+        self.air_temperature_readings.append(np.nan if temperature is None else temperature, ts)
+        return flags
+
+    def record_soil_humidity(self, humidity: float, timestamp: TimestampLike = None) -> int:
+        """记录一次土壤湿度读数，返回异常检测的标记位"""
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        flags = self.anomaly_detector.check_one('soil_humidity', humidity, ts)
+        if flags == FLAG_OK:
+            self.soil_humidity_readings.append(humidity, ts)
+        return flags
+
+    def air_history(self, count: Optional[int] = None,
+                    seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """最近 count 个或 seconds 秒内的 (epoch毫秒, 气温, 相对湿度) 数组视图"""
+        if seconds is not None:
+            timestamps, humidity = self.air_humidity_readings.since(seconds)
+        else:
+            timestamps, humidity = self.air_humidity_readings.latest(count)
+        _, temperature = self.air_temperature_readings.latest(len(humidity))
+        return timestamps, temperature, humidity
+
+    def dew_points(self, count: Optional[int] = None, seconds: Optional[float] = None) -> np.ndarray:
+        """历史读数对应的露点温度"""
+        _, temperature, humidity = self.air_history(count, seconds)
+        return dew_point(temperature, humidity)
+
+    def vapour_pressure_deficits(self, count: Optional[int] = None,
+                                 seconds: Optional[float] = None) -> np.ndarray:
+        """历史读数对应的 VPD（kPa）"""
+        _, temperature, humidity = self.air_history(count, seconds)
+        return vapour_pressure_deficit(temperature, humidity)
+
+    def leaf_wetness_hours(self, hours: float = 24, rh_threshold: float = LEAF_WETNESS_RH,
+                           max_gap: float = 3600) -> float:
+        """最近 hours 小时内叶面湿润（相对湿度 ≥ rh_threshold）的累计小时数
+
+        每个读数代表到下一个读数之间的时长，超过 max_gap 秒的间隔视为
+        数据缺失，只计 max_gap 秒；最新读数计到当前时刻。
+        """
+        timestamps, _, humidity = self.air_history(seconds=hours * 3600)
+        return float(leaf_wetness_duration(timestamps, humidity, now_ms(), rh_threshold, max_gap))
+
+    def get_humidity_indicators(self) -> Dict:
+        """最新读数的露点、VPD 以及24小时叶面湿润时长"""
+        _, temperature, humidity = self.air_history(1)
+        if not len(humidity) or np.isnan(temperature[0]):
+            dew, vpd = None, None
+        else:
+            dew = float(dew_point(temperature[0], humidity[0]))
+            vpd = float(vapour_pressure_deficit(temperature[0], humidity[0]))
+        return {
+            'dew_point': dew,
+            'vapour_pressure_deficit': vpd,
+            'leaf_wetness_hours_24h': self.leaf_wetness_hours(24),
+        }
+
+    def check_humidity_alert(self) -> Optional[str]:
+        """检查空气/土壤湿度异常报警"""
+        air = self.air_humidity_readings.last()
+        if air is not None:
+            if air[1] > self.max_humidity_threshold:
+                return f"高湿警报！当前空气湿度: {air[1]:.1f}%"
+            if air[1] < self.min_humidity_threshold:
+                return f"低湿警报！当前空气湿度: {air[1]:.1f}%"
+
+        soil = self.soil_humidity_readings.last()
+        if soil is not None and soil[1] < self.min_soil_humidity_threshold:
+            return f"土壤干旱警报！当前土壤湿度: {soil[1]:.1f}%"
+
+        return None
+
+
+class MultiChannelHumidityMonitor(MultiChannelMonitor):
+    """多点空气湿度监控
+
+    通道布局与 MultiChannelMonitor 相同（按加入顺序编号，热路径可直接传下标
+    数组），最新值与阈值检查针对相对湿度。另外为每个通道保存最近 capacity 次
+    采样的相对湿度与同一时刻的气温，构成 (通道数 N × 采样数 T) 的历史数组，
+    同一次采样的各通道共用一个时间戳；露点、VPD 与叶面湿润时长对整个二维
+    数组一次向量化计算。本次未采样或被异常检测剔除的读数记为 NaN。
+    """
+
+    def __init__(self, channels: Sequence = (), capacity: int = DEFAULT_READING_CAPACITY,
+                 max_humidity_threshold: float = 85, min_humidity_threshold: float = 30,
+                 detector: Optional[AnomalyDetector] = None):
+        self.capacity = capacity
+        self._sample_timestamps = np.zeros(capacity, dtype=np.int64)
+        self._sample_head = 0
+        self._sample_count = 0
+        super().__init__(channels, max_humidity_threshold, min_humidity_threshold,
+                         detector=detector)
+
+    def record(self, channels: ChannelSelector, humidity: Sequence[float],
+               temperature: Union[float, Sequence[float], None] = None,
+               timestamp: TimestampLike = None):
+        """记录一次采样：各通道的相对湿度及同一时刻的气温（缺少时为 None 或 NaN）"""
+        index = self.index_of(channels)
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        self.update(index, humidity, ts)
+        humidity = np.asarray(humidity, dtype=np.float64)
+        if self.detector is not None:
+            humidity = np.where(self.flags[index] == FLAG_OK, humidity, np.nan)
+
+        column = self._sample_head
+        self._humidity_history[:, column] = np.nan
+        self._temperature_history[:, column] = np.nan
+        self._humidity_history[index, column] = humidity
+        if temperature is not None:
+            self._temperature_history[index, column] = temperature
+        self._sample_timestamps[column] = ts
+        self._sample_head = (column + 1) % self.capacity
+        self._sample_count = min(self._sample_count + 1, self.capacity)
+
+    def air_history(self, count: Optional[int] = None,
+                    seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """最近 count 次或 seconds 秒内的 (epoch毫秒 (T,), 气温 (N, T), 相对湿度 (N, T))，按时间升序"""
+        size = self._sample_count
+        order = np.arange(self._sample_head - size, self._sample_head) % self.capacity
+        timestamps = self._sample_timestamps[order]
+        if seconds is not None:
+            start = int(np.searchsorted(timestamps, now_ms() - int(seconds * 1000), side='right'))
+        else:
+            start = 0 if count is None else size - max(0, min(count, size))
+        order = order[start:]
+        n = self._count
+        return (timestamps[start:], self._temperature_history[:n, order],
+                self._humidity_history[:n, order])
+
+    def dew_points(self, count: Optional[int] = None, seconds: Optional[float] = None) -> np.ndarray:
+        """各通道历史读数对应的露点温度 (N, T)"""
+        _, temperature, humidity = self.air_history(count, seconds)
+        return dew_point(temperature, humidity)
+
+    def vapour_pressure_deficits(self, count: Optional[int] = None,
+                                 seconds: Optional[float] = None) -> np.ndarray:
+        """各通道历史读数对应的 VPD（kPa）(N, T)"""
+        _, temperature, humidity = self.air_history(count, seconds)
+        return vapour_pressure_deficit(temperature, humidity)
+
+    def leaf_wetness_hours(self, hours: float = 24, rh_threshold: float = LEAF_WETNESS_RH,
+                           max_gap: float = 3600) -> np.ndarray:
+        """各通道最近 hours 小时内叶面湿润的累计小时数 (N,)，计算方式同 HumidityMonitor"""
+        timestamps, _, humidity = self.air_history(seconds=hours * 3600)
+        return leaf_wetness_duration(timestamps, humidity, now_ms(), rh_threshold, max_gap)
+
+    def get_humidity_indicators(self) -> Dict[str, np.ndarray]:
+        """各通道最近一次采样的露点、VPD（未采样或缺少气温时为 NaN）以及24小时叶面湿润时长"""
+        _, temperature, humidity = self.air_history(1)
+        if not humidity.shape[1]:
+            dew = vpd = np.full(len(self), np.nan)
+        else:
+            dew = dew_point(temperature[:, -1], humidity[:, -1])
+            vpd = vapour_pressure_deficit(temperature[:, -1], humidity[:, -1])
+        return {
+            'dew_point': dew,
+            'vapour_pressure_deficit': vpd,
+            'leaf_wetness_hours_24h': self.leaf_wetness_hours(24),
+        }
+
+    def check_humidity_alert(self) -> List[str]:
+        """检查所有通道的空气湿度异常，返回处于报警状态的通道的报警信息"""
+        scan = self.check_alerts()
+        values = self.values
+        messages = [
+            f"{self.channel_name(i)} 高湿警报！当前空气湿度: {values[i]:.1f}%" for i in scan.high
+        ]
+        messages.extend(
+            f"{self.channel_name(i)} 低湿警报！当前空气湿度: {values[i]:.1f}%" for i in scan.low
+        )
+        return messages
+
+    def _allocate(self, capacity: int):
+        super()._allocate(capacity)
+        count = getattr(self, '_count', 0)
+        for name in ('_humidity_history', '_temperature_history'):
+            grown = np.full((capacity, self.capacity), np.nan)
+            if count:
+                grown[:count] = getattr(self, name)[:count]
+            setattr(self, name, grown)
@@ -1,20 +1,28 @@
 # agriculture_system/core/main_system.py
 import os
 import json
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from 增强系统集成.机器学习模型训练 import PestDetectionModel, YieldPredictionModel
 from ..core.weather_system import EnhancedWeatherSystem
-from ..core.temperature_monitor import TemperatureMonitor
+from ..core.temperature_monitor import (
+    TEMPERATURE_RANGE, TEMPERATURE_STUCK_SAMPLES, TemperatureMonitor
+)
+from ..core.multi_channel_monitor import MultiChannelTemperatureMonitor
 from ..core.pest_monitor import EnhancedPestMonitor
 from ..core.growth_simulator import GrowthSimulator
 from ..core.humidity_monitor import HumidityMonitor
 from ..core.data_analyzer import DataAnalyzer
+from ..core.alert_dispatch import AlertDispatcher, LogSink, SQLiteSink, SSESink, WebhookSink
 from ..core.alert_system import AlertSystem
+from ..database.columnar_archive import ColumnarArchive
 from ..database.database_manager import AgricultureDatabase
+from ..database.retention import RetentionPolicy
 from ..hardware.sensor_interface import HardwareSensorInterface
+from ..utils.anomaly_detection import AnomalyDetector
 from ..utils.config_loader import ConfigLoader
+from ..utils.streaming_stats import StatisticsEngine
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,6 +33,7 @@ class AgricultureIntelligentSystem:
 
     def __init__(self, config_path: Optional[str] = None):
         # 加载配置
+        self.config_path = config_path
         self.config = ConfigLoader.load_config(config_path)
 
         # 初始化组件
@@ -34,24 +43,73 @@ class AgricultureIntelligentSystem:
 
     def _init_components(self):
         """初始化所有组件"""
-        # 天气系统
-        self.weather_system = EnhancedWeatherSystem(
-            self.config.get('weather_api_key')
-        )
-
         # 监测系统
         self.temp_monitor = TemperatureMonitor()
-        self.humidity_monitor = HumidityMonitor()
+        thresholds = self.config.get('alert_thresholds', {})
+        self.probe_monitor = MultiChannelTemperatureMonitor(
+            max_temp_threshold=thresholds.get('temperature_high', 35),
+            min_temp_threshold=thresholds.get('temperature_low', 5),
+            statistics=StatisticsEngine(),
+            detector=AnomalyDetector(valid_range=TEMPERATURE_RANGE,
+                                     stuck_samples=TEMPERATURE_STUCK_SAMPLES)
+        )
+        self.humidity_monitor = HumidityMonitor(temperature_monitor=self.temp_monitor)
+        self.humidity_monitor.max_humidity_threshold = thresholds.get('humidity_high', 85)
+        self.humidity_monitor.min_humidity_threshold = thresholds.get('humidity_low', 30)
         self.pest_monitor = EnhancedPestMonitor()
 
         # 分析系统
         self.growth_simulator = GrowthSimulator()
-        self.data_analyzer = DataAnalyzer()
-        self.alert_system = AlertSystem()
+        archive_dir = self.config.get('columnar_archive_dir')
+        self.columnar_archive = ColumnarArchive(archive_dir) if archive_dir else None
+        self.data_analyzer = DataAnalyzer(self.columnar_archive)
 
         # 数据库
         db_path = self.config.get('database_path', 'agriculture_system.db')
-        self.database = AgricultureDatabase(db_path)
+        self.database = AgricultureDatabase(
+            db_path,
+            synchronous=self.config.get('database_synchronous', 'NORMAL'),
+            buffer_rows=self.config.get('database_buffer_rows', 0),
+            flush_interval=self.config.get('database_flush_interval', 5.0),
+            retention=RetentionPolicy.from_config(self.config.get('retention')),
+            async_writes=self.config.get('database_async_writes', False),
+            queue_size=self.config.get('database_queue_size', 10000),
+            queue_full_policy=self.config.get('database_queue_full_policy', 'block'),
+            spill_path=self.config.get('database_spill_path'),
+            sensor_storage=self.config.get('database_sensor_storage', 'raw'),
+            cache_size=self.config.get('database_cache_size', 128),
+            cache_ttl=self.config.get('database_cache_ttl', 5.0),
+            flush_timeout=self.config.get('database_flush_timeout', 5.0),
+            compact_interval=self.config.get('database_compact_interval', 60.0)
+        )
+
+        # 天气系统：实时天气写入 weather_data，配额不足时退回其中的最近记录
+        self.weather_system = EnhancedWeatherSystem(
+            self.config.get('weather_api_key'),
+            self.config.get('weather_service'),
+            self.database,
+            self.config.get('weather_quota'),
+            self.config.get('weather_analytics'),
+            self.config.get('weather_nowcast')
+        )
+
+        # 报警事件由后台线程分发到日志、alert_records、SSE 订阅者与可选的 webhook
+        dispatch = self.config.get('alert_dispatch', {})
+        self.alert_stream = SSESink()
+        sinks = [LogSink(), SQLiteSink(self.database), self.alert_stream]
+        if dispatch.get('webhook_url'):
+            sinks.append(WebhookSink(dispatch['webhook_url']))
+        self.alert_dispatcher = AlertDispatcher(
+            sinks,
+            max_queue=dispatch.get('queue_size', 1000),
+            batch_size=dispatch.get('batch_size', 50),
+            batch_interval=dispatch.get('batch_interval', 0.5),
+            max_retries=dispatch.get('max_retries', 3)
+        )
+        # 报警规则可在运行中修改配置文件后重新加载
+        self.alert_system = AlertSystem.from_config(
+            self.config, self.config_path, self.alert_dispatcher
+        )
 
         # 硬件接口（可选）
         if self.config.get('enable_hardware', False):
@@ -67,6 +125,17 @@ class AgricultureIntelligentSystem:
         """启动系统"""
         logger.info(f"启动农业智能系统 - 位置: {location}, 间隔: {interval}秒")
 
+        # 先把新结束的天导出到列式归档，再按保留策略归档/删除过期的月份分区
+        if self.columnar_archive is not None:
+            self.columnar_archive.export(self.database)
+        self.database.apply_retention()
+
+        # 按配额在后台均匀刷新该地点的实时天气
+        scheduler = self.weather_system.scheduler
+        if scheduler is not None:
+            scheduler.register(location)
+            scheduler.start(self.config.get('weather_quota', {}).get('tick_interval', 30))
+
         # 这里可以添加启动监控线程的逻辑
         # 在实际实现中，您可以使用APScheduler或类似的库
 
@@ -76,6 +145,30 @@ class AgricultureIntelligentSystem:
         """停止系统"""
         logger.info("停止农业智能系统")
         self.is_running = False
+        if self.weather_system.scheduler is not None:
+            self.weather_system.scheduler.stop()
+
+        # 写入缓冲区中尚未提交的传感器/天气数据与尚未分发的报警
+        self.database.flush()
+        self.alert_dispatcher.flush(timeout=5.0)
+
+    def check_alerts(self, location: str = "默认农场") -> List[Dict]:
+        """把各监控的最新读数写入报警系统并评估全部规则，返回新触发的报警"""
+        self.alert_system.reload_if_changed()
+
+        readings = {
+            'temperature': self.temp_monitor.temperature_readings.last(),
+            'humidity': self.humidity_monitor.air_humidity_readings.last(),
+            'soil_humidity': self.humidity_monitor.soil_humidity_readings.last(),
+        }
+        for metric, latest in readings.items():
+            if latest is not None:
+                self.alert_system.update(location, {metric: latest[1]}, latest[0])
+        if len(self.probe_monitor):
+            self.alert_system.update_many(self.probe_monitor.channels, 'temperature',
+                                          self.probe_monitor.values, self.probe_monitor.timestamps)
+
+        return self.alert_system.evaluate()
 
     def generate_report(self, location: str, crop_type: str, days: int = 7) -> Dict:
         """生成综合报告"""
@@ -86,7 +179,7 @@ class AgricultureIntelligentSystem:
             'timestamp': datetime.now().isoformat(),
             'location': location,
             'crop_type': crop_type,
-            'weather_analysis': self.weather_system.analyze_weather_patterns(),
+            'weather_analysis': self.weather_system.analyze_weather_patterns(location),
             'crop_recommendations': self.data_analyzer.recommend_crops(
                 location, '壤土', {}
             ),
@@ -0,0 +1,219 @@
+# agriculture_system/core/multi_channel_monitor.py
+from collections import namedtuple
+from typing import Dict, Hashable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from ..utils.anomaly_detection import FLAG_OK, AnomalyDetector
+from ..utils.streaming_stats import StatisticsEngine
+from ..utils.time_utils import TimestampLike, now_ms, to_epoch_ms
+
+# 通道状态：正常 / 超过上限 / 低于下限
+STATE_NORMAL = 0
+STATE_HIGH = 1
+STATE_LOW = -1
+
+# 一次检查的结果，均为通道下标数组；state 为全部通道的状态
+AlertScan = namedtuple('AlertScan', ['state', 'high', 'low', 'raised', 'cleared'])
+
+ChannelSelector = Union[Sequence[Hashable], np.ndarray]
+
+
+class MultiChannelMonitor:
+    """多通道阈值监控
+
+    N 个通道的最新值、时间戳、上下限与状态分别保存在 NumPy 数组中，
+    一次硬件轮询的结果通过 update() 批量写入，check_alerts() 对所有
+    通道做一次向量化比较。通道按加入顺序编号，热路径可以直接传入
+    下标数组（index_of() 预先换算），避免逐个查找通道名。
+    传入 statistics 时每次更新同时写入流式统计引擎，两者的通道下标一致。
+    传入 detector 时样本先经过异常检测，被标记的样本（尖峰、卡值等）
+    不写入最新值与统计，也不参与阈值检查。
+    """
+
+    def __init__(self, channels: Sequence[Hashable] = (),
+                 high_threshold: float = np.inf, low_threshold: float = -np.inf,
+                 statistics: Optional[StatisticsEngine] = None,
+                 detector: Optional[AnomalyDetector] = None):
+        self.default_high = high_threshold
+        self.default_low = low_threshold
+        self.statistics = statistics
+        self.detector = detector
+        self._index: Dict[Hashable, int] = {}
+        self._names: List[Hashable] = []
+        self._count = 0
+        self._allocate(max(len(channels), 16))
+        if len(channels):
+            self.add_channels(channels)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def channels(self) -> List[Hashable]:
+        return list(self._names)
+
+    @property
+    def values(self) -> np.ndarray:
+        """各通道最新值（尚无数据为 NaN）"""
+        return self._values[:self._count]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """各通道最新值的 epoch毫秒（尚无数据为0）"""
+        return self._timestamps[:self._count]
+
+    @property
+    def state(self) -> np.ndarray:
+        """各通道上一次检查后的状态"""
+        return self._state[:self._count]
+
+    @property
+    def flags(self) -> np.ndarray:
+        """各通道最近一个样本的异常标记位（未启用检测时全为0）"""
+        return self._flags[:self._count]
+
+    def add_channels(self, channels: Sequence[Hashable],
+                     high: Optional[float] = None, low: Optional[float] = None) -> np.ndarray:
+        """加入新通道（已存在的忽略），返回这些通道的下标"""
+        new = [channel for channel in dict.fromkeys(channels) if channel not in self._index]
+        if self._count + len(new) > len(self._values):
+            self._allocate(max(2 * len(self._values), self._count + len(new)))
+        start = self._count
+        for offset, channel in enumerate(new):
+            self._index[channel] = start + offset
+            self._names.append(channel)
+        end = start + len(new)
+        if self.statistics is not None:
+            self.statistics.add_channels(new)
+        if self.detector is not None:
+            self.detector.add_channels(new)
+        self._high[start:end] = self.default_high if high is None else high
+        self._low[start:end] = self.default_low if low is None else low
+        self._count = end
+        return self.index_of(channels)
+
+    def index_of(self, channels: ChannelSelector) -> np.ndarray:
+        """通道名换算为下标数组；传入整数数组时原样返回"""
+        if isinstance(channels, np.ndarray) and channels.dtype.kind in 'iu':
+            return channels
+        return np.fromiter((self._index[channel] for channel in channels),
+                           dtype=np.intp, count=len(channels))
+
+    def set_thresholds(self, channels: ChannelSelector,
+                       high: Union[float, Sequence[float], None] = None,
+                       low: Union[float, Sequence[float], None] = None):
+        """设置部分通道的上下限，可为标量或与 channels 等长的数组"""
+        index = self.index_of(channels)
+        if high is not None:
+            self._high[index] = high
+        if low is not None:
+            self._low[index] = low
+
+    def update(self, channels: ChannelSelector, values: Sequence[float],
+               timestamps: Union[TimestampLike, Sequence[int]] = None):
+        """批量写入一组通道的最新值
+
+        timestamps 可以是所有通道共用的时间（省略时为当前时间），
+        也可以是与 channels 等长的 epoch毫秒数组。
+        """
+        index = self.index_of(channels)
+        if self.detector is not None:
+            flags = self.detector.check(index, values, timestamps)
+            self._flags[index] = flags
+            keep = flags == FLAG_OK
+            if not keep.all():
+                index = index[keep]
+                values = np.asarray(values, dtype=np.float64)[keep]
+                if isinstance(timestamps, (np.ndarray, list, tuple)):
+                    timestamps = np.asarray(timestamps)[keep]
+                if not len(index):
+                    return
+        self._values[index] = values
+        if timestamps is None:
+            self._timestamps[index] = now_ms()
+        elif isinstance(timestamps, (np.ndarray, list, tuple)):
+            self._timestamps[index] = timestamps
+        else:
+            self._timestamps[index] = to_epoch_ms(timestamps)
+        if self.statistics is not None:
+            # 统计引擎按批次时间划分窗口，取本批最新的时间戳
+            self.statistics.update(index, values, int(self._timestamps[index].max()))
+
+    def update_all(self, values: np.ndarray, timestamp: TimestampLike = None):
+        """按通道顺序写入全部通道的值（长度须等于通道数）"""
+        n = self._count
+        if self.detector is not None:
+            self.update(np.arange(n), values, timestamp)
+            return
+        self._values[:n] = values
+        self._timestamps[:n] = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        if self.statistics is not None:
+            self.statistics.update(np.arange(n), values, int(self._timestamps[0]) if n else None)
+
+    def check_alerts(self) -> AlertScan:
+        """一次向量化比较得到所有通道的状态及本次新触发/解除的通道"""
+        n = self._count
+        values = self._values[:n]
+        state = np.zeros(n, dtype=np.int8)
+        np.greater(values, self._high[:n], out=state, casting='unsafe')
+        state -= np.less(values, self._low[:n])
+
+        previous = self._state[:n]
+        changed = state != previous
+        raised = np.flatnonzero(changed & (state != STATE_NORMAL))
+        cleared = np.flatnonzero(changed & (state == STATE_NORMAL))
+        previous[:] = state
+        return AlertScan(
+            state=state,
+            high=np.flatnonzero(state == STATE_HIGH),
+            low=np.flatnonzero(state == STATE_LOW),
+            raised=raised,
+            cleared=cleared,
+        )
+
+    def stale_channels(self, max_age: float, now: TimestampLike = None) -> np.ndarray:
+        """超过 max_age 秒没有更新的通道下标"""
+        reference = now_ms() if now is None else to_epoch_ms(now)
+        return np.flatnonzero(reference - self._timestamps[:self._count] > max_age * 1000)
+
+    def channel_name(self, index: int) -> Hashable:
+        return self._names[index]
+
+    def _allocate(self, capacity: int):
+        count = getattr(self, '_count', 0)
+        arrays = {
+            '_values': (np.float64, np.nan),
+            '_timestamps': (np.int64, 0),
+            '_high': (np.float64, np.inf),
+            '_low': (np.float64, -np.inf),
+            '_state': (np.int8, STATE_NORMAL),
+            '_flags': (np.uint8, FLAG_OK),
+        }
+        for name, (dtype, fill) in arrays.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            if count:
+                grown[:count] = getattr(self, name)[:count]
+            setattr(self, name, grown)
+
+
+class MultiChannelTemperatureMonitor(MultiChannelMonitor):
+    """多探头温度监控，默认阈值与 TemperatureMonitor 一致"""
+
+    def __init__(self, channels: Sequence[Hashable] = (),
+                 max_temp_threshold: float = 35, min_temp_threshold: float = 5,
+                 statistics: Optional[StatisticsEngine] = None,
+                 detector: Optional[AnomalyDetector] = None):
+        super().__init__(channels, max_temp_threshold, min_temp_threshold, statistics, detector)
+
+    def check_temperature_alert(self) -> List[str]:
+        """检查所有通道的温度异常，返回处于报警状态的通道的报警信息"""
+        scan = self.check_alerts()
+        values = self.values
+        messages = [
+            f"{self.channel_name(i)} 高温警报！当前温度: {values[i]:.1f}°C" for i in scan.high
+        ]
+        messages.extend(
+            f"{self.channel_name(i)} 低温警报！当前温度: {values[i]:.1f}°C" for i in scan.low
+        )
+        return messages
@@ -0,0 +1,271 @@
+# agriculture_system/core/nowcast.py
+import itertools
+import threading
+import time
+import warnings
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..utils.time_utils import TimestampLike, now_ms, to_epoch_ms
+from .weather_series import WEATHER_FIELDS, WeatherSeries
+
+HOUR_MS = 3600 * 1000
+SEASON = 24
+
+# 网格搜索的平滑参数：水平 alpha、趋势 beta、季节 gamma、趋势阻尼 phi
+PARAMETER_GRID = np.array(list(itertools.product(
+    (0.05, 0.1, 0.2, 0.4, 0.6, 0.8),
+    (0.0, 0.01, 0.05, 0.1),
+    (0.05, 0.1, 0.2, 0.4),
+    (0.9, 0.98),
+)))
+
+# 预测值的物理范围
+FIELD_LIMITS = {
+    'temperature': (-60.0, 60.0),
+    'humidity': (0.0, 100.0),
+    'rainfall': (0.0, np.inf),
+    'wind_speed': (0.0, np.inf),
+}
+
+# 传感器列补充到对应的天气字段（只用于 sensor_location）
+SENSOR_COLUMNS = {'temperature': 'air_temperature', 'humidity': 'air_humidity'}
+
+
+def hour_of_day(hours: np.ndarray) -> np.ndarray:
+    """epoch小时数换算为本地钟点（0-23）"""
+    offset = time.localtime().tm_gmtoff // 3600
+    return (hours + offset) % SEASON
+
+
+class HoltWinters:
+    """多变量加法 Holt-Winters（阻尼趋势 + 24小时季节）
+
+    V 个变量各自有一组平滑参数，状态为 (V,) 的水平/趋势和 (V, 24) 的季节项。
+    fit() 对 PARAMETER_GRID 中的全部参数组合同时递推（状态形状为 (G, V)），
+    每个变量取一步预测误差平方和最小的一组；advance() 用已选参数把状态
+    向前推进新的若干小时，不重新搜索。缺测（NaN）的小时以预测值代替观测，
+    从未有过观测的变量预测为 NaN。
+    """
+
+    def __init__(self, params: np.ndarray, level: np.ndarray, trend: np.ndarray,
+                 season: np.ndarray, last_hour: int, observed: np.ndarray,
+                 sse: Optional[np.ndarray] = None):
+        self.params = params
+        self.level = level
+        self.trend = trend
+        self.season = season
+        self.last_hour = last_hour
+        self.observed = observed
+        self.sse = sse
+
+    @classmethod
+    def fit(cls, values: np.ndarray, first_hour: int) -> Optional['HoltWinters']:
+        """values 为 (T, V) 逐小时观测，first_hour 为首行的epoch小时数；数据不足两天返回 None"""
+        hours, n_vars = values.shape
+        if hours < 2 * SEASON:
+            return None
+        first_day = values[:SEASON]
+        with warnings.catch_warnings():
+            # 整列缺测时 nanmean 告警并返回 NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            level = np.nanmean(values[:2 * SEASON], axis=0)
+        level = np.where(np.isnan(level), 0.0, level)
+        index = hour_of_day(first_hour + np.arange(SEASON))
+        season = np.zeros((n_vars, SEASON))
+        season[:, index] = np.nan_to_num((first_day - level).T)
+
+        grid = len(PARAMETER_GRID)
+        alpha, beta, gamma, phi = (PARAMETER_GRID[:, i, None] for i in range(4))
+        state_level = np.repeat(level[None, :], grid, axis=0)
+        state_trend = np.zeros((grid, n_vars))
+        state_season = np.repeat(season[None, :, :], grid, axis=0)
+        sse = np.zeros((grid, n_vars))
+        slots = hour_of_day(first_hour + np.arange(hours))
+        for t in range(hours):
+            state_level, state_trend, error = cls._step(
+                state_level, state_trend, state_season, slots[t], values[t], alpha, beta, gamma, phi
+            )
+            if t >= SEASON:
+                sse += error ** 2
+
+        best = np.argmin(sse, axis=0)
+        columns = np.arange(n_vars)
+        return cls(
+            params=PARAMETER_GRID[best],
+            level=state_level[best, columns],
+            trend=state_trend[best, columns],
+            season=state_season[best, columns],
+            last_hour=int(first_hour + hours - 1),
+            observed=~np.isnan(values).all(axis=0),
+            sse=sse[best, columns],
+        )
+
+    def advance(self, values: np.ndarray):
+        """按时间顺序加入 last_hour 之后的 (T, V) 逐小时观测"""
+        alpha, beta, gamma, phi = (self.params[None, :, i] for i in range(4))
+        level, trend = self.level[None, :], self.trend[None, :]
+        season = self.season[None, :, :].copy()
+        slots = hour_of_day(self.last_hour + 1 + np.arange(len(values)))
+        for t in range(len(values)):
+            level, trend, _ = self._step(level, trend, season, slots[t], values[t],
+                                         alpha, beta, gamma, phi)
+        self.level, self.trend, self.season = level[0], trend[0], season[0]
+        self.last_hour += len(values)
+        self.observed = self.observed | ~np.isnan(values).all(axis=0)
+
+    def predict(self, steps: int) -> np.ndarray:
+        """last_hour 之后 steps 个小时的 (steps, V) 预测"""
+        phi = self.params[:, 3]
+        powers = phi[None, :] ** np.arange(1, steps + 1)[:, None]
+        damped = np.cumsum(powers, axis=0)
+        slots = hour_of_day(self.last_hour + 1 + np.arange(steps))
+        predicted = self.level + damped * self.trend + self.season[:, slots].T
+        return np.where(self.observed, predicted, np.nan)
+
+    @staticmethod
+    def _step(level, trend, season, slot, observed, alpha, beta, gamma, phi):
+        seasonal = season[:, :, slot]
+        forecast = level + phi * trend + seasonal
+        missing = np.isnan(observed)
+        value = np.where(missing, forecast, observed)
+        error = np.where(missing, 0.0, value - forecast)
+        new_level = alpha * (value - seasonal) + (1 - alpha) * (level + phi * trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        season[:, :, slot] = gamma * (value - new_level) + (1 - gamma) * seasonal
+        return new_level, new_trend, error
+
+
+class LocalWeatherForecaster:
+    """无需网络的本地天气预测
+
+    从 weather_data（sensor_location 还用本地传感器补充温湿度）读取最近
+    history_days 天的逐小时均值，为每个地点拟合 HoltWinters 并缓存参数与状态。
+    之后每次预测只把上次之后新结束的小时推进进状态；距上次选参超过
+    refit_hours 小时才重新网格搜索。历史不足 min_history_hours 时返回 None。
+    """
+
+    def __init__(self, database, history_days: int = 30, refit_hours: int = 24,
+                 min_history_hours: int = 48, sensor_location: Optional[str] = None):
+        self.database = database
+        self.history_days = history_days
+        self.refit_hours = refit_hours
+        self.min_history_hours = max(min_history_hours, 2 * SEASON)
+        self.sensor_location = sensor_location
+        self._models: Dict[str, Tuple[HoltWinters, int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, database, spec: Optional[Dict] = None) -> 'LocalWeatherForecaster':
+        spec = spec or {}
+        return cls(database,
+                   history_days=spec.get('history_days', 30),
+                   refit_hours=spec.get('refit_hours', 24),
+                   min_history_hours=spec.get('min_history_hours', 48),
+                   sensor_location=spec.get('sensor_location'))
+
+    def model(self, location: str, now: TimestampLike = None) -> Optional[HoltWinters]:
+        """该地点截至上一个完整小时的模型，必要时拟合或增量推进"""
+        current_hour = (now_ms() if now is None else to_epoch_ms(now)) // HOUR_MS
+        with self._lock:
+            cached = self._models.get(location)
+            if cached is not None:
+                model, fitted_hour = cached
+                stale = current_hour - 1 - model.last_hour
+                if current_hour - fitted_hour < self.refit_hours and stale < self.history_days * 24:
+                    if stale > 0:
+                        model.advance(self._hourly(location, model.last_hour + 1, current_hour))
+                    return model
+
+            first_hour = current_hour - self.history_days * 24
+            values = self._hourly(location, first_hour, current_hour)
+            observed = np.flatnonzero(~np.isnan(values).all(axis=1))
+            if len(observed) < self.min_history_hours:
+                self._models.pop(location, None)
+                return None
+            # 从第一个有数据的小时开始拟合
+            start = int(observed[0])
+            model = HoltWinters.fit(values[start:], first_hour + start)
+            if model is None:
+                return None
+            self._models[location] = (model, current_hour)
+            return model
+
+    def forecast_hourly(self, location: str, hours: int,
+                        now: TimestampLike = None) -> Optional[WeatherSeries]:
+        """从当前小时起 hours 个小时的逐小时预测"""
+        model = self.model(location, now)
+        if model is None:
+            return None
+        # 模型状态截至上一个完整小时，预测的第一步即当前小时
+        current_hour = model.last_hour + 1
+        predicted = model.predict(hours)
+        columns = {
+            name: np.clip(predicted[:, i], *FIELD_LIMITS[name])
+            for i, name in enumerate(WEATHER_FIELDS)
+        }
+        hours_index = (current_hour + np.arange(hours)) * HOUR_MS
+        return WeatherSeries.from_columns(hours_index, columns, location)
+
+    def forecast(self, location: str, days: int = 3,
+                 now: TimestampLike = None) -> Optional[WeatherSeries]:
+        """未来 days 天的逐日预测（首日为今天剩余的小时）"""
+        reference = now_ms() if now is None else to_epoch_ms(now)
+        hourly = self.forecast_hourly(location, days * 24, reference)
+        if hourly is None:
+            return None
+        return hourly.daily()[:days]
+
+    def nowcast(self, location: str, now: TimestampLike = None) -> Optional[Dict]:
+        """当前小时的预测值，格式与实时天气一致，无法预测的字段为 None"""
+        hourly = self.forecast_hourly(location, 1, now)
+        if hourly is None:
+            return None
+        weather = hourly[0]
+        values = {name: getattr(weather, name) for name in WEATHER_FIELDS}
+        return dict({name: None if value != value else value for name, value in values.items()},
+                    description='本地预测', timestamp=weather.timestamp)
+
+    def _hourly(self, location: str, first_hour: int, end_hour: int) -> np.ndarray:
+        """[first_hour, end_hour) 内各小时的 (T, V) 均值，无数据为 NaN"""
+        hours = max(end_hour - first_hour, 0)
+        sums = np.zeros((hours, len(WEATHER_FIELDS)))
+        counts = np.zeros((hours, len(WEATHER_FIELDS)))
+        if hours:
+            chunks = self.database.iter_weather_data(
+                location, start=first_hour * HOUR_MS, end=end_hour * HOUR_MS,
+                columns=('timestamp',) + WEATHER_FIELDS, as_arrays=True
+            )
+            for chunk in chunks:
+                self._accumulate(sums, counts, first_hour, chunk['timestamp'],
+                                 [chunk[name] for name in WEATHER_FIELDS])
+        with np.errstate(invalid='ignore'):
+            values = sums / counts
+
+        if hours and location == self.sensor_location:
+            # 天气数据缺测的小时用本地传感器的温湿度补充
+            columns = [WEATHER_FIELDS.index(name) for name in SENSOR_COLUMNS]
+            sensor_sums = np.zeros((hours, len(columns)))
+            sensor_counts = np.zeros((hours, len(columns)))
+            chunks = self.database.iter_sensor_data(
+                first_hour * HOUR_MS, end_hour * HOUR_MS,
+                columns=('timestamp',) + tuple(SENSOR_COLUMNS.values()), as_arrays=True
+            )
+            for chunk in chunks:
+                self._accumulate(sensor_sums, sensor_counts, first_hour, chunk['timestamp'],
+                                 [chunk[name] for name in SENSOR_COLUMNS.values()])
+            with np.errstate(invalid='ignore'):
+                sensor_values = sensor_sums / sensor_counts
+            gaps = np.isnan(values[:, columns])
+            values[:, columns] = np.where(gaps, sensor_values, values[:, columns])
+        return values
+
+    @staticmethod
+    def _accumulate(sums: np.ndarray, counts: np.ndarray, first_hour: int,
+                    timestamps: np.ndarray, columns):
+        rows = timestamps // HOUR_MS - first_hour
+        for i, column in enumerate(columns):
+            valid = ~np.isnan(column)
+            sums[:, i] += np.bincount(rows[valid], weights=column[valid], minlength=len(sums))
+            counts[:, i] += np.bincount(rows[valid], minlength=len(sums))
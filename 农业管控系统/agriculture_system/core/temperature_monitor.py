@@ -1,46 +1,99 @@
 # agriculture_system/core/temperature_monitor.py
 import random
-from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.anomaly_detection import FLAG_OK, AnomalyDetector
+from ..utils.ring_buffer import RingBuffer
+from ..utils.sliding_window import DEFAULT_WINDOWS_MS, HOUR_MS, WindowTracker
+from ..utils.streaming_stats import StatisticsEngine
+from ..utils.time_utils import TimestampLike, now_ms, to_epoch_ms
+
+# 默认保留一周的分钟级读数
+DEFAULT_READING_CAPACITY = 7 * 24 * 60
+
+# DHT22 的测温量程
+TEMPERATURE_RANGE = (-40.0, 80.0)
+
+# 温度读数完全不变持续一小时（分钟级采样）判为探头卡死；湿度、pH 等不检测卡值
+TEMPERATURE_STUCK_SAMPLES = 60
 
 
 class TemperatureMonitor:
     """温度温差监控系统"""
 
-    def __init__(self):
-        self.temperature_readings = []
+    def __init__(self, capacity: int = DEFAULT_READING_CAPACITY,
+                 windows_ms: Sequence[int] = DEFAULT_WINDOWS_MS):
+        # 定长环形缓冲区，长期运行时内存占用不再增长
+        self.temperature_readings = RingBuffer(capacity)
+        # 24小时/7天温差由单调队列滑动窗口维护
+        self.window_tracker = WindowTracker(windows_ms)
+        # 累计/小时/天的均值、方差、EWMA 与分位数，随读数增量更新
+        self.statistics = StatisticsEngine()
+        # 尖峰/卡值/超量程的读数在入库和报警检查之前被剔除
+        self.anomaly_detector = AnomalyDetector(['temperature'], valid_range=TEMPERATURE_RANGE,
+                                                stuck_samples=TEMPERATURE_STUCK_SAMPLES)
         self.max_temp_threshold = 35
         self.min_temp_threshold = 5
 
     def read_temperature(self) -> float:
         """模拟读取温度传感器数据"""
         temperature = random.uniform(10, 40)
-        self.temperature_readings.append({
-            'temperature': temperature,
-            'timestamp': datetime.now()
-        })
+        self.record_temperature(temperature)
         return temperature
 
-    def calculate_temperature_difference(self, hours: int = 24) -> float:
-        """计算温差"""
-        if len(self.temperature_readings) < 2:
-            return 0
+    def record_temperature(self, temperature: float, timestamp: TimestampLike = None) -> int:
+        """记录一次温度读数（如来自硬件接口），timestamp 省略时使用当前时间
 
-        recent_readings = self.temperature_readings[-hours:]
-        temps = [r['temperature'] for r in recent_readings]
+        返回异常检测的标记位；被标记的读数不记录，也不参与温差与报警计算。
+        """
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        flags = self.anomaly_detector.check_one('temperature', temperature, ts)
+        if flags != FLAG_OK:
+            return flags
+        self.temperature_readings.append(temperature, ts)
+        self.window_tracker.update('temperature', temperature, ts)
+        self.statistics.update_one('temperature', temperature, ts)
+        return flags
 
-        return max(temps) - min(temps)
+    def recent_readings(self, count: Optional[int] = None,
+                        seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最近 count 个或最近 seconds 秒内读数的 (epoch毫秒, 温度) 数组视图"""
+        if seconds is not None:
+            return self.temperature_readings.since(seconds)
+        return self.temperature_readings.latest(count)
+
+    def get_temperature_statistics(self, window: str = 'day') -> Dict:
+        """当前窗口（total/hour/day）的温度统计量，O(1)"""
+        return self.statistics.stats('temperature', window)
+
+    def calculate_temperature_difference(self, hours: float = 24) -> float:
+        """计算最近 hours 小时内的温差
+
+        跟踪中的窗口（默认24小时、7天）直接读取滑动极值，均摊 O(1)；
+        其他窗口长度从环形缓冲区中按时间截取后计算。
+        """
+        window_ms = int(hours * HOUR_MS)
+        if window_ms in self.window_tracker.windows_ms:
+            return self.window_tracker.range('temperature', window_ms)
+
+        _, temps = self.temperature_readings.since(hours * 3600)
+        if len(temps) < 2:
+            return 0
+        return float(temps.max() - temps.min())
 
     def check_temperature_alert(self) -> Optional[str]:
         """检查温度异常报警"""
-        if not self.temperature_readings:
+        latest = self.temperature_readings.last()
+        if latest is None:
             return None
 
-        current_temp = self.temperature_readings[-1]['temperature']
+        current_temp = latest[1]
 
         if current_temp > self.max_temp_threshold:
             return f"高温警报！当前温度: {current_temp:.1f}°C"
         elif current_temp < self.min_temp_threshold:
             return f"低温警报！当前温度: {current_temp:.1f}°C"
 
-        return None
\ No newline at end of file
+        return None
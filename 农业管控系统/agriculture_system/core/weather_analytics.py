@@ -0,0 +1,321 @@
+# agriculture_system/core/weather_analytics.py
+import math
+import threading
+import time
+from collections import deque
+from datetime import date
+from typing import Dict, List, Optional
+
+from ..utils.time_utils import TimestampLike, from_epoch_ms, to_epoch_ms
+
+DAY_MS = 86400 * 1000
+
+# 滚动降雨量的窗口（天）
+RAINFALL_WINDOWS = (7, 30)
+
+# 学习到的月气候平均值至少积累这么多天才用于距平
+MIN_NORMAL_DAYS = 10
+
+
+def local_day(epoch_ms: int) -> int:
+    """epoch毫秒所在的本地日期序号（自 1970-01-01 起的天数）"""
+    return (epoch_ms // 1000 + time.localtime(epoch_ms // 1000).tm_gmtoff) // 86400
+
+
+class RollingSum:
+    """按日的滚动求和：每天的值入队一次、出队一次，均摊 O(1)，缺测的日子视为0"""
+
+    __slots__ = ('window', 'total', '_days')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.total = 0.0
+        self._days = deque()
+
+    def add(self, day: int, value: float):
+        self._days.append((day, value))
+        self.total += value
+        self.evict(day)
+
+    def evict(self, as_of_day: int):
+        while self._days and self._days[0][0] <= as_of_day - self.window:
+            self.total -= self._days.popleft()[1]
+
+
+class _RunningMoments:
+    """Welford 在线均值与方差"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+
+class _LocationState:
+    """单个地点的增量统计状态，大小与历史长度无关"""
+
+    def __init__(self):
+        self.observations = 0
+        self.late = 0
+        self.last_ts = 0
+        self.days = 0
+        # 当天（尚未结束）的累计值
+        self.day: Optional[int] = None
+        self.day_min = math.inf
+        self.day_max = -math.inf
+        self.day_sum = 0.0
+        self.day_count = 0
+        self.day_rainfall = 0.0
+        # 已结束各天的指标
+        self.last_closed: Optional[int] = None
+        self.season: Optional[int] = None
+        self.gdd = 0.0
+        self.gdd_7d = RollingSum(7)
+        self.rainfall = {window: RollingSum(window) for window in RAINFALL_WINDOWS}
+        self.frost_streak = 0
+        self.max_frost_streak = 0
+        self.heat_streak = 0
+        self.max_heat_streak = 0
+        self.heat_waves = 0
+        self.temperature_anomaly = math.nan
+        self.temperature_zscore = math.nan
+        # 按月学习的日平均温度与日降雨量
+        self.monthly_temperature = [_RunningMoments() for _ in range(12)]
+        self.monthly_rainfall = [_RunningMoments() for _ in range(12)]
+
+
+class WeatherAnalytics:
+    """增量天气分析：积温（GDD）、滚动降雨量、霜冻/高温连续天数与气候距平
+
+    每个地点保存当天的累计值和已结束各天的滚动统计，新观测按本地日期
+    归入当天；日期变化时把前一天结算进各项指标。每条观测的更新为 O(1)，
+    生成报告不回扫历史。sync() 只从数据库读取上次同步之后的新行。
+
+    积温按 (日最高 + 日最低)/2 - base_temperature 计算，日最高温度截断到
+    upper_temperature，每年 season_start_month 月重新累计。连续缺测超过
+    一天时霜冻/高温连续天数清零。距平相对 normals 中按月配置的气候平均值
+    （{地点或 'default': {'temperature': [12个月平均温度], 'rainfall': [12个月降雨量]}}），
+    未配置时使用该地点按月在线学习的平均值（至少 MIN_NORMAL_DAYS 天）。
+    """
+
+    def __init__(self, database=None, base_temperature: float = 10.0,
+                 upper_temperature: float = 30.0, frost_threshold: float = 0.0,
+                 heat_threshold: float = 35.0, heat_wave_days: int = 3,
+                 season_start_month: int = 1, normals: Optional[Dict] = None):
+        self.database = database
+        self.base_temperature = base_temperature
+        self.upper_temperature = upper_temperature
+        self.frost_threshold = frost_threshold
+        self.heat_threshold = heat_threshold
+        self.heat_wave_days = heat_wave_days
+        self.season_start_month = season_start_month
+        self.normals = normals or {}
+        self._states: Dict[str, _LocationState] = {}
+        self._synced: Dict[Optional[str], int] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, database=None, spec: Optional[Dict] = None) -> 'WeatherAnalytics':
+        spec = spec or {}
+        return cls(database,
+                   base_temperature=spec.get('base_temperature', 10.0),
+                   upper_temperature=spec.get('upper_temperature', 30.0),
+                   frost_threshold=spec.get('frost_threshold', 0.0),
+                   heat_threshold=spec.get('heat_threshold', 35.0),
+                   heat_wave_days=spec.get('heat_wave_days', 3),
+                   season_start_month=spec.get('season_start_month', 1),
+                   normals=spec.get('normals'))
+
+    @property
+    def locations(self) -> List[str]:
+        with self._lock:
+            return list(self._states)
+
+    def observe(self, location: str, timestamp: TimestampLike, temperature: Optional[float],
+                rainfall: Optional[float] = 0.0) -> bool:
+        """加入一条观测；早于或等于该地点最新观测时间的数据忽略并返回 False"""
+        ts = to_epoch_ms(timestamp)
+        with self._lock:
+            state = self._states.get(location)
+            if state is None:
+                state = self._states[location] = _LocationState()
+            if ts <= state.last_ts:
+                state.late += 1
+                return False
+            state.last_ts = ts
+            state.observations += 1
+
+            day = local_day(ts)
+            if state.day is not None and day != state.day:
+                self._close_day(location, state)
+            if state.day != day:
+                state.day = day
+                state.day_min, state.day_max = math.inf, -math.inf
+                state.day_sum, state.day_count, state.day_rainfall = 0.0, 0, 0.0
+
+            if temperature is not None and temperature == temperature:
+                state.day_min = min(state.day_min, temperature)
+                state.day_max = max(state.day_max, temperature)
+                state.day_sum += temperature
+                state.day_count += 1
+            if rainfall is not None and rainfall == rainfall:
+                state.day_rainfall += rainfall
+            return True
+
+    def sync(self, location: Optional[str] = None, chunk_size: int = 5000) -> int:
+        """从数据库读取上次同步之后的新观测，location 为空时同步全部地点，返回处理的行数
+
+        按地点同步与全部同步各自记录读取到的最新时间；按地点同步也从全部同步的
+        位置之后开始。两者读取范围重叠时，已同步过的行（不晚于该地点最新观测）
+        直接跳过，不计为迟到数据。
+        """
+        if self.database is None:
+            return 0
+        columns = ('timestamp', 'location', 'temperature', 'rainfall')
+        with self._lock:
+            watermarks = [self._synced.get(key) for key in {location, None}]
+            watermark = max((mark for mark in watermarks if mark is not None), default=None)
+            start = None if watermark is None else watermark + 1
+            processed = 0
+            for chunk in self.database.iter_weather_data(location, start=start, columns=columns,
+                                                         chunk_size=chunk_size, as_arrays=True):
+                rows = zip(chunk['location'].tolist(), chunk['timestamp'].tolist(),
+                           chunk['temperature'].tolist(), chunk['rainfall'].tolist())
+                for row_location, ts, temperature, rainfall in rows:
+                    watermark = ts
+                    state = self._states.get(row_location)
+                    if state is not None and ts <= state.last_ts:
+                        continue
+                    self.observe(row_location, ts, temperature, rainfall)
+                    processed += 1
+            if watermark is not None:
+                self._synced[location] = watermark
+            return processed
+
+    def analyze(self, location: str) -> Dict:
+        """某地点的当前分析结果"""
+        with self._lock:
+            state = self._states.get(location)
+            if state is None:
+                return {'location': location, 'observations': 0}
+            if state.day is not None:
+                for window in state.rainfall.values():
+                    window.evict(state.day)
+                state.gdd_7d.evict(state.day)
+            today_rainfall = state.day_rainfall
+            rainfall = {f'rainfall_{window}d': round(rolling.total + today_rainfall, 2)
+                        for window, rolling in state.rainfall.items()}
+            normal_rain = self._normal(location, state, 'rainfall', state.day)
+            longest = max(RAINFALL_WINDOWS)
+            return dict(
+                location=location,
+                observations=state.observations,
+                late_observations=state.late,
+                days=state.days,
+                last_observation=from_epoch_ms(state.last_ts).isoformat(),
+                growing_degree_days=round(state.gdd, 2),
+                gdd_7d=round(state.gdd_7d.total, 2),
+                **rainfall,
+                frost_streak=state.frost_streak,
+                max_frost_streak=state.max_frost_streak,
+                heat_streak=state.heat_streak,
+                max_heat_streak=state.max_heat_streak,
+                heat_wave=state.heat_streak >= self.heat_wave_days,
+                heat_waves=state.heat_waves,
+                temperature_anomaly=_rounded(state.temperature_anomaly),
+                temperature_zscore=_rounded(state.temperature_zscore),
+                rainfall_anomaly=_rounded(
+                    rainfall[f'rainfall_{longest}d'] - normal_rain * longest
+                    if normal_rain is not None else math.nan
+                ),
+                today={
+                    'min_temperature': _rounded(state.day_min if state.day_count else math.nan),
+                    'max_temperature': _rounded(state.day_max if state.day_count else math.nan),
+                    'mean_temperature': _rounded(state.day_sum / state.day_count
+                                                 if state.day_count else math.nan),
+                    'rainfall': round(today_rainfall, 2),
+                },
+            )
+
+    def analyze_all(self) -> Dict[str, Dict]:
+        return {location: self.analyze(location) for location in self.locations}
+
+    def _close_day(self, location: str, state: _LocationState):
+        """结算 state.day 这一天"""
+        day = state.day
+        state.days += 1
+        month = date.fromordinal(day + 719163).month - 1
+
+        gap = state.last_closed is not None and day - state.last_closed > 1
+        if gap:
+            state.frost_streak = state.heat_streak = 0
+        state.last_closed = day
+
+        for rolling in state.rainfall.values():
+            rolling.add(day, state.day_rainfall)
+        state.monthly_rainfall[month].add(state.day_rainfall)
+
+        if not state.day_count:
+            state.frost_streak = state.heat_streak = 0
+            return
+
+        # 积温：每年从 season_start_month 起重新累计
+        year = date.fromordinal(day + 719163).year
+        season = year if month + 1 >= self.season_start_month else year - 1
+        if season != state.season:
+            state.season, state.gdd = season, 0.0
+        high = min(state.day_max, self.upper_temperature)
+        low = min(state.day_min, high)
+        gdd = max((high + low) / 2 - self.base_temperature, 0.0)
+        state.gdd += gdd
+        state.gdd_7d.add(day, gdd)
+
+        state.frost_streak = state.frost_streak + 1 if state.day_min <= self.frost_threshold else 0
+        state.max_frost_streak = max(state.max_frost_streak, state.frost_streak)
+        state.heat_streak = state.heat_streak + 1 if state.day_max >= self.heat_threshold else 0
+        state.max_heat_streak = max(state.max_heat_streak, state.heat_streak)
+        if state.heat_streak == self.heat_wave_days:
+            state.heat_waves += 1
+
+        # 距平先与当日之前的气候平均值比较，再把当日计入学习的平均值
+        mean = state.day_sum / state.day_count
+        normal = self._normal(location, state, 'temperature', day)
+        moments = state.monthly_temperature[month]
+        state.temperature_anomaly = mean - normal if normal is not None else math.nan
+        state.temperature_zscore = (state.temperature_anomaly / moments.std
+                                    if moments.count >= MIN_NORMAL_DAYS and moments.std > 0
+                                    else math.nan)
+        moments.add(mean)
+
+    def _normal(self, location: str, state: _LocationState, metric: str,
+                day: Optional[int]) -> Optional[float]:
+        """当月的气候平均值：温度为日平均温度，降雨为日降雨量"""
+        if day is None:
+            return None
+        month = date.fromordinal(day + 719163).month - 1
+        configured = self.normals.get(location, self.normals.get('default', {})).get(metric)
+        if configured:
+            value = configured[month]
+            if metric == 'rainfall':
+                # 配置的是月降雨量
+                return value / 30.0
+            return value
+        moments = (state.monthly_temperature if metric == 'temperature'
+                   else state.monthly_rainfall)[month]
+        return moments.mean if moments.count >= MIN_NORMAL_DAYS else None
+
+
+def _rounded(value: float, digits: int = 2) -> Optional[float]:
+    return None if value != value else round(value, digits)
@@ -0,0 +1,235 @@
+# agriculture_system/core/weather_scheduler.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60.0
+DAY = 86400.0
+
+
+class QuotaTracker:
+    """上游API调用配额：按滚动的1分钟与24小时窗口统计调用次数
+
+    OpenWeatherMap 免费套餐为每分钟60次；per_day 按所购套餐配置。
+    try_acquire() 在两个窗口都有余量时记一次调用并返回 True。
+    """
+
+    def __init__(self, per_minute: int = 60, per_day: int = 1000):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.denied = 0
+        self._minute = deque()
+        self._day = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, spec: Optional[Dict]) -> 'QuotaTracker':
+        spec = spec or {}
+        return cls(spec.get('per_minute', 60), spec.get('per_day', 1000))
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._trim(now)
+            if len(self._minute) >= self.per_minute or len(self._day) >= self.per_day:
+                self.denied += 1
+                return False
+            self._minute.append(now)
+            self._day.append(now)
+            return True
+
+    def remaining(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """(本分钟剩余次数, 24小时内剩余次数)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._trim(now)
+            return self.per_minute - len(self._minute), self.per_day - len(self._day)
+
+    def pressure(self, now: Optional[float] = None) -> float:
+        """两个窗口中较高的已用比例，0~1"""
+        minute_left, day_left = self.remaining(now)
+        return max(1 - minute_left / self.per_minute, 1 - day_left / self.per_day)
+
+    def _trim(self, now: float):
+        while self._minute and self._minute[0] <= now - MINUTE:
+            self._minute.popleft()
+        while self._day and self._day[0] <= now - DAY:
+            self._day.popleft()
+
+
+class WeatherRefreshScheduler:
+    """按配额调度各地点实时天气的后台刷新
+
+    每个登记的地点记录消费者数（看板、报表等订阅方）。tick() 按
+    refresh_share × per_day / 24小时 的匀速积累刷新额度（最多 burst 次），
+    额度内从距上次获取已超过 min_interval 的地点中按
+    “过期秒数 × 消费者数” 从高到低并发刷新，因此全天的刷新均匀分布，
+    剩余的 1 - refresh_share 配额留给缓存未命中时的即时请求。
+
+    get_weather() 供消费者读取：优先缓存与上游，配额不足或上游失败时
+    退回缓存中的旧值，再退回数据库 weather_data 中该地点最近一条记录，
+    而不是模拟数据。获取到的新观测写入 weather_data（按时间戳去重）。
+    """
+
+    def __init__(self, service, quota: QuotaTracker, database=None,
+                 refresh_share: float = 0.8, min_interval: float = 600.0,
+                 burst: int = 10, country: str = "CN"):
+        self.service = service
+        self.quota = quota
+        self.database = database
+        self.refresh_share = refresh_share
+        self.min_interval = min_interval
+        self.burst = burst
+        self.country = country
+        self.stats = {'refreshed': 0, 'deferred': 0, 'degraded_cache': 0,
+                      'degraded_database': 0, 'unavailable': 0}
+        self._consumers: Dict[str, int] = {}
+        self._last_saved: Dict[str, object] = {}
+        self._tokens = float(burst)
+        self._last_tick: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, service, quota: QuotaTracker, database=None,
+                    spec: Optional[Dict] = None) -> 'WeatherRefreshScheduler':
+        spec = spec or {}
+        return cls(service, quota, database,
+                   refresh_share=spec.get('refresh_share', 0.8),
+                   min_interval=spec.get('min_refresh_interval', 600.0),
+                   burst=spec.get('burst', 10))
+
+    @property
+    def locations(self) -> Dict[str, int]:
+        """{地点: 消费者数}"""
+        with self._lock:
+            return dict(self._consumers)
+
+    def register(self, location: str, consumers: int = 1):
+        with self._lock:
+            self._consumers[location] = self._consumers.get(location, 0) + consumers
+
+    def unregister(self, location: str, consumers: int = 1):
+        with self._lock:
+            remaining = self._consumers.get(location, 0) - consumers
+            if remaining > 0:
+                self._consumers[location] = remaining
+            else:
+                self._consumers.pop(location, None)
+
+    @property
+    def refresh_rate(self) -> float:
+        """匀速分摊后每秒可用于后台刷新的调用次数"""
+        return self.refresh_share * self.quota.per_day / DAY
+
+    def plan(self) -> List[str]:
+        """按优先级排序的待刷新地点（不消耗额度）"""
+        with self._lock:
+            consumers = dict(self._consumers)
+        scored = []
+        for location, count in consumers.items():
+            age = self.service.cache_age(location, country=self.country)
+            if age >= self.min_interval:
+                # 从未获取过的地点最优先
+                staleness = age if age != float('inf') else DAY * 365
+                scored.append((staleness * count, location))
+        scored.sort(reverse=True)
+        return [location for _, location in scored]
+
+    def tick(self, now: Optional[float] = None) -> List[str]:
+        """积累刷新额度并刷新优先级最高的地点，返回本次刷新的地点"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._last_tick is not None:
+                self._tokens = min(float(self.burst),
+                                   self._tokens + (now - self._last_tick) * self.refresh_rate)
+            self._last_tick = now
+        candidates = self.plan()
+        if not candidates:
+            return []
+
+        minute_left, day_left = self.quota.remaining(now)
+        # 至少给即时请求保留 1 - refresh_share 的日配额
+        reserve = int((1 - self.refresh_share) * self.quota.per_day)
+        with self._lock:
+            budget = min(int(self._tokens), minute_left, max(day_left - reserve, 0))
+            selected = candidates[:max(budget, 0)]
+            self._tokens -= len(selected)
+        self.stats['deferred'] += len(candidates) - len(selected)
+        if not selected:
+            return []
+
+        results = self.service.get_current_weather_many(selected, self.country, refresh=True)
+        refreshed = [location for location, weather in results.items() if weather is not None]
+        for location in refreshed:
+            self._save(location, results[location])
+        self.stats['refreshed'] += len(refreshed)
+        return refreshed
+
+    def get_weather(self, location: str) -> Optional[Dict]:
+        """读取实时天气，配额不足或上游失败时依次退回缓存旧值与数据库最近记录"""
+        weather = self.service.get_current_weather(location, self.country)
+        if weather is not None:
+            self._save(location, weather)
+            return weather
+        return self.last_known(location)
+
+    def get_weather_many(self, locations: Sequence[str]) -> Dict[str, Optional[Dict]]:
+        results = self.service.get_current_weather_many(locations, self.country)
+        for location, weather in results.items():
+            if weather is not None:
+                self._save(location, weather)
+            else:
+                results[location] = self.last_known(location)
+        return results
+
+    def last_known(self, location: str) -> Optional[Dict]:
+        """不发请求的最近已知天气：缓存中的旧值，其次 weather_data 中的最近记录"""
+        weather = self.service.cached_current_weather(location, self.country)
+        if weather is not None:
+            self.stats['degraded_cache'] += 1
+            return dict(weather, stale=True)
+        if self.database is not None:
+            record = self.database.get_latest_weather(location)
+            if record is not None:
+                self.stats['degraded_database'] += 1
+                return dict(record, stale=True)
+        self.stats['unavailable'] += 1
+        return None
+
+    def start(self, interval: float = 30.0):
+        """在后台线程中每 interval 秒调用一次 tick()"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name='weather-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"天气刷新失败: {e}")
+
+    def _save(self, location: str, weather: Dict):
+        if self.database is None:
+            return
+        timestamp = weather.get('timestamp')
+        with self._lock:
+            if self._last_saved.get(location) == timestamp:
+                return
+            self._last_saved[location] = timestamp
+        self.database.save_weather_data(weather, location)
@@ -0,0 +1,186 @@
+# agriculture_system/core/weather_series.py
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from ..utils.time_utils import TimestampLike, from_epoch_ms, now_ms, to_epoch_ms
+
+# 列名，与 WeatherData 的数值字段一一对应
+WEATHER_FIELDS = ('temperature', 'humidity', 'rainfall', 'wind_speed')
+
+# 模拟数据的取值范围（与原逐日 random.uniform 一致）
+SIMULATED_RANGES = {
+    'temperature': (15.0, 35.0),
+    'humidity': (30.0, 90.0),
+    'rainfall': (0.0, 50.0),
+    'wind_speed': (0.0, 15.0),
+}
+
+DAY_MS = 86400 * 1000
+
+
+@dataclass
+class WeatherData:
+    temperature: float
+    humidity: float
+    rainfall: float
+    wind_speed: float
+    timestamp: datetime
+
+
+class WeatherSeries:
+    """列式天气序列
+
+    temperature/humidity/rainfall/wind_speed 各为一个 float64 数组，
+    timestamps 为 datetime64[ms] 索引（UTC epoch）。长时段或多地点的预报
+    只分配几个数组，不再逐条创建对象；迭代和整数下标仍得到 WeatherData
+    （timestamp 为本地时间的 datetime），兼容原来按属性读取的代码。
+    切片返回共享内存的子序列。缺测值为 NaN。
+    """
+
+    __slots__ = ('timestamps', 'temperature', 'humidity', 'rainfall', 'wind_speed', 'location')
+
+    def __init__(self, timestamps, temperature, humidity, rainfall, wind_speed,
+                 location: Optional[str] = None):
+        self.timestamps = np.asarray(timestamps).astype('datetime64[ms]')
+        self.location = location
+        for name, values in zip(WEATHER_FIELDS, (temperature, humidity, rainfall, wind_speed)):
+            column = np.asarray(values, dtype=np.float64)
+            if column.shape != self.timestamps.shape:
+                raise ValueError(f"{name} 的长度与时间索引不一致")
+            setattr(self, name, column)
+
+    @classmethod
+    def from_columns(cls, epoch_ms: Sequence[int], columns: Dict[str, Sequence[float]],
+                     location: Optional[str] = None) -> 'WeatherSeries':
+        """由 epoch毫秒时间戳与 {字段: 数组} 创建，缺少的字段填 NaN"""
+        epoch_ms = np.asarray(epoch_ms, dtype=np.int64)
+        missing = np.full(len(epoch_ms), np.nan)
+        return cls(epoch_ms.astype('datetime64[ms]'),
+                   *(columns.get(name, missing) for name in WEATHER_FIELDS),
+                   location=location)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict],
+                     location: Optional[str] = None) -> 'WeatherSeries':
+        """由 {'timestamp', 'temperature', ...} 字典列表（如 parse_forecast、数据库查询结果）创建"""
+        epoch_ms = [to_epoch_ms(record.get('timestamp')) for record in records]
+        columns = {
+            name: np.array([record.get(name) for record in records], dtype=np.float64)
+            for name in WEATHER_FIELDS
+        }
+        return cls.from_columns(epoch_ms, columns, location)
+
+    @classmethod
+    def from_openweathermap(cls, data: Dict, days: Optional[int] = None,
+                            location: Optional[str] = None) -> 'WeatherSeries':
+        """直接解析 OpenWeatherMap /forecast 响应（每3小时一个点），days 限制天数"""
+        items = data['list'] if days is None else data['list'][:days * 8]
+        n = len(items)
+        epoch_ms = np.fromiter((item['dt'] for item in items), dtype=np.int64, count=n) * 1000
+        columns = {
+            'temperature': np.fromiter((item['main']['temp'] for item in items),
+                                       dtype=np.float64, count=n),
+            'humidity': np.fromiter((item['main']['humidity'] for item in items),
+                                    dtype=np.float64, count=n),
+            'rainfall': np.fromiter((item.get('rain', {}).get('3h', 0) for item in items),
+                                    dtype=np.float64, count=n),
+            'wind_speed': np.fromiter((item.get('wind', {}).get('speed', np.nan) for item in items),
+                                      dtype=np.float64, count=n),
+        }
+        return cls.from_columns(epoch_ms, columns, location)
+
+    @classmethod
+    def simulate(cls, days: int, start: TimestampLike = None, location: Optional[str] = None,
+                 rng: Optional[np.random.Generator] = None) -> 'WeatherSeries':
+        """向量化生成逐日模拟预报"""
+        return cls.simulate_many([location], days, start, rng)[0]
+
+    @classmethod
+    def simulate_many(cls, locations: Sequence[Optional[str]], days: int,
+                      start: TimestampLike = None,
+                      rng: Optional[np.random.Generator] = None) -> List['WeatherSeries']:
+        """为多个地点生成逐日模拟预报：全部数值一次分配为 (字段, 地点, 天) 数组，
+        各地点的序列是其中的视图，共用同一个时间索引"""
+        rng = rng if rng is not None else np.random.default_rng()
+        start_ms = now_ms() if start is None else to_epoch_ms(start)
+        timestamps = (start_ms + np.arange(days, dtype=np.int64) * DAY_MS).astype('datetime64[ms]')
+        low = np.array([SIMULATED_RANGES[name][0] for name in WEATHER_FIELDS])[:, None, None]
+        high = np.array([SIMULATED_RANGES[name][1] for name in WEATHER_FIELDS])[:, None, None]
+        block = rng.uniform(low, high, size=(len(WEATHER_FIELDS), len(locations), days))
+        return [cls(timestamps, *block[:, i], location=location)
+                for i, location in enumerate(locations)]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __iter__(self) -> Iterator[WeatherData]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, item: Union[int, slice, np.ndarray]):
+        if isinstance(item, (int, np.integer)):
+            return WeatherData(
+                temperature=float(self.temperature[item]),
+                humidity=float(self.humidity[item]),
+                rainfall=float(self.rainfall[item]),
+                wind_speed=float(self.wind_speed[item]),
+                timestamp=from_epoch_ms(int(self.epoch_ms[item]))
+            )
+        return WeatherSeries(self.timestamps[item],
+                             *(getattr(self, name)[item] for name in WEATHER_FIELDS),
+                             location=self.location)
+
+    def __repr__(self) -> str:
+        span = f"{self.timestamps[0]} ~ {self.timestamps[-1]}" if len(self) else "空"
+        return f"WeatherSeries(location={self.location!r}, {len(self)} 条, {span})"
+
+    @property
+    def epoch_ms(self) -> np.ndarray:
+        return self.timestamps.astype(np.int64)
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in WEATHER_FIELDS:
+            raise KeyError(f"未知的天气字段: {name}")
+        return getattr(self, name)
+
+    def daily(self) -> 'WeatherSeries':
+        """按本地日期汇总：温度、湿度取平均，降雨求和，风速取最大"""
+        if not len(self):
+            return self
+        # 本地时区相对 UTC 的偏移，按第一个时间点取
+        first = from_epoch_ms(int(self.epoch_ms[0])).astimezone()
+        offset_ms = int(first.utcoffset().total_seconds() * 1000)
+        days, index = np.unique((self.epoch_ms + offset_ms) // DAY_MS, return_inverse=True)
+
+        def mean(values):
+            valid = ~np.isnan(values)
+            total = np.bincount(index, weights=np.where(valid, values, 0.0), minlength=len(days))
+            count = np.bincount(index, weights=valid.astype(np.float64), minlength=len(days))
+            with np.errstate(invalid='ignore'):
+                return total / count
+
+        wind = np.full(len(days), -np.inf)
+        np.maximum.at(wind, index, np.where(np.isnan(self.wind_speed), -np.inf, self.wind_speed))
+        wind[np.isinf(wind)] = np.nan
+        rainfall = np.bincount(index, weights=np.nan_to_num(self.rainfall), minlength=len(days))
+        return WeatherSeries.from_columns(
+            days * DAY_MS - offset_ms,
+            {'temperature': mean(self.temperature), 'humidity': mean(self.humidity),
+             'rainfall': rainfall, 'wind_speed': wind},
+            self.location
+        )
+
+    def to_records(self) -> List[Dict]:
+        """转换为可 JSON 序列化的字典列表（时间为本地时间 ISO 字符串，NaN 为 None）"""
+        epoch_ms = self.epoch_ms.tolist()
+        columns = [
+            [None if value != value else value for value in getattr(self, name).tolist()]
+            for name in WEATHER_FIELDS
+        ]
+        return [
+            dict(zip(WEATHER_FIELDS, values), timestamp=from_epoch_ms(ts).isoformat())
+            for ts, *values in zip(epoch_ms, *columns)
+        ]
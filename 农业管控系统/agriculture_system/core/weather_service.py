@@ -0,0 +1,193 @@
+# agriculture_system/core/weather_service.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from ..utils.http_client import DEFAULT_TIMEOUT, CachedHttpClient, QuotaExceeded
+from .weather_series import WeatherSeries
+
+DEFAULT_BASE_URL = "http://api.openweathermap.org/data/2.5"
+
+# 配置文件模板中的占位密钥，视为未配置
+PLACEHOLDER_API_KEYS = ('your_api_key_here', 'your_weather_api_key_here')
+
+# 实况与预报（每3小时一个数据点）在无缓存头时的新鲜时长（秒）
+CURRENT_TTL = 600.0
+FORECAST_TTL = 3 * 3600.0
+
+# 批量获取时同时进行的上游请求数上限
+MAX_CONCURRENCY = 8
+
+logger = logging.getLogger(__name__)
+
+
+def api_key_configured(api_key: Optional[str]) -> bool:
+    return bool(api_key) and api_key not in PLACEHOLDER_API_KEYS
+
+
+def parse_current(data: Dict) -> Dict:
+    """OpenWeatherMap /weather 响应转换为实况数据"""
+    return {
+        'temperature': data['main']['temp'],
+        'humidity': data['main']['humidity'],
+        'pressure': data['main']['pressure'],
+        'description': data['weather'][0]['description'],
+        'wind_speed': data['wind']['speed'],
+        'rainfall': data.get('rain', {}).get('1h', 0),
+        'timestamp': datetime.fromtimestamp(data['dt']) if 'dt' in data else datetime.now()
+    }
+
+
+def parse_forecast(data: Dict, days: int) -> List[Dict]:
+    """OpenWeatherMap /forecast 响应转换为前 days 天的逐3小时预报"""
+    return [
+        {
+            'timestamp': datetime.fromtimestamp(item['dt']),
+            'temperature': item['main']['temp'],
+            'humidity': item['main']['humidity'],
+            'description': item['weather'][0]['description'],
+            'wind_speed': item.get('wind', {}).get('speed', 0),
+            'rainfall': item.get('rain', {}).get('3h', 0)
+        }
+        for item in data['list'][:days * 8]
+    ]
+
+
+class RealWeatherService:
+    """真实天气API服务
+
+    请求经由 CachedHttpClient：共用连接池与 keep-alive，临时错误自动退避重试，
+    响应按 (城市, 国家, 接口) 缓存并遵循上游的缓存头，过期后先返回旧值再后台刷新。
+    批量接口在最多 max_concurrency 个线程中并发请求，相同的键只请求一次。
+    """
+
+    CURRENT = 'weather'
+    FORECAST = 'forecast'
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL,
+                 client: Optional[CachedHttpClient] = None,
+                 current_ttl: float = CURRENT_TTL, forecast_ttl: float = FORECAST_TTL,
+                 max_concurrency: int = MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.client = client or CachedHttpClient(pool_size=max_concurrency)
+        self.ttl = {self.CURRENT: current_ttl, self.FORECAST: forecast_ttl}
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, api_key: str, spec: Optional[Dict] = None,
+                    quota=None) -> 'RealWeatherService':
+        """按 weather_service 配置段创建（超时、连接池、重试与缓存时长，单位秒）
+
+        quota 为上游调用配额（见 weather_scheduler.QuotaTracker），省略时不限。
+        """
+        spec = spec or {}
+        max_concurrency = spec.get('max_concurrency', MAX_CONCURRENCY)
+        client = CachedHttpClient(
+            timeout=(DEFAULT_TIMEOUT[0], spec.get('timeout', DEFAULT_TIMEOUT[1])),
+            pool_size=max(spec.get('pool_size', 10), max_concurrency),
+            retries=spec.get('retries', 3),
+            backoff_factor=spec.get('backoff_factor', 0.5),
+            stale_ttl=spec.get('stale_ttl', 3600.0),
+            max_entries=spec.get('cache_size', 1000),
+            quota=quota
+        )
+        return cls(api_key, spec.get('base_url', DEFAULT_BASE_URL), client,
+                   spec.get('current_ttl', CURRENT_TTL), spec.get('forecast_ttl', FORECAST_TTL),
+                   max_concurrency)
+
+    @staticmethod
+    def cache_key(city: str, country: str, endpoint: str) -> tuple:
+        return city, country, endpoint
+
+    def get_current_weather(self, city: str, country: str = "CN",
+                            refresh: bool = False) -> Optional[Dict]:
+        """获取当前天气数据；refresh 为 True 时忽略缓存的新鲜度向上游刷新"""
+        data = self._request(self.CURRENT, city, country, refresh)
+        try:
+            return parse_current(data) if data is not None else None
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning(f"天气数据格式错误 ({city}): {e}")
+            return None
+
+    def get_forecast(self, city: str, days: int = 3, country: str = "CN") -> Optional[List[Dict]]:
+        """获取天气预报"""
+        data = self._request(self.FORECAST, city, country)
+        try:
+            return parse_forecast(data, days) if data is not None else None
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning(f"天气预报格式错误 ({city}): {e}")
+            return None
+
+    def get_forecast_series(self, city: str, days: int = 3,
+                            country: str = "CN") -> Optional[WeatherSeries]:
+        """获取天气预报，直接解析为列式的 WeatherSeries"""
+        data = self._request(self.FORECAST, city, country)
+        try:
+            return WeatherSeries.from_openweathermap(data, days, city) if data is not None else None
+        except (KeyError, IndexError, TypeError) as e:
+            logger.warning(f"天气预报格式错误 ({city}): {e}")
+            return None
+
+    def get_current_weather_many(self, cities: Sequence[str], country: str = "CN",
+                                 refresh: bool = False) -> Dict[str, Optional[Dict]]:
+        """并发获取多个城市的当前天气，返回 {城市: 数据或 None}"""
+        return self._map(lambda city: self.get_current_weather(city, country, refresh), cities)
+
+    def get_forecast_many(self, cities: Sequence[str], days: int = 3,
+                          country: str = "CN") -> Dict[str, Optional[WeatherSeries]]:
+        """并发获取多个城市的天气预报，返回 {城市: WeatherSeries 或 None}"""
+        return self._map(lambda city: self.get_forecast_series(city, days, country), cities)
+
+    def cached_current_weather(self, city: str, country: str = "CN") -> Optional[Dict]:
+        """缓存中的当前天气（不论是否过期，不发请求），没有时返回 None"""
+        entry = self.client.peek(self.cache_key(city, country, self.CURRENT))
+        if entry is None:
+            return None
+        try:
+            return parse_current(entry.data)
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    def cache_age(self, city: str, endpoint: str = CURRENT, country: str = "CN") -> float:
+        """缓存条目距上次从上游获取的秒数，没有缓存时为 inf"""
+        entry = self.client.peek(self.cache_key(city, country, endpoint))
+        return entry.age if entry is not None else float('inf')
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.client.close()
+
+    def _map(self, fetch, cities: Sequence[str]) -> Dict[str, object]:
+        unique = list(dict.fromkeys(cities))
+        if len(unique) <= 1:
+            return {city: fetch(city) for city in unique}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                thread_name_prefix='weather-fetch')
+        return dict(zip(unique, self._executor.map(fetch, unique)))
+
+    def _request(self, endpoint: str, city: str, country: str,
+                 refresh: bool = False) -> Optional[Dict]:
+        params = {
+            'q': f"{city},{country}",
+            'appid': self.api_key,
+            'units': 'metric',
+            'lang': 'zh_cn'
+        }
+        try:
+            return self.client.get_json(f"{self.base_url}/{endpoint}", params,
+                                        key=self.cache_key(city, country, endpoint),
+                                        ttl=self.ttl[endpoint], refresh=refresh)
+        except QuotaExceeded:
+            logger.debug(f"配额不足，未请求 {endpoint} {city}")
+            return None
+        except Exception as e:
+            # 异常信息中的 URL 含 appid，写日志前隐去密钥
+            message = str(e).replace(self.api_key, '***')
+            logger.warning(f"获取天气数据失败 ({endpoint} {city}): {message}")
+            return None
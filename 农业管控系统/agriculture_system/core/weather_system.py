@@ -1,57 +1,116 @@
 import random
-from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import List
-
-@dataclass
-class WeatherData:
-    temperature: float
-    humidity: float
-    rainfall: float
-    wind_speed: float
-    timestamp: datetime
+from typing import Dict, Optional, Sequence
+
+from .nowcast import LocalWeatherForecaster
+from .weather_analytics import WeatherAnalytics
+from .weather_scheduler import QuotaTracker, WeatherRefreshScheduler
+from .weather_series import WeatherData, WeatherSeries
+from .weather_service import RealWeatherService, api_key_configured
+
 
 class WeatherSystem:
     def __init__(self, api_key: str = None):
         self.api_key = api_key
         self.weather_history = []
 
-    def get_weather_forecast(self, location: str, days: int = 3):
-        forecasts = []
-        current_time = datetime.now()
-
-        for i in range(days):
-            forecast_time = current_time + timedelta(days=i)
-            weather = WeatherData(
-                temperature=random.uniform(15, 35),
-                humidity=random.uniform(30, 90),
-                rainfall=random.uniform(0, 50),
-                wind_speed=random.uniform(0, 15),
-                timestamp=forecast_time
-            )
-            forecasts.append(weather)
+    def get_weather_forecast(self, location: str, days: int = 3) -> WeatherSeries:
+        """未来 days 天的逐日预报，迭代得到 WeatherData"""
+        return WeatherSeries.simulate(days, location=location)
 
-        print(f"已生成未来{days}天天气预测")
-        return forecasts
+    def get_weather_forecasts(self, locations: Sequence[str],
+                              days: int = 3) -> Dict[str, WeatherSeries]:
+        """多个地点的逐日预报，数值共用一次分配的数组"""
+        unique = list(dict.fromkeys(locations))
+        return dict(zip(unique, WeatherSeries.simulate_many(unique, days)))
 
 
 class EnhancedWeatherSystem(WeatherSystem):
     """增强的天气系统，集成真实API"""
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, service_config: Optional[Dict] = None,
+                 database=None, quota_config: Optional[Dict] = None,
+                 analytics_config: Optional[Dict] = None,
+                 nowcast_config: Optional[Dict] = None):
         super().__init__(api_key)
-        # 这里可以初始化真实天气服务，但我们现在只是模拟
-        self.real_weather_service = None  # 实际中这里可能是RealWeatherService(api_key)
+        # 基于 weather_data 的增量分析，每次只读取新写入的观测
+        self.analytics = WeatherAnalytics.from_config(database, analytics_config)
+        # 未配置（或仍是模板占位）密钥时用历史数据训练的本地模型预测，
+        # 没有足够历史时才使用模拟数据
+        self.forecaster = (LocalWeatherForecaster.from_config(database, nowcast_config)
+                           if database is not None else None)
+        self.real_weather_service = None
+        self.quota = None
+        self.scheduler = None
+        if api_key_configured(api_key):
+            # 所有上游调用共用一个配额；配额不足时退回缓存或数据库中的最近值
+            self.quota = QuotaTracker.from_config(quota_config)
+            self.real_weather_service = RealWeatherService.from_config(
+                api_key, service_config, self.quota
+            )
+            self.scheduler = WeatherRefreshScheduler.from_config(
+                self.real_weather_service, self.quota, database, quota_config
+            )
 
     def get_real_time_weather(self, location: str):
         """获取实时天气数据"""
-        # 如果配置了真实API，则使用真实数据，否则使用模拟数据
-        if self.real_weather_service:
-            return self.real_weather_service.get_current_weather(location)
+        # 如果配置了真实API，则使用真实数据，否则使用本地模型的预测
+        if self.scheduler:
+            return self.scheduler.get_weather(location)
+        weather = self.forecaster.nowcast(location) if self.forecaster else None
+        if weather is not None:
+            return weather
         else:
-            # 模拟数据
+            # 历史数据不足时的模拟数据
             return {
                 'temperature': random.uniform(10, 35),
                 'humidity': random.uniform(30, 90),
                 'description': '晴朗'
-            }
\ No newline at end of file
+            }
+
+    def get_weather_forecast(self, location: str, days: int = 3) -> WeatherSeries:
+        """未配置真实API时的逐日预报：本地模型预测，历史数据不足时为模拟数据"""
+        forecast = self.forecaster.forecast(location, days) if self.forecaster else None
+        if forecast is not None:
+            return forecast
+        return super().get_weather_forecast(location, days)
+
+    def get_weather_forecasts(self, locations: Sequence[str],
+                              days: int = 3) -> Dict[str, WeatherSeries]:
+        if self.forecaster is None:
+            return super().get_weather_forecasts(locations, days)
+        return {location: self.get_weather_forecast(location, days)
+                for location in dict.fromkeys(locations)}
+
+    def get_weather_for_locations(self, locations: Sequence[str],
+                                  forecast_days: Optional[int] = None) -> Dict[str, object]:
+        """批量获取多个地点的天气，返回 {地点: 数据}
+
+        forecast_days 为 None 时取实时天气，否则取该天数的预报。配置了真实API时
+        并发请求（并发数上限见 weather_service.max_concurrency），重复的地点与
+        其他调用方同时进行的相同请求只会产生一次上游调用。
+        """
+        service = self.real_weather_service
+        if forecast_days is None:
+            if self.scheduler:
+                return self.scheduler.get_weather_many(locations)
+            return {location: self.get_real_time_weather(location)
+                    for location in dict.fromkeys(locations)}
+        if service:
+            return service.get_forecast_many(locations, forecast_days)
+        return self.get_weather_forecasts(locations, forecast_days)
+
+    def analyze_weather_patterns(self, location: Optional[str] = None) -> Dict:
+        """天气模式分析：积温、滚动降雨量、霜冻/高温连续天数与气候距平
+
+        location 为空时返回 {地点: 分析结果}。先增量同步数据库中的新观测。
+        """
+        self.analytics.sync(location)
+        if location is None:
+            return self.analytics.analyze_all()
+        return self.analytics.analyze(location)
+
+    def get_enhanced_forecast(self, location: str, days: int = 3) -> Optional[WeatherSeries]:
+        """获取增强的天气预报（真实API为逐3小时，本地模型为逐日）"""
+        if self.real_weather_service:
+            return self.real_weather_service.get_forecast_series(location, days)
+        return self.get_weather_forecast(location, days)
\ No newline at end of file
@@ -0,0 +1,5 @@
+from .columnar_archive import ColumnarArchive
+from .connection import ConnectionManager
+from .database_manager import AgricultureDatabase
+
+__all__ = ['AgricultureDatabase', 'ColumnarArchive', 'ConnectionManager']
@@ -0,0 +1,328 @@
+# agriculture_system/database/async_writer.py
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+FULL_POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class _Barrier:
+    """刷新屏障：写入线程处理到它时，之前入队的行都已提交"""
+
+    __slots__ = ('event',)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class AsyncDatabaseWriter:
+    """后台数据库写入线程
+
+    采集线程只把行放入有界队列，由专门的线程批量提交，慢速的 fsync
+    不会阻塞传感器采样。队列满时按 full_policy 处理：
+    block 阻塞调用方，drop_oldest 丢弃最早的行，spill 追加到溢出文件，
+    队列空闲时再由写入线程回放。
+
+    写入失败的批次每隔 retry_interval 秒重试，最多 max_retries 次；仍然失败时
+    逐行写入，写不进的行（如不支持的数据类型、持续的约束错误）计入
+    dead_letters 并追加到 dead_letter_path（默认为溢出文件加 .dead 后缀，
+    不会被回放），之后照常放行刷新屏障，坏行不会阻塞后续写入和读取。
+    """
+
+    def __init__(self, writers: Dict[str, Callable[[Sequence[tuple]], object]],
+                 max_queue: int = 10000, batch_rows: int = 500,
+                 full_policy: str = 'block', spill_path: Optional[str] = None,
+                 retry_interval: float = 1.0, max_retries: int = 3,
+                 dead_letter_path: Optional[str] = None):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"不支持的队列满处理策略: {full_policy}")
+        if full_policy == 'spill' and not spill_path:
+            raise ValueError("spill 策略需要指定 spill_path")
+
+        self.writers = writers
+        self.max_queue = max_queue
+        self.batch_rows = batch_rows
+        self.full_policy = full_policy
+        self.spill_path = spill_path
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path or (spill_path + '.dead' if spill_path else None)
+
+        self._queue = deque()
+        self._rows_queued = 0
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._closed = False
+        self._replay_failures = 0
+        # .replay 文件中已写入部分的字节偏移，回放失败后从这里继续，不重复写入
+        self._replay_offset = 0
+
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'batches': 0,
+            'errors': 0,
+            'dead_letters': 0,
+            'commit_latency_ms_total': 0.0,
+            'commit_latency_ms_max': 0.0,
+            'commit_latency_ms_last': 0.0,
+        }
+        self.last_error: Optional[Exception] = None
+
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, row: tuple) -> bool:
+        """提交一行，kind 为 writers 中的表名；返回该行是否进入了队列"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写入线程已关闭")
+            while self._rows_queued >= self.max_queue:
+                if self.full_policy == 'block':
+                    self._cond.wait()
+                    continue
+                if self.full_policy == 'drop_oldest':
+                    self._drop_oldest()
+                    continue
+                break
+            else:
+                self._queue.append((kind, row))
+                self._rows_queued += 1
+                self._stats['enqueued'] += 1
+                self._cond.notify_all()
+                return True
+
+        self._spill(kind, row)
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前提交的所有行（含溢出文件）写入数据库，实现读己之写"""
+        barrier = _Barrier()
+        with self._cond:
+            if self._closed and not self._thread.is_alive():
+                return True
+            self._queue.append(barrier)
+            self._cond.notify_all()
+        return barrier.event.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """写完队列中剩余的行后停止线程"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return self._rows_queued
+
+    @property
+    def spill_pending(self) -> bool:
+        """溢出文件中是否还有待回放的行"""
+        return self._spill_pending()
+
+    def metrics(self) -> Dict:
+        """队列深度与提交延迟等运行指标"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._rows_queued
+        stats['max_queue'] = self.max_queue
+        stats['full_policy'] = self.full_policy
+        stats['spill_pending'] = self._spill_pending()
+        batches = stats['batches']
+        stats['commit_latency_ms_avg'] = (
+            stats.pop('commit_latency_ms_total') / batches if batches else 0.0
+        )
+        return stats
+
+    def _drop_oldest(self):
+        for i, item in enumerate(self._queue):
+            if not isinstance(item, _Barrier):
+                del self._queue[i]
+                self._rows_queued -= 1
+                self._stats['dropped'] += 1
+                return
+
+    def _spill(self, kind: str, row: tuple):
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps([kind, list(row)], ensure_ascii=False) + '\n')
+        with self._cond:
+            self._stats['spilled'] += 1
+
+    def _spill_pending(self) -> bool:
+        # 回放失败时剩余的行留在 .replay 文件中
+        return bool(self.spill_path) and (os.path.exists(self.spill_path)
+                                          or os.path.exists(self.spill_path + '.replay'))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait(self.retry_interval)
+                    if not self._queue and self._spill_pending():
+                        break
+                if not self._queue and self._closed:
+                    return
+                batch = []
+                rows = 0
+                while self._queue and rows < self.batch_rows:
+                    item = self._queue.popleft()
+                    batch.append(item)
+                    if not isinstance(item, _Barrier):
+                        rows += 1
+
+            barriers = [item for item in batch if isinstance(item, _Barrier)]
+            items = [item for item in batch if not isinstance(item, _Barrier)]
+            # 重试耗尽后写不进的行已转入死信，这批行都不再留在队列中
+            self._write_with_retry(items)
+            with self._cond:
+                self._rows_queued -= len(items)
+                self._cond.notify_all()
+
+            try:
+                if barriers or not self._queue:
+                    self._replay_spill()
+                self._replay_failures = 0
+            except Exception as e:
+                # 溢出文件未回放完时屏障暂不放行；连续失败超过 max_retries 次
+                # （如文件损坏）时把待回放的内容移入死信文件后放行
+                self._replay_failures += 1
+                if self._replay_failures <= self.max_retries:
+                    self._record_error(e, barriers)
+                    continue
+                self._note_error(e)
+                self._quarantine_replay()
+                self._replay_failures = 0
+
+            for barrier in barriers:
+                barrier.event.set()
+
+    def _note_error(self, error: Exception):
+        self.last_error = error
+        with self._cond:
+            self._stats['errors'] += 1
+
+    def _record_error(self, error: Exception, requeue: list):
+        self._note_error(error)
+        with self._cond:
+            self._queue.extendleft(reversed(requeue))
+        time.sleep(self.retry_interval)
+
+    def _write_with_retry(self, items: List[tuple]) -> int:
+        """写入一批行，失败时重试 max_retries 次，仍失败则逐行写入，返回转入死信的行数"""
+        pending = list(items)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(pending)
+                return 0
+            except Exception as e:
+                # _write 已把写入成功的组从 pending 中移除
+                self._note_error(e)
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_interval)
+
+        dead = 0
+        for item in pending:
+            try:
+                self._write([item])
+            except Exception as e:
+                self._note_error(e)
+                self._dead_letter(item)
+                dead += 1
+        return dead
+
+    def _dead_letter(self, item: tuple):
+        with self._cond:
+            self._stats['dead_letters'] += 1
+        if not self.dead_letter_path:
+            return
+        kind, row = item
+        try:
+            with self._spill_lock:
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps([kind, list(row)], ensure_ascii=False, default=repr) + '\n')
+        except OSError as e:
+            self._note_error(e)
+
+    def _write(self, items: List[tuple]):
+        """按表分组批量写入；某组失败时抛出异常，已写入的行从 items 中移除"""
+        if not items:
+            return
+        groups: Dict[str, List[tuple]] = {}
+        for kind, row in items:
+            groups.setdefault(kind, []).append(row)
+
+        count = len(items)
+        start = time.perf_counter()
+        for kind, rows in groups.items():
+            self.writers[kind](rows)
+            items[:] = [item for item in items if item[0] != kind]
+        latency = (time.perf_counter() - start) * 1000
+
+        with self._cond:
+            stats = self._stats
+            stats['written'] += count
+            stats['batches'] += 1
+            stats['commit_latency_ms_total'] += latency
+            stats['commit_latency_ms_last'] = latency
+            stats['commit_latency_ms_max'] = max(stats['commit_latency_ms_max'], latency)
+
+    def _quarantine_replay(self):
+        """把 .replay 文件中尚未写入的部分移入死信文件"""
+        replay_path = self.spill_path + '.replay'
+        try:
+            with self._spill_lock:
+                with open(replay_path, 'rb') as src, open(self.dead_letter_path, 'ab') as dst:
+                    src.seek(self._replay_offset)
+                    shutil.copyfileobj(src, dst)
+                os.remove(replay_path)
+            self._replay_offset = 0
+        except OSError as e:
+            self._note_error(e)
+
+    def _replay_spill(self):
+        """把溢出文件中的行分批写回数据库
+
+        回放期间新溢出的行写入新的溢出文件，循环到 .replay 与溢出文件都回放完为止，
+        之后才放行刷新屏障。
+        """
+        replay_path = self.spill_path + '.replay' if self.spill_path else None
+        while self._spill_pending():
+            with self._spill_lock:
+                if not os.path.exists(replay_path):
+                    os.replace(self.spill_path, replay_path)
+                    self._replay_offset = 0
+            self._replay_file(replay_path)
+            os.remove(replay_path)
+            self._replay_offset = 0
+
+    def _replay_file(self, path: str):
+        """从 _replay_offset 起逐行读取，每 batch_rows 行写入一次，不把整个文件读入内存"""
+        with open(path, 'rb') as f:
+            f.seek(self._replay_offset)
+            chunk, chunk_bytes = [], 0
+            for line in f:
+                chunk_bytes += len(line)
+                if line.strip():
+                    kind, row = json.loads(line)
+                    chunk.append((kind, tuple(row)))
+                if len(chunk) >= self.batch_rows:
+                    self._replay_chunk(chunk, chunk_bytes)
+                    chunk, chunk_bytes = [], 0
+            self._replay_chunk(chunk, chunk_bytes)
+
+    def _replay_chunk(self, chunk: List[tuple], size: int):
+        dead = self._write_with_retry(chunk)
+        self._replay_offset += size
+        with self._cond:
+            self._stats['replayed'] += len(chunk) - dead
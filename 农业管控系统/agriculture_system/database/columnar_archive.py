@@ -0,0 +1,251 @@
+# agriculture_system/database/columnar_archive.py
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.time_utils import now_ms, to_epoch_ms
+from .models import TABLE_COLUMNS
+from .partitions import PARTITIONED_TABLES
+from .rollups import DAY_MS
+from .streaming import resolve_columns
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def day_key(timestamp_ms: int) -> str:
+    """epoch毫秒所在的UTC日期，如 '20261018'"""
+    tm = time.gmtime(timestamp_ms // 1000)
+    return f"{tm.tm_year:04d}{tm.tm_mon:02d}{tm.tm_mday:02d}"
+
+
+def storage_dtype(table: str, column: str) -> str:
+    """列在归档中的存储类型：TEXT 列按字典编码为 int32（-1 表示缺失）"""
+    if column == 'timestamp':
+        return 'int64'
+    col_type = dict(TABLE_COLUMNS[table])[column]
+    return 'float64' if col_type.startswith('REAL') else 'int32'
+
+
+class ColumnarArchive:
+    """按天分区的列式归档
+
+    目录结构为 {root}/{table}/{YYYYMMDD}/{column}.npy，另有 manifest.json
+    记录各表的列类型、文本列字典、已导出的天及导出进度。读取时以
+    mmap_mode='r' 打开列文件，数据按需从页缓存映射，不经过 SQLite 逐行解码。
+    只导出已经结束的 UTC 日，因此已归档的天不再变化，增量导出只追加新的天。
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.manifest = self._load_manifest()
+
+    def export(self, database, until=None, tables: Sequence[str] = PARTITIONED_TABLES,
+               chunk_size: int = 50000) -> Dict[str, int]:
+        """把各表新增的完整天导出到归档，返回每张表新导出的天数
+
+        until 为导出截止时间（不含），默认为当前 UTC 日的零点；
+        早于已导出进度的迟到数据不会再写入归档。
+        """
+        if until is None:
+            until_ms = now_ms() // DAY_MS * DAY_MS
+        else:
+            until_ms = to_epoch_ms(until) // DAY_MS * DAY_MS
+        return {
+            table: self._export_table(database, table, until_ms, chunk_size)
+            for table in tables
+        }
+
+    def days(self, table: str, start=None, end=None) -> List[str]:
+        """与 [start, end) 重叠的已归档日期（升序）"""
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+        info = self.manifest['tables'].get(table, {}).get('days', {})
+        return [
+            day for day, meta in sorted(info.items())
+            if (start_ms is None or meta['last'] >= start_ms)
+            and (end_ms is None or meta['first'] < end_ms)
+        ]
+
+    def iter_days(self, table: str, start=None, end=None,
+                  columns: Optional[Sequence[str]] = None) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """逐天产出 (日期, {列名: 内存映射数组})
+
+        数组是列文件的只读映射（零拷贝），时间范围只截取切片；
+        文本列保持字典编码，可用 decode() 还原。
+        """
+        columns = self._resolve(table, columns)
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+
+        for day in self.days(table, start_ms, end_ms):
+            day_dir = os.path.join(self.root_dir, table, day)
+            timestamps = np.load(os.path.join(day_dir, 'timestamp.npy'), mmap_mode='r')
+            lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, 'left'))
+            hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, 'left'))
+            if lo >= hi:
+                continue
+            arrays = {}
+            for column in columns:
+                if column == 'timestamp':
+                    data = timestamps
+                else:
+                    data = np.load(os.path.join(day_dir, f"{column}.npy"), mmap_mode='r')
+                arrays[column] = data[lo:hi]
+            yield day, arrays
+
+    def load(self, table: str, start=None, end=None,
+             columns: Optional[Sequence[str]] = None,
+             location: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """把 [start, end) 内各天的列拼接为连续数组，文本列解码为字符串
+
+        location 不为空时只保留该地点的行（仅 weather_data）。
+        """
+        columns = self._resolve(table, columns)
+        read_columns = list(columns)
+        if location is not None and 'location' not in read_columns:
+            read_columns.append('location')
+
+        parts: Dict[str, List[np.ndarray]] = {column: [] for column in read_columns}
+        for _, arrays in self.iter_days(table, start, end, read_columns):
+            for column in read_columns:
+                parts[column].append(arrays[column])
+
+        result = {
+            column: (np.concatenate(parts[column]) if parts[column]
+                     else np.empty(0, dtype=storage_dtype(table, column)))
+            for column in read_columns
+        }
+        if location is not None:
+            mask = result['location'] == self._code(table, 'location', location)
+            result = {column: values[mask] for column, values in result.items()}
+
+        for column in read_columns:
+            if storage_dtype(table, column) == 'int32':
+                result[column] = self.decode(table, column, result[column])
+        return {column: result[column] for column in columns}
+
+    def decode(self, table: str, column: str, codes: np.ndarray) -> np.ndarray:
+        """把字典编码还原为字符串数组，缺失值为 None"""
+        dictionary = self.manifest['tables'].get(table, {}).get('dictionaries', {}).get(column, [])
+        lookup = np.array(list(dictionary) + [None], dtype=object)
+        codes = np.asarray(codes)
+        return lookup[np.where(codes < 0, len(dictionary), codes)]
+
+    def _resolve(self, table: str, columns: Optional[Sequence[str]]) -> List[str]:
+        columns = resolve_columns(table, columns)
+        if 'id' in columns:
+            raise ValueError("归档不包含 id 列")
+        return columns
+
+    def _code(self, table: str, column: str, value: str) -> int:
+        dictionary = self.manifest['tables'].get(table, {}).get('dictionaries', {}).get(column, [])
+        return dictionary.index(value) if value in dictionary else -2
+
+    def _export_table(self, database, table: str, until_ms: int, chunk_size: int) -> int:
+        info = self.manifest['tables'].setdefault(table, {
+            'columns': {column: storage_dtype(table, column)
+                        for column in resolve_columns(table, None)},
+            'dictionaries': {},
+            'days': {},
+            'exported_until': None,
+        })
+        start_ms = info['exported_until']
+        if start_ms is not None and start_ms >= until_ms:
+            return 0
+
+        columns = list(info['columns'])
+        if table == 'weather_data':
+            batches = database.iter_weather_data(
+                start=start_ms, end=until_ms, chunk_size=chunk_size, as_arrays=True
+            )
+        else:
+            batches = database.iter_sensor_data(
+                start=start_ms, end=until_ms, chunk_size=chunk_size, as_arrays=True
+            )
+
+        # 数据按时间升序到达，同一天的批次累积后一次写出
+        exported = 0
+        current_day, pending = None, []
+        for batch in batches:
+            day_ids = batch['timestamp'] // DAY_MS
+            bounds = np.flatnonzero(np.diff(day_ids)) + 1
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(day_ids)]):
+                day_id = int(day_ids[lo])
+                if day_id != current_day and pending:
+                    self._write_day(table, info, columns, pending)
+                    exported += 1
+                    pending = []
+                current_day = day_id
+                pending.append({column: batch[column][lo:hi] for column in columns})
+        if pending:
+            self._write_day(table, info, columns, pending)
+            exported += 1
+
+        info['exported_until'] = until_ms
+        self._save_manifest()
+        return exported
+
+    def _write_day(self, table: str, info: Dict, columns: Sequence[str], pending: List[Dict]):
+        """写出一天的列文件：先写临时目录再重命名，随后更新清单"""
+        arrays = {column: np.concatenate([part[column] for part in pending]) for column in columns}
+        timestamps = arrays['timestamp']
+        day = day_key(int(timestamps[0]))
+
+        table_dir = os.path.join(self.root_dir, table)
+        day_dir = os.path.join(table_dir, day)
+        tmp_dir = day_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in columns:
+            dtype = info['columns'][column]
+            values = arrays[column]
+            if dtype == 'int32':
+                values = self._encode(info, column, values)
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), np.ascontiguousarray(values, dtype=dtype))
+        # 上次导出中断时可能留下未记入清单的同名目录
+        shutil.rmtree(day_dir, ignore_errors=True)
+        os.replace(tmp_dir, day_dir)
+
+        info['days'][day] = {
+            'rows': int(len(timestamps)),
+            'first': int(timestamps[0]),
+            'last': int(timestamps[-1]),
+        }
+        info['exported_until'] = (int(timestamps[0]) // DAY_MS + 1) * DAY_MS
+        self._save_manifest()
+
+    @staticmethod
+    def _encode(info: Dict, column: str, values: np.ndarray) -> np.ndarray:
+        dictionary = info['dictionaries'].setdefault(column, [])
+        index = {value: code for code, value in enumerate(dictionary)}
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(dictionary)
+                dictionary.append(value)
+            codes[i] = code
+        return codes
+
+    def _load_manifest(self) -> Dict:
+        path = os.path.join(self.root_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {'version': MANIFEST_VERSION, 'tables': {}}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        """先写临时文件再替换，清单始终是完整的"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        path = os.path.join(self.root_dir, MANIFEST_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,120 @@
+# agriculture_system/database/connection.py
+import itertools
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+_memory_db_counter = itertools.count()
+
+
+class ConnectionManager:
+    """SQLite连接管理器
+
+    每个线程持有一条长连接，避免每次读写都重新 connect/commit/close。
+    连接打开时统一设置 WAL 日志模式、同步级别和页缓存，
+    预编译语句由 sqlite3 的语句缓存（cached_statements）复用。
+    """
+
+    def __init__(self, db_path: str, journal_mode: str = 'WAL',
+                 synchronous: str = 'NORMAL', cache_size_kb: int = 8192,
+                 busy_timeout: float = 5.0, statement_cache_size: int = 256):
+        journal_mode = journal_mode.upper()
+        synchronous = synchronous.upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"不支持的日志模式: {journal_mode}")
+        if synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"不支持的同步级别: {synchronous}")
+
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self.statement_cache_size = statement_cache_size
+
+        # 内存数据库在各线程间共享同一份数据，需要使用共享缓存URI，
+        # 并保持一条锚定连接使数据库不被释放
+        self._uri = False
+        self._anchor = None
+        if db_path == ':memory:':
+            self.db_path = f"file:agri_memdb_{next(_memory_db_counter)}?mode=memory&cache=shared"
+            self._uri = True
+            self._anchor = self._connect()
+
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的长连接（首次调用时创建）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """在单个事务中执行，成功提交、异常回滚"""
+        conn = self.connection()
+        with conn:
+            yield conn.cursor()
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.current_thread(), None)
+        conn.close()
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.statement_cache_size,
+            check_same_thread=False,
+            uri=self._uri,
+        )
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _prune_dead_threads(self):
+        """关闭已退出线程遗留的连接"""
+        dead = [t for t in self._connections if not t.is_alive()]
+        for thread in dead:
+            self._connections.pop(thread).close()
+
+    @property
+    def open_connections(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def pragma(self, name: str) -> Optional[object]:
+        """读取当前线程连接上的PRAGMA值"""
+        row = self.connection().execute(f"PRAGMA {name}").fetchone()
+        return row[0] if row else None
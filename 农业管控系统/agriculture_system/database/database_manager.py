@@ -1,2 +1,521 @@
+# agriculture_system/database/database_manager.py
+from datetime import timedelta
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from ..utils.time_utils import from_epoch_ms, now_ms, to_epoch_ms
+from .async_writer import AsyncDatabaseWriter
+from .connection import ConnectionManager
+from .migrations import migrate
+from .partitions import PartitionManager, month_key, month_range, with_ids
+from .result_cache import ResultCache
+from .retention import RetentionPolicy
+from .rollups import (
+    ROLLUP_GRAINS, ROLLUP_METRICS, RollupAggregate, apply_rollups, purge_rollups,
+    query_rollup_statistics
+)
+from .sensor_blocks import SENSOR_STORAGE_BACKENDS, SensorBlockStore
+from .streaming import iter_chunks, resolve_columns, rows_to_arrays, rows_to_dicts
+from .write_buffer import WriteBehindBuffer
+
+# 原始数据按月分区，{table} 为分区表名，id 由跨分区的序列分配
+SENSOR_INSERT_SQL = '''
+    INSERT INTO {table}
+    (id, timestamp, air_temperature, soil_temperature, air_humidity,
+     soil_humidity, soil_ph, light_intensity)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+WEATHER_INSERT_SQL = '''
+    INSERT INTO {table}
+    (id, timestamp, temperature, humidity, rainfall, wind_speed, location)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 报警事件：('raise', 时间, 报警键, 类型, 级别, 信息) 插入一条未解除的记录，
+# ('resolve', 时间, 报警键) 把该键未解除的记录标记为已解除
+ALERT_INSERT_SQL = '''
+    INSERT INTO alert_records
+    (timestamp, alert_key, alert_type, alert_level, message, resolved)
+    VALUES (?, ?, ?, ?, ?, 0)
+'''
+
+ALERT_RESOLVE_SQL = '''
+    UPDATE alert_records SET resolved = 1, resolved_at = ?
+    WHERE alert_key = ? AND resolved = 0
+'''
+
+
 class AgricultureDatabase:
-    pass
\ No newline at end of file
+    """农业数据数据库管理"""
+
+    def __init__(self, db_path: str = "agriculture_system.db",
+                 journal_mode: str = 'WAL', synchronous: str = 'NORMAL',
+                 buffer_rows: int = 0, flush_interval: Optional[float] = 5.0,
+                 retention: Optional[RetentionPolicy] = None,
+                 async_writes: bool = False, queue_size: int = 10000,
+                 queue_full_policy: str = 'block', spill_path: Optional[str] = None,
+                 sensor_storage: str = 'raw', cache_size: int = 128,
+                 cache_ttl: float = 5.0, flush_timeout: Optional[float] = 5.0,
+                 compact_interval: float = 60.0):
+        """
+        buffer_rows 大于0时启用写后缓冲：save_sensor_data/save_weather_data
+        先写入内存，累积 buffer_rows 行或等待 flush_interval 秒后批量提交，
+        进程崩溃时每张表最多丢失 buffer_rows 行。
+        async_writes 为 True 时改由后台写入线程提交，调用方只把行放入
+        容量为 queue_size 的队列，队列满时按 queue_full_policy
+        （block/drop_oldest/spill）处理；每批最多提交 buffer_rows 行（默认500）。
+        读取前等待写入队列的刷新屏障最多 flush_timeout 秒，超时后读取已提交的数据。
+        retention 为数据保留策略，由 apply_retention() 执行。
+        sensor_storage 为 'gorilla' 时，已结束小时的传感器数据按指标压缩为
+        Gorilla 块存储，读取时透明解码；默认 'raw' 保持原始行。压缩由后台线程
+        每 compact_interval 秒检查一次，不在写入调用中进行。
+        get_sensor_statistics/get_historical_weather 的结果缓存最多 cache_size 条、
+        cache_ttl 秒，写入时只更新或失效受影响的条目；cache_ttl 为0时不缓存。
+        """
+        if sensor_storage not in SENSOR_STORAGE_BACKENDS:
+            raise ValueError(f"不支持的传感器存储方式: {sensor_storage}")
+        self.db_path = db_path
+        self.flush_timeout = flush_timeout
+        self.pool = ConnectionManager(
+            db_path, journal_mode=journal_mode, synchronous=synchronous
+        )
+        self.partitions = PartitionManager()
+        self.blocks = SensorBlockStore(self.partitions) if sensor_storage == 'gorilla' else None
+        self.retention = retention or RetentionPolicy()
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self._init_database()
+        if self.blocks is not None:
+            self.blocks.start(self.pool, compact_interval)
+
+        self.sensor_buffer = None
+        self.weather_buffer = None
+        self.writer = None
+        if async_writes:
+            self.writer = AsyncDatabaseWriter(
+                {'sensor_data': self._insert_sensor_rows,
+                 'weather_data': self._insert_weather_rows},
+                max_queue=queue_size,
+                batch_rows=buffer_rows or 500,
+                full_policy=queue_full_policy,
+                spill_path=spill_path
+            )
+        elif buffer_rows > 0:
+            self.sensor_buffer = WriteBehindBuffer(
+                self._insert_sensor_rows, buffer_rows, flush_interval
+            )
+            self.weather_buffer = WriteBehindBuffer(
+                self._insert_weather_rows, buffer_rows, flush_interval
+            )
+
+    def _init_database(self):
+        """初始化数据库表结构，并把旧版本数据库迁移到最新结构"""
+        migrate(self.pool.connection())
+
+    def save_weather_data(self, weather_data: Dict, location: str):
+        """保存天气数据"""
+        row = self._weather_row(weather_data, location)
+        if self.writer is not None:
+            self.writer.submit('weather_data', row)
+        elif self.weather_buffer is not None:
+            self.weather_buffer.add(row)
+        else:
+            self._insert_weather_rows([row])
+
+    def save_sensor_data(self, sensor_data: Dict):
+        """保存传感器数据"""
+        row = self._sensor_row(sensor_data)
+        if self.writer is not None:
+            self.writer.submit('sensor_data', row)
+        elif self.sensor_buffer is not None:
+            self.sensor_buffer.add(row)
+        else:
+            self._insert_sensor_rows([row])
+
+    def save_alert_events(self, events: Sequence[tuple]):
+        """在一个事务中按顺序保存一批报警触发/解除事件（格式见 ALERT_INSERT_SQL 上方说明）
+
+        连续的同类事件合并为一次 executemany；批量由报警分发线程攒成。
+        """
+        if events:
+            with self.pool.transaction() as cursor:
+                for kind, group in groupby(events, key=lambda event: event[0]):
+                    if kind == 'raise':
+                        cursor.executemany(ALERT_INSERT_SQL, [event[1:6] for event in group])
+                    else:
+                        cursor.executemany(ALERT_RESOLVE_SQL, [event[1:3] for event in group])
+
+    def save_weather_data_batch(self, weather_records: Iterable[Dict],
+                                location: Optional[str] = None) -> int:
+        """在单个事务中批量保存天气数据，记录中的 location 优先于参数"""
+        rows = [
+            self._weather_row(record, record.get('location', location))
+            for record in weather_records
+        ]
+        self._insert_weather_rows(rows)
+        return len(rows)
+
+    def save_sensor_data_batch(self, sensor_records: Iterable[Dict]) -> int:
+        """在单个事务中批量保存传感器数据"""
+        rows = [self._sensor_row(record) for record in sensor_records]
+        self._insert_sensor_rows(rows)
+        return len(rows)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """把写后缓冲区/写入队列中的数据全部写入数据库
+
+        读取方法开始前都会调用，作为刷新屏障保证读到此前提交的写入。
+        timeout 为等待写入队列的最长秒数，返回是否在超时前全部写入。
+        """
+        done = True
+        if self.writer is not None:
+            done = self.writer.flush(timeout)
+        if self.sensor_buffer is not None:
+            self.sensor_buffer.flush()
+        if self.weather_buffer is not None:
+            self.weather_buffer.flush()
+        return done
+
+    @staticmethod
+    def _weather_row(weather_data: Dict, location: str) -> tuple:
+        return (
+            _timestamp_ms(weather_data.get('timestamp')),
+            weather_data.get('temperature'),
+            weather_data.get('humidity'),
+            weather_data.get('rainfall', 0),
+            weather_data.get('wind_speed', 0),
+            location
+        )
+
+    @staticmethod
+    def _sensor_row(sensor_data: Dict) -> tuple:
+        return (
+            _timestamp_ms(sensor_data.get('timestamp')),
+            _measurement(sensor_data.get('air_temperature')),
+            _measurement(sensor_data.get('soil_temperature')),
+            _measurement(sensor_data.get('air_humidity')),
+            _measurement(sensor_data.get('soil_humidity')),
+            _measurement(sensor_data.get('soil_ph', 6.5)),
+            _measurement(sensor_data.get('light_intensity', 0))
+        )
+
+    def _insert_weather_rows(self, rows: List[tuple]):
+        if rows:
+            version = self.cache.begin_write('historical_weather')
+            with self.pool.transaction() as cursor:
+                conn = cursor.connection
+                for table, part_rows in self.partitions.route(conn, 'weather_data', rows):
+                    cursor.executemany(WEATHER_INSERT_SQL.format(table=table),
+                                       with_ids(conn, 'weather_data', part_rows))
+            self.cache.update('historical_weather', _weather_cache_updater(rows), version)
+
+    def _insert_sensor_rows(self, rows: List[tuple]):
+        if rows:
+            version = self.cache.begin_write('sensor_statistics')
+            with self.pool.transaction() as cursor:
+                conn = cursor.connection
+                for table, part_rows in self.partitions.route(conn, 'sensor_data', rows):
+                    cursor.executemany(SENSOR_INSERT_SQL.format(table=table),
+                                       with_ids(conn, 'sensor_data', part_rows))
+                apply_rollups(cursor, rows)
+            self.cache.update('sensor_statistics', _statistics_cache_updater(rows), version)
+
+    def get_alert_records(self, limit: int = 100, unresolved_only: bool = False) -> List[Dict]:
+        """最近的报警记录（新的在前）"""
+        where = 'WHERE resolved = 0' if unresolved_only else ''
+        cursor = self.pool.connection().execute(f'''
+            SELECT id, timestamp, alert_key, alert_type, alert_level, message, resolved, resolved_at
+            FROM alert_records {where}
+            ORDER BY timestamp DESC, id DESC LIMIT ?
+        ''', (limit,))
+        return [
+            {
+                'id': row[0],
+                'timestamp': from_epoch_ms(row[1]),
+                'alert_key': row[2],
+                'alert_type': row[3],
+                'alert_level': row[4],
+                'message': row[5],
+                'resolved': bool(row[6]),
+                'resolved_at': from_epoch_ms(row[7])
+            }
+            for row in cursor.fetchall()
+        ]
+
+    def get_historical_weather(self, location: str, days: int = 30) -> List[Dict]:
+        """获取历史天气数据"""
+        self._sync_pending_writes()
+        key = ('historical_weather', location, days)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return [dict(record) for record in cached['history']]
+
+        version = self.cache.version('historical_weather')
+        start_ms = now_ms() - int(timedelta(days=days).total_seconds() * 1000)
+        conn = self.pool.connection()
+
+        # 只查询与时间范围重叠的月份分区，从新到旧依次读取
+        history = []
+        for table in reversed(self.partitions.overlapping(conn, 'weather_data', start_ms + 1)):
+            cursor = conn.execute(f'''
+                SELECT id, timestamp, temperature, humidity, rainfall, wind_speed, location
+                FROM {table}
+                WHERE location = ? AND timestamp > ?
+                ORDER BY timestamp DESC
+            ''', (location, start_ms))
+            history.extend(
+                {
+                    'id': row[0],
+                    'timestamp': from_epoch_ms(row[1]),
+                    'temperature': row[2],
+                    'humidity': row[3],
+                    'rainfall': row[4],
+                    'wind_speed': row[5],
+                    'location': row[6]
+                }
+                for row in cursor.fetchall()
+            )
+        self.cache.put(key, {'start_ms': start_ms, 'history': history}, version)
+        return [dict(record) for record in history]
+
+    def get_latest_weather(self, location: str) -> Optional[Dict]:
+        """某地点最近一条天气数据，没有时返回 None"""
+        self._sync_pending_writes()
+        conn = self.pool.connection()
+        # 从最新的月份分区往前找，找到即停
+        for table in reversed(self.partitions.overlapping(conn, 'weather_data')):
+            row = conn.execute(f'''
+                SELECT id, timestamp, temperature, humidity, rainfall, wind_speed, location
+                FROM {table}
+                WHERE location = ?
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ''', (location,)).fetchone()
+            if row is not None:
+                return {
+                    'id': row[0],
+                    'timestamp': from_epoch_ms(row[1]),
+                    'temperature': row[2],
+                    'humidity': row[3],
+                    'rainfall': row[4],
+                    'wind_speed': row[5],
+                    'location': row[6]
+                }
+        return None
+
+    def get_sensor_statistics(self, hours: int = 24) -> Dict:
+        """获取传感器数据统计
+
+        统计量由分钟/小时/天汇总表合并得到，只有窗口两端不足一分钟的部分
+        读取原始数据，因此耗时与原始行数无关。
+        """
+        self._sync_pending_writes()
+        key = ('sensor_statistics', hours)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached['result'])
+
+        version = self.cache.version('sensor_statistics')
+        end_ms = now_ms() + 1
+        start_ms = end_ms - int(timedelta(hours=hours).total_seconds() * 1000)
+
+        stats = query_rollup_statistics(
+            self.pool.connection(), self.partitions, start_ms, end_ms,
+            ('air_temperature', 'soil_humidity', 'air_humidity'),
+            block_reader=self.blocks.read_values if self.blocks is not None else None,
+            retained=self.retention.retained_since(end_ms)
+        )
+        result = _statistics_result(stats)
+        self.cache.put(key, {'start_ms': start_ms, 'end_ms': end_ms, 'stats': stats,
+                             'result': result}, version)
+        return dict(result)
+
+    def iter_sensor_data(self, start=None, end=None,
+                         columns: Optional[Sequence[str]] = None,
+                         chunk_size: int = 1000, as_arrays: bool = False) -> Iterator:
+        """按时间升序流式读取 [start, end) 内的传感器原始数据
+
+        start/end 可为 datetime、epoch 秒/毫秒或 ISO 字符串，省略表示不限；
+        columns 为列投影，默认 timestamp 与全部数据列。每次从游标取出
+        chunk_size 行，内存占用与结果总行数无关。as_arrays 为 False 时逐行
+        产出字典，为 True 时每批产出 {列名: NumPy数组}（timestamp 为
+        int64 epoch毫秒，缺失的浮点值为 NaN）。
+        """
+        return self._iter_table('sensor_data', start, end, columns, chunk_size, as_arrays)
+
+    def iter_weather_data(self, location: Optional[str] = None, start=None, end=None,
+                          columns: Optional[Sequence[str]] = None,
+                          chunk_size: int = 1000, as_arrays: bool = False) -> Iterator:
+        """按时间升序流式读取天气数据，location 为空时读取全部地点，其余参数同 iter_sensor_data"""
+        conditions = [('location = ?', location)] if location is not None else []
+        return self._iter_table('weather_data', start, end, columns, chunk_size,
+                                as_arrays, conditions)
+
+    def _iter_table(self, table: str, start, end, columns: Optional[Sequence[str]],
+                    chunk_size: int, as_arrays: bool, conditions=()) -> Iterator:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必须大于0")
+        columns = resolve_columns(table, columns)
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+
+        conditions = list(conditions)
+        if start_ms is not None:
+            conditions.append(('timestamp >= ?', start_ms))
+        if end_ms is not None:
+            conditions.append(('timestamp < ?', end_ms))
+        where = ' AND '.join(clause for clause, _ in conditions) or '1'
+        params = tuple(value for _, value in conditions)
+
+        self._sync_pending_writes()
+        conn = self.pool.connection()
+        tables = self.partitions.overlapping(conn, table, start_ms, end_ms)
+        if table == 'sensor_data' and self.blocks is not None:
+            chunks = self.blocks.iter_chunks(conn, tables, columns, where, params,
+                                             start_ms, end_ms, chunk_size)
+        else:
+            chunks = iter_chunks(conn, tables, columns, where, params, chunk_size)
+        for rows in chunks:
+            if as_arrays:
+                yield rows_to_arrays(rows, table, columns)
+            else:
+                yield from rows_to_dicts(rows, columns)
+
+    def get_cache_metrics(self) -> Dict:
+        """查询结果缓存的命中/未命中次数与条目数"""
+        return self.cache.metrics()
+
+    def _sync_pending_writes(self):
+        """缓冲区或写入队列中还有数据时先刷新，否则跳过刷新屏障，缓存命中时无需等待写入线程"""
+        pending = (
+            (self.writer is not None and (self.writer.queue_depth or self.writer.spill_pending))
+            or (self.sensor_buffer is not None and self.sensor_buffer.pending)
+            or (self.weather_buffer is not None and self.weather_buffer.pending)
+        )
+        if pending:
+            self.flush(self.flush_timeout)
+
+    def get_write_metrics(self) -> Dict:
+        """后台写入线程的队列深度、提交延迟等指标"""
+        if self.writer is None:
+            return {}
+        return self.writer.metrics()
+
+    def apply_retention(self, policy: Optional[RetentionPolicy] = None,
+                        now: Optional[int] = None) -> Dict:
+        """执行数据保留策略
+
+        原始数据只按整月分区归档或删除，不执行逐行 DELETE；
+        汇总表按各粒度的保留天数删除过期的桶，压缩块与原始分区同样按整月清理。
+        """
+        policy = policy or self.retention
+        now = now_ms() if now is None else now
+        self.flush()
+        conn = self.pool.connection()
+        result = {'archived': [], 'dropped': [], 'rollup_rows_purged': 0, 'blocks_purged': 0}
+
+        if policy.raw_days is not None:
+            cutoff = now - policy.raw_days * 86_400_000
+            for table in ('sensor_data', 'weather_data'):
+                for key in self.partitions.partitions(conn, table):
+                    if month_range(key)[1] > cutoff:
+                        continue
+                    if policy.archive:
+                        result['archived'].append(
+                            self.partitions.archive(conn, table, key, policy.archive_dir)
+                        )
+                    else:
+                        self.partitions.drop(conn, table, key)
+                        result['dropped'].append(f"{table}_{key}")
+
+            if self.blocks is not None:
+                result['blocks_purged'] = self.blocks.purge(
+                    conn, month_range(month_key(cutoff))[0],
+                    policy.archive_dir if policy.archive else None
+                )
+
+        with conn:
+            for grain, _ in ROLLUP_GRAINS:
+                days = policy.rollup_days.get(grain)
+                if days is not None:
+                    result['rollup_rows_purged'] += purge_rollups(
+                        conn, grain, now - days * 86_400_000
+                    )
+        self.cache.clear()
+        return result
+
+    def close(self):
+        """写入缓冲数据并关闭所有数据库连接"""
+        if self.writer is not None:
+            self.writer.close()
+        if self.sensor_buffer is not None:
+            self.sensor_buffer.close()
+        if self.weather_buffer is not None:
+            self.weather_buffer.close()
+        if self.blocks is not None:
+            self.blocks.stop()
+        self.pool.close_all()
+
+
+def _statistics_result(stats: Dict[str, RollupAggregate]) -> Dict:
+    temperature = stats['air_temperature']
+    return {
+        'avg_temperature': temperature.mean,
+        'max_temperature': temperature.maximum,
+        'min_temperature': temperature.minimum,
+        'std_temperature': temperature.std,
+        'avg_soil_humidity': stats['soil_humidity'].mean,
+        'avg_air_humidity': stats['air_humidity'].mean,
+        'sample_count': temperature.count
+    }
+
+
+def _statistics_cache_updater(rows: List[tuple]):
+    """把新写入的传感器行合并进缓存的统计量
+
+    只计入落在条目查询窗口 [start_ms, end_ms) 内的新行；窗口固定在查询时刻，
+    随时间滑动造成的偏差不超过缓存 TTL。
+    """
+    def update(key, entry):
+        new_rows = [row for row in rows if entry['start_ms'] <= row[0] < entry['end_ms']]
+        if not new_rows:
+            return None
+        stats = {}
+        for metric, aggregate in entry['stats'].items():
+            merged = RollupAggregate(*aggregate.as_row())
+            index = ROLLUP_METRICS.index(metric) + 1
+            for row in new_rows:
+                value = row[index]
+                if value is not None and value == value:
+                    merged.add(value)
+            stats[metric] = merged
+        # 整体替换而不是原地修改，并发读取到的总是一致的结果
+        entry['stats'] = stats
+        entry['result'] = _statistics_result(stats)
+        return True
+    return update
+
+
+def _weather_cache_updater(rows: List[tuple]):
+    """新写入的天气行落在缓存条目的地点和时间窗口内时使该条目失效"""
+    latest: Dict[str, int] = {}
+    for row in rows:
+        location = row[-1]
+        latest[location] = max(latest.get(location, row[0]), row[0])
+
+    def update(key, entry):
+        timestamp = latest.get(key[1])
+        if timestamp is not None and timestamp > entry['start_ms']:
+            return False
+        return None
+    return update
+
+
+def _timestamp_ms(value) -> int:
+    """记录未带时间戳时使用当前时间"""
+    return now_ms() if value is None else to_epoch_ms(value)
+
+
+def _measurement(value):
+    """缺失的测量值（异常检测、环形缓冲区等产生的 NaN）统一存为 NULL"""
+    return None if value is None or value != value else value
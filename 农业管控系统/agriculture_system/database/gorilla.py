@@ -0,0 +1,171 @@
+# agriculture_system/database/gorilla.py
+# Gorilla 时间序列编码（Pelkonen et al., VLDB 2015）：时间戳按二阶差分、
+# 数值按与前一个值的异或结果编码。传感器采样间隔固定、读数变化缓慢，
+# 大多数样本的时间戳只占1位，数值只占1位或少量有效位。
+import struct
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# 块头：样本数、首个时间戳（epoch毫秒）、首个数值的 float64 位模式
+_HEADER = struct.Struct('>IqQ')
+_MASK64 = (1 << 64) - 1
+
+# 二阶差分的分档：(前缀, 前缀位数, 数值位数, 下限)，数值存储为 dod - 下限
+_DOD_BUCKETS = (
+    (0b10, 2, 7, -63),
+    (0b110, 3, 9, -255),
+    (0b1110, 4, 12, -2047),
+)
+
+
+class _BitWriter:
+    """按位追加写入，凑满整字节后输出到 bytearray"""
+
+    __slots__ = ('out', 'acc', 'bits')
+
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value: int, nbits: int):
+        self.acc = (self.acc << nbits) | value
+        self.bits += nbits
+        if self.bits >= 64:
+            whole = self.bits & ~7
+            rest = self.bits - whole
+            self.out += (self.acc >> rest).to_bytes(whole >> 3, 'big')
+            self.acc &= (1 << rest) - 1
+            self.bits = rest
+
+    def getvalue(self) -> bytes:
+        if self.bits:
+            pad = -self.bits % 8
+            self.out += (self.acc << pad).to_bytes((self.bits + pad) >> 3, 'big')
+            self.acc, self.bits = 0, 0
+        return bytes(self.out)
+
+
+def encode_block(timestamps: Sequence[int], values: Sequence[float]) -> bytes:
+    """把一组按时间升序的 (epoch毫秒, 数值) 编码为一个压缩块，缺失值按 NaN 存储"""
+    count = len(timestamps)
+    if count != len(values):
+        raise ValueError("时间戳与数值的数量不一致")
+    if count == 0:
+        return _HEADER.pack(0, 0, 0)
+
+    ts = np.asarray(timestamps, dtype=np.int64)
+    value_array = np.array(
+        [np.nan if value is None else value for value in values], dtype=np.float64
+    )
+    value_bits = value_array.view(np.uint64)
+
+    deltas = np.diff(ts, prepend=ts[0])
+    dods = np.diff(deltas).tolist()
+    xors = (value_bits[1:] ^ value_bits[:-1]).tolist()
+
+    writer = _BitWriter()
+    write = writer.write
+    prev_lead, prev_trail = -1, -1
+    for dod, xor in zip(dods, xors):
+        if dod == 0:
+            write(0, 1)
+        else:
+            for prefix, prefix_bits, nbits, low in _DOD_BUCKETS:
+                if low <= dod <= low + (1 << nbits) - 1:
+                    write((prefix << nbits) | (dod - low), prefix_bits + nbits)
+                    break
+            else:
+                write(0b1111, 4)
+                write(dod & _MASK64, 64)
+
+        if xor == 0:
+            write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if prev_lead >= 0 and lead >= prev_lead and trail >= prev_trail:
+            # 有效位落在上一个窗口内，沿用窗口
+            write(0b10, 2)
+            write(xor >> prev_trail, 64 - prev_lead - prev_trail)
+        else:
+            significant = 64 - lead - trail
+            write((0b11 << 11) | (lead << 6) | (significant - 1), 13)
+            write(xor >> trail, significant)
+            prev_lead, prev_trail = lead, trail
+
+    return _HEADER.pack(count, int(ts[0]), int(value_bits[0])) + writer.getvalue()
+
+
+def decode_block(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """解码压缩块，返回 (int64 时间戳数组, float64 数值数组)"""
+    count, first_ts, first_bits = _HEADER.unpack_from(payload)
+    if count == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    # 末尾补零，按7字节整块补充缓冲区时不必判断越界
+    data = bytes(payload[_HEADER.size:]) + bytes(8)
+    from_bytes = int.from_bytes
+    pos = 0
+    buf, nbuf = 0, 0
+
+    timestamps = [first_ts]
+    value_bits = [first_bits]
+    timestamp, delta, bits = first_ts, 0, first_bits
+    lead, significant, trail = 0, 0, 0
+
+    for _ in range(count - 1):
+        # 单个样本最多占用 4+64+13+64 位，先补足缓冲区
+        while nbuf < 145:
+            buf = (buf << 56) | from_bytes(data[pos:pos + 7], 'big')
+            pos += 7
+            nbuf += 56
+
+        # 时间戳：二阶差分
+        nbuf -= 1
+        if not (buf >> nbuf) & 1:
+            dod = 0
+        else:
+            nbuf -= 1
+            if not (buf >> nbuf) & 1:
+                nbuf -= 7
+                dod = ((buf >> nbuf) & 0x7F) - 63
+            else:
+                nbuf -= 1
+                if not (buf >> nbuf) & 1:
+                    nbuf -= 9
+                    dod = ((buf >> nbuf) & 0x1FF) - 255
+                else:
+                    nbuf -= 1
+                    if not (buf >> nbuf) & 1:
+                        nbuf -= 12
+                        dod = ((buf >> nbuf) & 0xFFF) - 2047
+                    else:
+                        nbuf -= 64
+                        dod = (buf >> nbuf) & _MASK64
+                        if dod >= 1 << 63:
+                            dod -= 1 << 64
+        delta += dod
+        timestamp += delta
+        timestamps.append(timestamp)
+
+        # 数值：异或编码
+        nbuf -= 1
+        if (buf >> nbuf) & 1:
+            nbuf -= 1
+            if (buf >> nbuf) & 1:
+                nbuf -= 11
+                header = (buf >> nbuf) & 0x7FF
+                lead = header >> 6
+                significant = (header & 0x3F) + 1
+                trail = 64 - lead - significant
+            nbuf -= significant
+            bits ^= ((buf >> nbuf) & ((1 << significant) - 1)) << trail
+        value_bits.append(bits)
+        buf &= (1 << nbuf) - 1
+
+    return (
+        np.array(timestamps, dtype=np.int64),
+        np.array(value_bits, dtype=np.uint64).view(np.float64),
+    )
@@ -0,0 +1,159 @@
+# agriculture_system/database/migrations.py
+# 数据库结构版本迁移：版本号保存在 PRAGMA user_version 中，
+# 每个迁移在单独的事务里执行，已有数据库打开时按顺序升级到最新版本
+import sqlite3
+from typing import Callable, List, Tuple
+
+from ..utils.time_utils import to_epoch_ms
+from .models import ALERT_STATE_COLUMNS, INDEXES, TABLE_COLUMNS
+from .partitions import PARTITIONED_TABLES, create_id_sequence, create_partition, month_range
+from .rollups import backfill_rollups, create_rollup_tables
+
+
+def _create_table_sql(table: str, timestamp_type: str, name: str = None) -> str:
+    columns = ',\n    '.join(f"{col} {col_type}" for col, col_type in TABLE_COLUMNS[table])
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name or table} (\n"
+        f"    id INTEGER PRIMARY KEY AUTOINCREMENT,\n"
+        f"    timestamp {timestamp_type},\n"
+        f"    {columns}\n"
+        f")"
+    )
+
+
+def unparsed_table(table: str) -> str:
+    """迁移时时间戳无法解析的行所在的隔离表"""
+    return f"{table}_unparsed"
+
+
+def _v1_initial_schema(conn: sqlite3.Connection):
+    """初始表结构（timestamp 为 DATETIME 字符串）"""
+    for table in TABLE_COLUMNS:
+        conn.execute(_create_table_sql(table, 'DATETIME'))
+
+
+def _v2_epoch_timestamps_and_indexes(conn: sqlite3.Connection):
+    """timestamp 改为整数epoch毫秒并建立时间/位置索引，原地转换已有数据"""
+    conn.create_function('to_epoch_ms', 1, _sql_to_epoch_ms)
+    # 早期数据库可能缺少部分表，先按版本1结构补齐
+    _v1_initial_schema(conn)
+
+    for table, columns in TABLE_COLUMNS.items():
+        column_names = ', '.join(col for col, _ in columns)
+        conn.execute(_create_table_sql(table, 'INTEGER', name=f"{table}_v2"))
+        conn.execute(f'''
+            INSERT INTO {table}_v2 (id, timestamp, {column_names})
+            SELECT id, to_epoch_ms(timestamp), {column_names} FROM {table}
+        ''')
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_v2 RENAME TO {table}")
+
+    for index_name, table, columns in INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+
+
+def _v3_sensor_rollups(conn: sqlite3.Connection):
+    """分钟/小时/天汇总表，并由已有原始数据回填"""
+    create_rollup_tables(conn)
+    backfill_rollups(conn)
+
+
+def _v4_monthly_partitions(conn: sqlite3.Connection):
+    """sensor_data/weather_data 拆分为按月分区表，原表数据按月迁入后删除
+
+    没有时间戳（版本2转换时无法解析）的行无法归入任何分区，
+    原样移入 {table}_unparsed 隔离表，不随原表删除。
+    原有 id 保留，之后的 id 由跨分区的序列接着分配。
+    """
+    for table in PARTITIONED_TABLES:
+        columns = ', '.join(col for col, _ in TABLE_COLUMNS[table])
+        max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+        create_id_sequence(conn, table, (max_id or 0) + 1)
+        unparsed = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE timestamp IS NULL"
+        ).fetchone()[0]
+        if unparsed:
+            conn.execute(_create_table_sql(table, 'INTEGER', name=unparsed_table(table)))
+            conn.execute(f'''
+                INSERT INTO {unparsed_table(table)} (id, timestamp, {columns})
+                SELECT id, timestamp, {columns} FROM {table} WHERE timestamp IS NULL
+            ''')
+        keys = [row[0] for row in conn.execute(f'''
+            SELECT DISTINCT strftime('%Y%m', timestamp / 1000, 'unixepoch')
+            FROM {table} WHERE timestamp IS NOT NULL
+        ''')]
+        for key in keys:
+            name = create_partition(conn, table, key)
+            start_ms, end_ms = month_range(key)
+            conn.execute(f'''
+                INSERT INTO {name} (id, timestamp, {columns})
+                SELECT id, timestamp, {columns} FROM {table}
+                WHERE timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp
+            ''', (start_ms, end_ms))
+        conn.execute(f"DROP TABLE {table}")
+
+
+def _v5_alert_state(conn: sqlite3.Connection):
+    """alert_records 增加报警键与解除时间，报警解除时按键更新 resolved"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(alert_records)")}
+    for column, column_type in ALERT_STATE_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE alert_records ADD COLUMN {column} {column_type}")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_alert_records_key ON alert_records (alert_key, resolved)"
+    )
+
+
+def _sql_to_epoch_ms(value):
+    try:
+        return to_epoch_ms(value)
+    except (TypeError, ValueError):
+        return None
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _v1_initial_schema),
+    (2, _v2_epoch_timestamps_and_indexes),
+    (3, _v3_sensor_rollups),
+    (4, _v4_monthly_partitions),
+    (5, _v5_alert_state),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """把数据库升级到最新版本，返回执行的迁移数量"""
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return 0
+
+    applied = 0
+    for version, upgrade in MIGRATIONS:
+        # IMMEDIATE 事务先取得写锁，多个进程同时打开数据库时只有一个执行迁移
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = get_schema_version(conn)
+            if current == 0 and _has_table(conn, 'sensor_data'):
+                # 引入版本号之前创建的数据库，结构与版本1一致
+                current = 1
+            if version > current:
+                upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
@@ -0,0 +1,58 @@
+# agriculture_system/database/models.py
+# 各表除 id、timestamp 之外的列定义
+TABLE_COLUMNS = {
+    'weather_data': [
+        ('temperature', 'REAL'),
+        ('humidity', 'REAL'),
+        ('rainfall', 'REAL'),
+        ('wind_speed', 'REAL'),
+        ('location', 'TEXT'),
+    ],
+    'sensor_data': [
+        ('air_temperature', 'REAL'),
+        ('soil_temperature', 'REAL'),
+        ('air_humidity', 'REAL'),
+        ('soil_humidity', 'REAL'),
+        ('soil_ph', 'REAL'),
+        ('light_intensity', 'REAL'),
+    ],
+    'crop_growth': [
+        ('crop_type', 'TEXT'),
+        ('growth_stage', 'TEXT'),
+        ('health_score', 'REAL'),
+        ('height', 'REAL'),
+        ('notes', 'TEXT'),
+    ],
+    'pest_disease_records': [
+        ('pest_type', 'TEXT'),
+        ('disease_type', 'TEXT'),
+        ('severity', 'REAL'),
+        ('treatment_applied', 'TEXT'),
+        ('effectiveness', 'REAL'),
+    ],
+    'alert_records': [
+        ('alert_type', 'TEXT'),
+        ('alert_level', 'TEXT'),
+        ('message', 'TEXT'),
+        ('resolved', 'BOOLEAN DEFAULT FALSE'),
+    ],
+}
+
+# 版本6起 alert_records 的附加列：报警键（规则:通道），用于按键标记解除，以及解除时间
+ALERT_STATE_COLUMNS = [
+    ('alert_key', 'TEXT'),
+    ('resolved_at', 'INTEGER'),
+]
+
+# 二级索引：weather_data 按 (location, timestamp) 覆盖历史查询，
+# sensor_data 按 timestamp 覆盖统计查询用到的列
+INDEXES = [
+    ('idx_weather_data_location_ts', 'weather_data',
+     'location, timestamp, temperature, humidity, rainfall, wind_speed'),
+    ('idx_weather_data_ts', 'weather_data', 'timestamp'),
+    ('idx_sensor_data_ts', 'sensor_data',
+     'timestamp, air_temperature, soil_humidity, air_humidity'),
+    ('idx_crop_growth_ts', 'crop_growth', 'timestamp'),
+    ('idx_pest_disease_records_ts', 'pest_disease_records', 'timestamp'),
+    ('idx_alert_records_ts', 'alert_records', 'timestamp'),
+]
@@ -0,0 +1,201 @@
+# agriculture_system/database/partitions.py
+import calendar
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models import INDEXES, TABLE_COLUMNS
+
+# 按月分区的原始数据表，分区表名形如 sensor_data_p202610（UTC月份）
+PARTITIONED_TABLES = ('sensor_data', 'weather_data')
+
+# 同样按月分区、由各自模块建表的派生表（Gorilla 压缩块）
+DERIVED_PARTITIONED_TABLES = ('sensor_blocks',)
+
+# 各月分区是独立的表，id 由这张序列表统一分配，保证同一张原始表的 id 跨月唯一
+ID_SEQUENCE_TABLE = 'partition_ids'
+
+
+def month_key(timestamp_ms: int) -> str:
+    """epoch毫秒所在的UTC月份，如 '202610'"""
+    tm = time.gmtime(timestamp_ms // 1000)
+    return f"{tm.tm_year:04d}{tm.tm_mon:02d}"
+
+
+def month_range(key: str) -> Tuple[int, int]:
+    """月份分区覆盖的 [起, 止) epoch毫秒"""
+    year, month = int(key[:4]), int(key[4:])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    start = calendar.timegm((year, month, 1, 0, 0, 0))
+    end = calendar.timegm((next_year, next_month, 1, 0, 0, 0))
+    return start * 1000, end * 1000
+
+
+def partition_name(table: str, key: str) -> str:
+    return f"{table}_p{key}"
+
+
+def create_partition(conn: sqlite3.Connection, table: str, key: str) -> str:
+    """创建月份分区表及其索引（已存在时不做处理）"""
+    name = partition_name(table, key)
+    columns = ',\n    '.join(f"{col} {col_type}" for col, col_type in TABLE_COLUMNS[table])
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} (\n"
+        f"    id INTEGER PRIMARY KEY,\n"
+        f"    timestamp INTEGER,\n"
+        f"    {columns}\n"
+        f")"
+    )
+    prefix = f"idx_{table}_"
+    for index_name, index_table, index_columns in INDEXES:
+        if index_table == table:
+            suffix = index_name[len(prefix):]
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{name}_{suffix} ON {name} ({index_columns})"
+            )
+    return name
+
+
+def create_id_sequence(conn: sqlite3.Connection, table: str, next_id: int = 1):
+    """建立 id 序列表并设置 table 的下一个 id（已有记录时保留较大者）"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ID_SEQUENCE_TABLE} (
+            name TEXT PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(f"INSERT OR IGNORE INTO {ID_SEQUENCE_TABLE} (name, next_id) VALUES (?, 1)",
+                 (table,))
+    conn.execute(f"UPDATE {ID_SEQUENCE_TABLE} SET next_id = MAX(next_id, ?) WHERE name = ?",
+                 (next_id, table))
+
+
+def with_ids(conn: sqlite3.Connection, table: str, rows: Sequence[Sequence]) -> List[tuple]:
+    """为写入 table 分区的行分配连续 id，返回首列为 id 的行（须在写事务中调用）"""
+    # 先 UPDATE 取得写锁，并发写入的事务按顺序分配，不会拿到重叠的区间
+    conn.execute(
+        f"UPDATE {ID_SEQUENCE_TABLE} SET next_id = next_id + ? WHERE name = ?",
+        (len(rows), table)
+    )
+    end = conn.execute(
+        f"SELECT next_id FROM {ID_SEQUENCE_TABLE} WHERE name = ?", (table,)
+    ).fetchone()[0]
+    first = end - len(rows)
+    return [(first + i,) + tuple(row) for i, row in enumerate(rows)]
+
+
+class PartitionManager:
+    """月份分区管理
+
+    写入时按行的时间戳路由到对应月份的分区表（按需创建），
+    查询时只返回与时间范围重叠的分区，清理时整表删除或归档。
+    """
+
+    def __init__(self):
+        self._partitions: Dict[str, List[str]] = {}
+        self._schema_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def partitions(self, conn: sqlite3.Connection, table: str) -> List[str]:
+        """已存在的月份分区（升序）"""
+        self._refresh(conn)
+        with self._lock:
+            return list(self._partitions.get(table, []))
+
+    def overlapping(self, conn: sqlite3.Connection, table: str,
+                    start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[str]:
+        """与 [start_ms, end_ms) 重叠的分区表名（按时间升序）"""
+        names = []
+        for key in self.partitions(conn, table):
+            part_start, part_end = month_range(key)
+            if start_ms is not None and part_end <= start_ms:
+                continue
+            if end_ms is not None and part_start >= end_ms:
+                continue
+            names.append(partition_name(table, key))
+        return names
+
+    def route(self, conn: sqlite3.Connection, table: str,
+              rows: Iterable[Sequence]) -> List[Tuple[str, List[Sequence]]]:
+        """把首列为epoch毫秒时间戳的行按月份分组，并确保分区表存在"""
+        groups: Dict[str, List[Sequence]] = {}
+        current_key, current_range = None, (0, 0)
+        for row in rows:
+            timestamp = row[0]
+            if not current_range[0] <= timestamp < current_range[1]:
+                current_key = month_key(timestamp)
+                current_range = month_range(current_key)
+            groups.setdefault(current_key, []).append(row)
+
+        existing = set(self.partitions(conn, table))
+        routed = []
+        for key, group in groups.items():
+            if key not in existing:
+                create_partition(conn, table, key)
+                self._invalidate()
+            routed.append((partition_name(table, key), group))
+        return routed
+
+    def ensure(self, conn: sqlite3.Connection, table: str, key: str,
+               create: Callable[[sqlite3.Connection, str], object]) -> str:
+        """确保月份分区存在（不存在时调用 create(conn, 分区表名) 建表），返回分区表名"""
+        name = partition_name(table, key)
+        if key not in self.partitions(conn, table):
+            create(conn, name)
+            self._invalidate()
+        return name
+
+    def drop(self, conn: sqlite3.Connection, table: str, key: str):
+        """整表删除一个分区"""
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {partition_name(table, key)}")
+        self._invalidate()
+
+    def archive(self, conn: sqlite3.Connection, table: str, key: str, archive_dir: str) -> str:
+        """把分区追加到独立的SQLite归档文件后删除，返回归档文件路径
+
+        同一月份再次归档（如迟到的数据重建了已归档的分区）时追加到已有归档中。
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{table}_{key}.db")
+        name = partition_name(table, key)
+
+        # ATTACH 不能在事务中执行
+        conn.commit()
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            with conn:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS "
+                             f"SELECT * FROM main.{name} WHERE 0")
+                conn.execute(f"INSERT INTO archive.{table} SELECT * FROM main.{name}")
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+        self.drop(conn, table, key)
+        return path
+
+    def _refresh(self, conn: sqlite3.Connection):
+        # schema_version 在任何连接修改表结构后都会变化，据此判断缓存是否过期
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        with self._lock:
+            if version == self._schema_version:
+                return
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )]
+        partitions: Dict[str, List[str]] = {}
+        for table in PARTITIONED_TABLES + DERIVED_PARTITIONED_TABLES:
+            prefix = f"{table}_p"
+            partitions[table] = sorted(
+                name[len(prefix):] for name in names
+                if name.startswith(prefix) and name[len(prefix):].isdigit()
+            )
+        with self._lock:
+            self._partitions = partitions
+            self._schema_version = version
+
+    def _invalidate(self):
+        with self._lock:
+            self._schema_version = None
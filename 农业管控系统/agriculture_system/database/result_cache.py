@@ -0,0 +1,114 @@
+# agriculture_system/database/result_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class ResultCache:
+    """有界 LRU + TTL 查询结果缓存
+
+    键为元组，首个元素是查询类别（如 'sensor_statistics'）。每个类别维护一个
+    版本号，查询开始时记下版本，put() 时版本已变化说明期间有写入，结果不再缓存。
+    写入方在提交前调用 begin_write() 递增版本，提交后调用 update() 再次递增，
+    并对同类别的条目逐个增量更新或使其失效。在两次递增之间缓存的条目无法确定
+    是否已包含本次写入的行，update() 直接移除而不合并，避免重复计数。
+    ttl 为0时不缓存。
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'updates': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def version(self, kind: str) -> tuple:
+        with self._lock:
+            return self._epoch, self._versions.get(kind, 0)
+
+    def begin_write(self, kind: str) -> int:
+        """在提交 kind 类数据之前调用，返回传给 update() 的写入版本"""
+        with self._lock:
+            version = self._versions[kind] = self._versions.get(kind, 0) + 1
+            return version
+
+    def get(self, key: tuple):
+        """返回缓存的值，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key: tuple, value, version: Optional[tuple] = None):
+        """缓存查询结果；version 为查询开始时 version(key[0]) 的返回值"""
+        if not self.enabled:
+            return
+        with self._lock:
+            current = self._versions.get(key[0], 0)
+            if version is not None and version != (self._epoch, current):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value, current)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def update(self, kind: str, fn: Callable[[tuple, object], bool],
+               since: Optional[int] = None):
+        """写入 kind 类数据提交后调用 fn(key, value)：已增量更新条目时返回 True，
+        不受影响时返回 None，返回 False 表示无法增量更新，条目将被移除
+
+        since 为提交前 begin_write() 的返回值，此后缓存的条目直接移除。
+        """
+        with self._lock:
+            self._versions[kind] = self._versions.get(kind, 0) + 1
+            for key in [k for k in self._entries if k[0] == kind]:
+                _, value, version = self._entries[key]
+                if since is not None and version >= since:
+                    outcome = False
+                else:
+                    outcome = fn(key, value)
+                if outcome is False:
+                    del self._entries[key]
+                    self._stats['invalidations'] += 1
+                elif outcome:
+                    self._stats['updates'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def metrics(self) -> Dict:
+        """命中/未命中次数、命中率与当前条目数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
@@ -0,0 +1,44 @@
+# agriculture_system/database/retention.py
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class RetentionPolicy:
+    """数据保留策略
+
+    原始数据保留 raw_days 天，超期的月份分区整表归档（archive=True）或删除；
+    汇总数据按粒度分别保留更长时间。值为 None 表示永久保留。
+    """
+    raw_days: Optional[int] = 90
+    rollup_days: Dict[str, Optional[int]] = field(default_factory=lambda: {
+        'minute': 30,
+        'hour': 730,
+        'day': None,
+    })
+    archive: bool = True
+    archive_dir: str = 'archive'
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> 'RetentionPolicy':
+        """从配置文件的 retention 段构造策略，缺省项使用默认值"""
+        policy = cls()
+        if not config:
+            return policy
+        policy.raw_days = config.get('raw_days', policy.raw_days)
+        policy.rollup_days.update(config.get('rollup_days', {}))
+        policy.archive = config.get('archive', policy.archive)
+        policy.archive_dir = config.get('archive_dir', policy.archive_dir)
+        return policy
+
+    def retained_since(self, now_ms: int) -> Dict[str, Optional[int]]:
+        """按策略各存储仍保证保留的最早时间（epoch毫秒），None 表示不限
+
+        键为 'raw' 与各汇总粒度；早于该时间的数据可能已被清理。
+        """
+        def since(days: Optional[int]) -> Optional[int]:
+            return None if days is None else now_ms - days * 86_400_000
+
+        retained = {grain: since(days) for grain, days in self.rollup_days.items()}
+        retained['raw'] = since(self.raw_days)
+        return retained
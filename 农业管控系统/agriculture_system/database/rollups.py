@@ -0,0 +1,274 @@
+# agriculture_system/database/rollups.py
+import math
+import sqlite3
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .partitions import PartitionManager
+
+# 参与汇总的传感器列，顺序与 sensor_data 插入行中 timestamp 之后的列一致
+ROLLUP_METRICS = (
+    'air_temperature', 'soil_temperature', 'air_humidity',
+    'soil_humidity', 'soil_ph', 'light_intensity',
+)
+
+MINUTE_MS = 60_000
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+
+# 由粗到细排列，查询时优先使用最粗且完整落在时间窗口内的粒度
+ROLLUP_GRAINS = (('day', DAY_MS), ('hour', HOUR_MS), ('minute', MINUTE_MS))
+GRAIN_SIZES = dict(ROLLUP_GRAINS)
+
+UPSERT_SQL = '''
+    INSERT INTO sensor_rollup_{grain}
+    (bucket, metric, sample_count, value_sum, value_min, value_max, value_sum_sq)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bucket, metric) DO UPDATE SET
+        sample_count = sample_count + excluded.sample_count,
+        value_sum = value_sum + excluded.value_sum,
+        value_min = MIN(value_min, excluded.value_min),
+        value_max = MAX(value_max, excluded.value_max),
+        value_sum_sq = value_sum_sq + excluded.value_sum_sq
+'''
+
+
+class RollupAggregate:
+    """一组样本的可合并统计量：数量、和、最小值、最大值、平方和"""
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'total_sq')
+
+    def __init__(self, count: int = 0, total: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 total_sq: float = 0.0):
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.total_sq = total_sq
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, count, total, minimum, maximum, total_sq):
+        if not count:
+            return
+        self.count += count
+        self.total += total or 0.0
+        self.total_sq += total_sq or 0.0
+        if minimum is not None and (self.minimum is None or minimum < self.minimum):
+            self.minimum = minimum
+        if maximum is not None and (self.maximum is None or maximum > self.maximum):
+            self.maximum = maximum
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """总体标准差"""
+        if not self.count:
+            return None
+        variance = self.total_sq / self.count - self.mean ** 2
+        return math.sqrt(max(variance, 0.0))
+
+    def as_row(self) -> Tuple:
+        return self.count, self.total, self.minimum, self.maximum, self.total_sq
+
+
+def create_rollup_tables(conn: sqlite3.Connection):
+    """创建分钟/小时/天三个粒度的汇总表"""
+    for grain, _ in ROLLUP_GRAINS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS sensor_rollup_{grain} (
+                bucket INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                sample_count INTEGER NOT NULL,
+                value_sum REAL NOT NULL,
+                value_min REAL,
+                value_max REAL,
+                value_sum_sq REAL NOT NULL,
+                PRIMARY KEY (bucket, metric)
+            ) WITHOUT ROWID
+        ''')
+
+
+def backfill_rollups(conn: sqlite3.Connection):
+    """根据 sensor_data 中已有的原始数据重建汇总表
+
+    分钟表由原始数据聚合，小时表和天表再由更细一级的汇总表合并，
+    避免多次扫描原始数据。
+    """
+    for grain, _ in ROLLUP_GRAINS:
+        conn.execute(f"DELETE FROM sensor_rollup_{grain}")
+
+    # 各指标的分钟聚合合并后按主键顺序插入，避免 B 树频繁分裂
+    per_metric = ' UNION ALL '.join(
+        f"SELECT (timestamp / {MINUTE_MS}) * {MINUTE_MS} AS bucket, '{metric}' AS metric, "
+        f"COUNT({metric}), SUM({metric}), MIN({metric}), MAX({metric}), "
+        f"SUM({metric} * {metric}) "
+        f"FROM sensor_data WHERE {metric} IS NOT NULL AND timestamp IS NOT NULL "
+        f"GROUP BY 1"
+        for metric in ROLLUP_METRICS
+    )
+    conn.execute(f'''
+        INSERT INTO sensor_rollup_minute
+        (bucket, metric, sample_count, value_sum, value_min, value_max, value_sum_sq)
+        SELECT * FROM ({per_metric}) ORDER BY bucket, metric
+    ''')
+
+    for grain, finer in (('hour', 'minute'), ('day', 'hour')):
+        size = GRAIN_SIZES[grain]
+        conn.execute(f'''
+            INSERT INTO sensor_rollup_{grain}
+            (bucket, metric, sample_count, value_sum, value_min, value_max, value_sum_sq)
+            SELECT (bucket / {size}) * {size}, metric, SUM(sample_count), SUM(value_sum),
+                   MIN(value_min), MAX(value_max), SUM(value_sum_sq)
+            FROM sensor_rollup_{finer}
+            GROUP BY 1, 2
+        ''')
+
+
+def aggregate_rows(rows: Iterable[Sequence]) -> Dict[str, Dict[Tuple[int, str], RollupAggregate]]:
+    """把一批 sensor_data 行 (timestamp, 各指标...) 聚合到各粒度的桶中"""
+    minute: Dict[Tuple[int, str], RollupAggregate] = {}
+    for row in rows:
+        timestamp = row[0]
+        if timestamp is None:
+            continue
+        bucket = timestamp - timestamp % MINUTE_MS
+        for metric, value in zip(ROLLUP_METRICS, row[1:]):
+            # NaN 与 NULL 一样视为缺失，否则会使汇总的和与平方和变为 NaN
+            if value is None or value != value:
+                continue
+            key = (bucket, metric)
+            aggregate = minute.get(key)
+            if aggregate is None:
+                aggregate = minute[key] = RollupAggregate()
+            aggregate.add(value)
+
+    # 小时/天粒度由分钟桶合并得到
+    result = {'minute': minute}
+    for grain in ('hour', 'day'):
+        size = GRAIN_SIZES[grain]
+        coarse: Dict[Tuple[int, str], RollupAggregate] = {}
+        for (bucket, metric), aggregate in minute.items():
+            key = (bucket - bucket % size, metric)
+            target = coarse.get(key)
+            if target is None:
+                target = coarse[key] = RollupAggregate()
+            target.merge(*aggregate.as_row())
+        result[grain] = coarse
+    return result
+
+
+def purge_rollups(conn: sqlite3.Connection, grain: str, before_ms: int) -> int:
+    """删除早于 before_ms 的汇总桶（按主键范围删除），返回删除行数"""
+    cursor = conn.execute(f"DELETE FROM sensor_rollup_{grain} WHERE bucket < ?", (before_ms,))
+    return cursor.rowcount
+
+
+def apply_rollups(cursor: sqlite3.Cursor, rows: Iterable[Sequence]):
+    """在写入原始数据的同一事务中增量更新汇总表"""
+    for grain, buckets in aggregate_rows(rows).items():
+        if buckets:
+            cursor.executemany(
+                UPSERT_SQL.format(grain=grain),
+                [(bucket, metric) + aggregate.as_row()
+                 for (bucket, metric), aggregate in buckets.items()]
+            )
+
+
+def plan_segments(start_ms: int, end_ms: int,
+                  retained: Optional[Dict[str, Optional[int]]] = None) -> List[Tuple[str, int, int]]:
+    """把 [start_ms, end_ms) 拆分为 (粒度, 起, 止) 区间
+
+    每个位置选择对齐且完整落在窗口内的最粗粒度，窗口两端不足一分钟的
+    部分标记为 'raw'，由原始数据补齐。无论窗口多长，区间数都有上限。
+
+    retained 为各存储（'raw' 与各粒度）保留的最早时间（见
+    RetentionPolicy.retained_since），早于它的粒度不再使用：分钟桶已清理的
+    部分改读原始数据；原始数据也已清理时取包含该位置的整个小时桶（近似）。
+    """
+    retained = retained or {}
+
+    def available(grain: str, position: int) -> bool:
+        since = retained.get(grain)
+        return since is None or position >= since
+
+    segments: List[Tuple[str, int, int]] = []
+    position = start_ms
+    while position < end_ms:
+        for grain, size in ROLLUP_GRAINS:
+            if position % size == 0 and position + size <= end_ms and available(grain, position):
+                if grain == 'day':
+                    # 一次跳过所有完整的天
+                    step = (end_ms - position) // size * size
+                else:
+                    step = size
+                segment = (grain, position, position + step)
+                break
+        else:
+            next_minute = position - position % MINUTE_MS + MINUTE_MS
+            if available('minute', position) or available('raw', position):
+                segment = ('raw', position, min(next_minute, end_ms))
+            else:
+                hour = position - position % HOUR_MS
+                segment = ('hour', hour, hour + HOUR_MS)
+
+        if segments and segments[-1][0] == segment[0] and segments[-1][2] == segment[1]:
+            segments[-1] = (segment[0], segments[-1][1], segment[2])
+        else:
+            segments.append(segment)
+        position = segment[2]
+    return segments
+
+
+def query_rollup_statistics(conn: sqlite3.Connection, partitions: PartitionManager,
+                            start_ms: int, end_ms: int,
+                            metrics: Sequence[str] = ROLLUP_METRICS,
+                            block_reader: Optional[Callable] = None,
+                            retained: Optional[Dict[str, Optional[int]]] = None
+                            ) -> Dict[str, RollupAggregate]:
+    """合并汇总表与窗口两端的原始数据，得到 [start_ms, end_ms) 内各指标的统计量
+
+    原始数据已被压缩存储时，block_reader(conn, 起, 止, metrics) 返回
+    区间内压缩块中的 {指标: 数值序列}，与分区中的原始行一起补齐窗口两端。
+    retained 见 plan_segments。
+    """
+    results = {metric: RollupAggregate() for metric in metrics}
+    placeholders = ', '.join('?' for _ in metrics)
+
+    for grain, seg_start, seg_end in plan_segments(start_ms, end_ms, retained):
+        if grain == 'raw':
+            columns = ', '.join(
+                f"COUNT({m}), SUM({m}), MIN({m}), MAX({m}), SUM({m} * {m})" for m in metrics
+            )
+            for table in partitions.overlapping(conn, 'sensor_data', seg_start, seg_end):
+                row = conn.execute(
+                    f"SELECT {columns} FROM {table} WHERE timestamp >= ? AND timestamp < ?",
+                    (seg_start, seg_end)
+                ).fetchone()
+                for i, metric in enumerate(metrics):
+                    results[metric].merge(*row[i * 5:i * 5 + 5])
+            if block_reader is not None:
+                for metric, values in block_reader(conn, seg_start, seg_end, metrics).items():
+                    for value in values:
+                        results[metric].add(float(value))
+        else:
+            cursor = conn.execute(f'''
+                SELECT metric, SUM(sample_count), SUM(value_sum), MIN(value_min),
+                       MAX(value_max), SUM(value_sum_sq)
+                FROM sensor_rollup_{grain}
+                WHERE bucket >= ? AND bucket < ? AND metric IN ({placeholders})
+                GROUP BY metric
+            ''', (seg_start, seg_end, *metrics))
+            for metric, *values in cursor:
+                results[metric].merge(*values)
+    return results
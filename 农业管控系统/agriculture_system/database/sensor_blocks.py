@@ -0,0 +1,255 @@
+# agriculture_system/database/sensor_blocks.py
+import heapq
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.time_utils import now_ms
+from .gorilla import decode_block, encode_block
+from .partitions import PartitionManager, month_key, month_range, partition_name
+from .rollups import HOUR_MS, ROLLUP_METRICS
+from .streaming import iter_chunks
+
+SENSOR_STORAGE_BACKENDS = ('raw', 'gorilla')
+
+# 压缩块按块所在小时的UTC月份分区，分区表名形如 sensor_blocks_p202610
+BLOCK_TABLE = 'sensor_blocks'
+
+BLOCK_UPSERT_SQL = '''
+    INSERT OR REPLACE INTO {table}
+    (hour, metric, sample_count, first_ts, last_ts, payload)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def create_block_table(conn: sqlite3.Connection, name: str):
+    """按 (小时, 指标) 存放 Gorilla 压缩块的月份分区表"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            hour INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            sample_count INTEGER NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (hour, metric)
+        )
+    ''')
+
+
+class SensorBlockStore:
+    """传感器数据的 Gorilla 压缩存储
+
+    写入仍先进入原始月份分区（当前小时保持原始行，便于追加），
+    每跨过一个整点就把已结束小时的原始行压缩为每个指标一个块并删除原始行。
+    压缩由 start() 启动的后台线程定期执行，不占用写入调用的时间。
+    读取时合并解码后的块与尚未压缩的原始行，调用方无需关心数据所在位置。
+    压缩后不保留原始行的 id。块与原始数据一样按月分区，保留期满时整表清理。
+    """
+
+    def __init__(self, partitions: PartitionManager):
+        self.partitions = partitions
+        self.last_error: Optional[Exception] = None
+        self._compacted_until: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, pool, interval: float = 60.0):
+        """在后台线程中每 interval 秒检查一次是否进入新的小时并压缩"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(pool, interval),
+                                        name='sensor-compaction', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, pool, interval: float):
+        try:
+            while True:
+                try:
+                    self.maybe_compact(pool.connection())
+                except Exception as e:
+                    # 下一个周期重试：压缩在单个事务中进行，失败时原始行保持不变
+                    self.last_error = e
+                    with self._lock:
+                        self._compacted_until = None
+                if self._stop.wait(interval):
+                    return
+        finally:
+            pool.close()
+
+    def maybe_compact(self, conn: sqlite3.Connection, now: Optional[int] = None) -> int:
+        """进入新的小时后压缩此前的所有原始行，返回压缩的行数"""
+        now = now_ms() if now is None else now
+        cutoff = now - now % HOUR_MS
+        with self._lock:
+            if self._compacted_until is not None and cutoff <= self._compacted_until:
+                return 0
+            self._compacted_until = cutoff
+        return self.compact(conn, cutoff)
+
+    def compact(self, conn: sqlite3.Connection, before_ms: int) -> int:
+        """把早于 before_ms（应为整点）的原始行压缩为块"""
+        columns = ['timestamp'] + list(ROLLUP_METRICS)
+        compacted = 0
+        # 读取前即取得写锁，避免读取与删除之间写入的迟到行未经压缩就被删除
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            for table in self.partitions.overlapping(conn, 'sensor_data', None, before_ms):
+                hour, rows = None, []
+                chunks = iter_chunks(conn, [table], columns, 'timestamp < ?', (before_ms,), 10000)
+                for chunk in chunks:
+                    for row in chunk:
+                        row_hour = row[0] - row[0] % HOUR_MS
+                        if row_hour != hour and rows:
+                            self._write_hour(conn, hour, rows)
+                            rows = []
+                        hour = row_hour
+                        rows.append(row)
+                if rows:
+                    self._write_hour(conn, hour, rows)
+                compacted += conn.execute(
+                    f"DELETE FROM {table} WHERE timestamp < ?", (before_ms,)
+                ).rowcount
+        return compacted
+
+    def _write_hour(self, conn: sqlite3.Connection, hour: int, rows: List[tuple]):
+        """写入一个小时的块；该小时已有块时（迟到数据）先解码合并"""
+        existing = self._decode_hour(conn, hour, ROLLUP_METRICS)
+        if existing is not None:
+            timestamps, values = existing
+            old_rows = zip(timestamps.tolist(), *(values[m].tolist() for m in ROLLUP_METRICS))
+            rows = list(heapq.merge(old_rows, rows, key=lambda row: row[0]))
+
+        timestamps = [row[0] for row in rows]
+        table = self.partitions.ensure(conn, BLOCK_TABLE, month_key(hour), create_block_table)
+        conn.executemany(BLOCK_UPSERT_SQL.format(table=table), [
+            (hour, metric, len(rows), timestamps[0], timestamps[-1],
+             encode_block(timestamps, [row[i] for row in rows]))
+            for i, metric in enumerate(ROLLUP_METRICS, start=1)
+        ])
+
+    def _decode_hour(self, conn: sqlite3.Connection, hour: int,
+                     metrics: Sequence[str]) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        key = month_key(hour)
+        if key not in self.partitions.partitions(conn, BLOCK_TABLE):
+            return None
+        placeholders = ', '.join('?' for _ in metrics)
+        blocks = conn.execute(
+            f"SELECT metric, payload FROM {partition_name(BLOCK_TABLE, key)} "
+            f"WHERE hour = ? AND metric IN ({placeholders})",
+            (hour, *metrics)
+        ).fetchall()
+        if not blocks:
+            return None
+        timestamps, values = None, {}
+        for metric, payload in blocks:
+            timestamps, values[metric] = decode_block(payload)
+        return timestamps, values
+
+    def iter_blocks(self, conn: sqlite3.Connection, start_ms: Optional[int], end_ms: Optional[int],
+                    metrics: Sequence[str]) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """按小时升序解码 [start_ms, end_ms) 内的块，产出 (时间戳, {指标: 数值})"""
+        conditions, params = [], []
+        if start_ms is not None:
+            conditions.append('hour >= ?')
+            params.append(start_ms - start_ms % HOUR_MS)
+        if end_ms is not None:
+            conditions.append('hour < ?')
+            params.append(end_ms)
+        where = ' AND '.join(conditions) or '1'
+        # 分区按月份升序，各分区内按小时升序
+        hours = [
+            row[0]
+            for table in self.partitions.overlapping(conn, BLOCK_TABLE, start_ms, end_ms)
+            for row in conn.execute(
+                f"SELECT DISTINCT hour FROM {table} WHERE {where} ORDER BY hour", params
+            )
+        ]
+
+        metrics = list(metrics) or [ROLLUP_METRICS[0]]
+        for hour in hours:
+            decoded = self._decode_hour(conn, hour, metrics)
+            if decoded is None:
+                continue
+            timestamps, values = decoded
+            lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, 'left'))
+            hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, 'left'))
+            if lo < hi:
+                yield timestamps[lo:hi], {m: v[lo:hi] for m, v in values.items()}
+
+    def iter_rows(self, conn: sqlite3.Connection, start_ms: Optional[int], end_ms: Optional[int],
+                  columns: Sequence[str]) -> Iterator[tuple]:
+        """以原始行的形式产出块中的数据，列顺序同 columns，缺失值为 None"""
+        metrics = [column for column in columns if column != 'timestamp']
+        for timestamps, values in self.iter_blocks(conn, start_ms, end_ms, metrics):
+            series = []
+            for column in columns:
+                if column == 'timestamp':
+                    series.append(timestamps.tolist())
+                else:
+                    data = values[column]
+                    series.append(np.where(np.isnan(data), None, data).tolist())
+            yield from zip(*series)
+
+    def iter_chunks(self, conn: sqlite3.Connection, tables: Sequence[str], columns: Sequence[str],
+                    where: str, params: Tuple, start_ms: Optional[int], end_ms: Optional[int],
+                    chunk_size: int) -> Iterator[List[tuple]]:
+        """按时间戳归并压缩块与原始分区中的行，每批至多 chunk_size 行"""
+        if 'id' in columns:
+            raise ValueError("压缩存储不保留 id 列")
+        strip = 'timestamp' not in columns
+        select = ['timestamp'] + list(columns) if strip else list(columns)
+        position = select.index('timestamp')
+
+        raw_rows = (row for rows in iter_chunks(conn, tables, select, where, params, chunk_size)
+                    for row in rows)
+        merged = heapq.merge(self.iter_rows(conn, start_ms, end_ms, select), raw_rows,
+                             key=lambda row: row[position])
+        chunk = []
+        for row in merged:
+            chunk.append(row[1:] if strip else row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def read_values(self, conn: sqlite3.Connection, start_ms: int, end_ms: int,
+                    metrics: Sequence[str]) -> Dict[str, np.ndarray]:
+        """[start_ms, end_ms) 内各指标的非缺失值，供统计查询补齐窗口两端"""
+        parts: Dict[str, List[np.ndarray]] = {metric: [] for metric in metrics}
+        for _, values in self.iter_blocks(conn, start_ms, end_ms, metrics):
+            for metric in metrics:
+                data = values[metric]
+                parts[metric].append(data[~np.isnan(data)])
+        return {
+            metric: np.concatenate(arrays) if arrays else np.empty(0)
+            for metric, arrays in parts.items()
+        }
+
+    def purge(self, conn: sqlite3.Connection, before_ms: int,
+              archive_dir: Optional[str] = None) -> int:
+        """整表删除完全早于 before_ms 的月份块分区，指定 archive_dir 时先归档，返回清理的块数"""
+        purged = 0
+        for key in self.partitions.partitions(conn, BLOCK_TABLE):
+            if month_range(key)[1] > before_ms:
+                continue
+            purged += conn.execute(
+                f"SELECT COUNT(*) FROM {partition_name(BLOCK_TABLE, key)}"
+            ).fetchone()[0]
+            if archive_dir:
+                self.partitions.archive(conn, BLOCK_TABLE, key, archive_dir)
+            else:
+                self.partitions.drop(conn, BLOCK_TABLE, key)
+        return purged
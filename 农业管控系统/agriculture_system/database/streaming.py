@@ -0,0 +1,70 @@
+# agriculture_system/database/streaming.py
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.time_utils import from_epoch_ms
+from .models import TABLE_COLUMNS
+
+
+def resolve_columns(table: str, columns: Optional[Sequence[str]]) -> List[str]:
+    """校验列投影，未指定时返回 timestamp 与全部数据列"""
+    available = ['id', 'timestamp'] + [col for col, _ in TABLE_COLUMNS[table]]
+    if columns is None:
+        return available[1:]
+    unknown = [col for col in columns if col not in available]
+    if unknown:
+        raise ValueError(f"{table} 中不存在的列: {', '.join(unknown)}")
+    return list(columns)
+
+
+def column_dtype(table: str, column: str):
+    """列对应的NumPy类型：时间戳/ID为int64，REAL为float64，其余为object"""
+    if column in ('id', 'timestamp'):
+        return np.int64
+    col_type = dict(TABLE_COLUMNS[table])[column]
+    return np.float64 if col_type.startswith('REAL') else object
+
+
+def iter_chunks(conn: sqlite3.Connection, tables: Sequence[str], columns: Sequence[str],
+                where: str, params: Tuple, chunk_size: int) -> Iterator[List[tuple]]:
+    """依次扫描各分区，每次从游标取出至多 chunk_size 行"""
+    select = ', '.join(columns)
+    for table in tables:
+        cursor = conn.execute(
+            f"SELECT {select} FROM {table} WHERE {where} ORDER BY timestamp", params
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def rows_to_dicts(rows: Sequence[tuple], columns: Sequence[str]) -> Iterator[Dict]:
+    """逐行转换为字典，timestamp 还原为本地时间"""
+    for row in rows:
+        record = dict(zip(columns, row))
+        if 'timestamp' in record:
+            record['timestamp'] = from_epoch_ms(record['timestamp'])
+        yield record
+
+
+def rows_to_arrays(rows: Sequence[tuple], table: str,
+                   columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """一批行转换为按列存放的NumPy数组，缺失的浮点值为NaN"""
+    batch = {}
+    for i, column in enumerate(columns):
+        dtype = column_dtype(table, column)
+        values = [row[i] for row in rows]
+        if dtype is np.float64:
+            batch[column] = np.array(
+                [np.nan if value is None else value for value in values], dtype=np.float64
+            )
+        else:
+            batch[column] = np.array(values, dtype=dtype)
+    return batch
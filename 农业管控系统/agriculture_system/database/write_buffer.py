@@ -0,0 +1,113 @@
+# agriculture_system/database/write_buffer.py
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+
+class WriteBehindBuffer:
+    """写后缓冲区
+
+    在内存中累积待写入的行，达到行数阈值或最早一行等待超过时间阈值时，
+    在单个事务中批量写入。max_rows 同时是进程崩溃时最多丢失的行数上限：
+    写入失败的行放回缓冲区等待重试，但缓冲区不会超过 max_rows 行，
+    超出的最早的行被丢弃并计入 dropped_rows。
+    """
+
+    def __init__(self, flush_fn: Callable[[Sequence[tuple]], object],
+                 max_rows: int = 200, flush_interval: Optional[float] = 5.0):
+        if max_rows < 1:
+            raise ValueError("max_rows 必须大于0")
+
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+
+        self._rows: List[tuple] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        # 串行化写入，保证多个线程同时刷新时行的先后顺序不变
+        self._flush_lock = threading.Lock()
+
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.dropped_rows = 0
+
+        self._stop_event = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(
+                target=self._run_timer, name='write-behind-flush', daemon=True
+            )
+            self._timer.start()
+
+    def add(self, row: tuple):
+        """追加一行，达到行数阈值时立即刷新"""
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def extend(self, rows: Sequence[tuple]):
+        """追加多行"""
+        with self._lock:
+            if rows and not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """把缓冲区内所有行写入数据库，返回写入行数"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+            if not rows:
+                return 0
+            try:
+                self.flush_fn(rows)
+            except Exception:
+                # 写入失败时放回缓冲区头部，等待下次刷新重试；只保留最新的 max_rows 行
+                with self._lock:
+                    rows.extend(self._rows)
+                    overflow = max(len(rows) - self.max_rows, 0)
+                    self._rows = rows[overflow:]
+                    self.dropped_rows += overflow
+                    self._oldest = time.monotonic()
+                raise
+            self.flushed_rows += len(rows)
+            self.flush_count += 1
+            return len(rows)
+
+    def close(self):
+        """停止定时刷新线程并写入剩余数据"""
+        self._stop_event.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+        self.flush()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _run_timer(self):
+        interval = self.flush_interval
+        while not self._stop_event.wait(min(interval, 1.0)):
+            with self._lock:
+                due = (self._oldest is not None
+                       and time.monotonic() - self._oldest >= interval)
+            if due:
+                try:
+                    self.flush()
+                except Exception:
+                    # 行已放回缓冲区，下一个周期重试
+                    pass
+
+    def __len__(self) -> int:
+        return self.pending
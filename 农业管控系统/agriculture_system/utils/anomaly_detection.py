@@ -0,0 +1,251 @@
+# agriculture_system/utils/anomaly_detection.py
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .time_utils import TimestampLike, now_ms, to_epoch_ms
+
+# 样本标记位，可组合；0 表示正常样本
+FLAG_OK = 0
+FLAG_INVALID = 1   # NaN 或超出量程
+FLAG_SPIKE = 2     # 偏离滚动中位数超过 mad_threshold 倍 MAD
+FLAG_STUCK = 4     # 连续 stuck_samples 个读数不变（探头卡死/断线），默认不检测
+FLAG_RATE = 8      # 相对上一个正常样本的变化速率超过 max_rate
+
+FLAG_NAMES = {
+    FLAG_INVALID: 'invalid',
+    FLAG_SPIKE: 'spike',
+    FLAG_STUCK: 'stuck',
+    FLAG_RATE: 'rate',
+}
+
+# MAD 换算为正态分布标准差的系数
+MAD_SCALE = 1.4826
+
+ChannelSelector = Union[Sequence[Hashable], np.ndarray]
+
+
+def describe_flags(flags: int) -> List[str]:
+    """标记位转换为名称列表，如 5 -> ['invalid', 'stuck']"""
+    return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+
+class AnomalyDetector:
+    """多通道在线异常检测（尖峰 / 卡值 / 变化率 / 量程）
+
+    每个通道保存最近 window 个有效读数的环形窗口，新样本与窗口的
+    滚动中位数比较，偏差超过 mad_threshold 倍（换算后的）MAD 判为尖峰；
+    连续 stuck_samples 个读数变化不超过 stuck_tolerance 判为卡值（stuck_samples
+    为0时不检测，默认关闭：湿度、pH、土壤 ADC 等读数本来就可能长时间不变；
+    停在量程上下限的读数，如饱和在100%的相对湿度，也不判为卡值）；
+    相对上一个正常样本每秒变化超过 max_rate 判为变化率异常。
+    所有状态都是按通道排列的定长数组，一批样本一次向量化检查，
+    内存占用只与通道数和窗口长度有关。
+
+    窗口接收全部有效读数（含被判为尖峰的），中位数对少量尖峰不敏感，
+    而真实的阶跃变化在约 window/2 个样本后会成为新的中位数而不再报警。
+    """
+
+    def __init__(self, channels: Sequence[Hashable] = (), window: int = 15,
+                 mad_threshold: float = 6.0, min_deviation: float = 0.5,
+                 stuck_samples: int = 0, stuck_tolerance: float = 0.0,
+                 max_rate: float = np.inf,
+                 valid_range: Tuple[float, float] = (-np.inf, np.inf),
+                 min_samples: int = 5):
+        if window < 3:
+            raise ValueError("window 至少为3")
+        self.window = window
+        self.mad_threshold = mad_threshold
+        self.min_samples = min(min_samples, window)
+        self.defaults = {
+            'min_deviation': min_deviation,
+            'stuck_samples': stuck_samples,
+            'stuck_tolerance': stuck_tolerance,
+            'max_rate': max_rate,
+            'low': valid_range[0],
+            'high': valid_range[1],
+        }
+        self._index: Dict[Hashable, int] = {}
+        self._names: List[Hashable] = []
+        self._count = 0
+        self._allocate(max(len(channels), 16))
+        if len(channels):
+            self.add_channels(channels)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def channels(self) -> List[Hashable]:
+        return list(self._names)
+
+    @property
+    def rejected(self) -> np.ndarray:
+        """各通道累计被标记的样本数"""
+        return self._rejected[:self._count]
+
+    def add_channels(self, channels: Sequence[Hashable], **limits) -> np.ndarray:
+        """加入新通道（已存在的忽略），limits 可覆盖 defaults 中的各项（如 stuck_samples、low/high）"""
+        new = [channel for channel in dict.fromkeys(channels) if channel not in self._index]
+        if self._count + len(new) > len(self._last):
+            self._allocate(max(2 * len(self._last), self._count + len(new)))
+        start = self._count
+        for offset, channel in enumerate(new):
+            self._index[channel] = start + offset
+            self._names.append(channel)
+        end = start + len(new)
+        for name, default in self.defaults.items():
+            value = limits.get(name)
+            getattr(self, '_' + name)[start:end] = default if value is None else value
+        self._count = end
+        return self.index_of(channels)
+
+    def index_of(self, channels: ChannelSelector) -> np.ndarray:
+        """通道名换算为下标数组；传入整数数组时原样返回"""
+        if isinstance(channels, np.ndarray) and channels.dtype.kind in 'iu':
+            return channels
+        return np.fromiter((self._index[channel] for channel in channels),
+                           dtype=np.intp, count=len(channels))
+
+    def set_limits(self, channels: ChannelSelector, min_deviation: Optional[float] = None,
+                   max_rate: Optional[float] = None,
+                   valid_range: Optional[Tuple[float, float]] = None,
+                   stuck_samples: Optional[int] = None, stuck_tolerance: Optional[float] = None):
+        """设置部分通道的 MAD 下限、最大变化速率（单位/秒）、量程与卡值判定（0 为关闭）"""
+        index = self.index_of(channels)
+        if min_deviation is not None:
+            self._min_deviation[index] = min_deviation
+        if stuck_samples is not None:
+            self._stuck_samples[index] = stuck_samples
+        if stuck_tolerance is not None:
+            self._stuck_tolerance[index] = stuck_tolerance
+        if max_rate is not None:
+            self._max_rate[index] = max_rate
+        if valid_range is not None:
+            self._low[index], self._high[index] = valid_range
+
+    def check(self, channels: ChannelSelector, values: Sequence[float],
+              timestamps: Union[TimestampLike, Sequence[int]] = None) -> np.ndarray:
+        """检查一批样本（通道不可重复）并更新检测状态，返回每个样本的标记位
+
+        timestamps 可以是共用的时间（省略时为当前时间），也可以是与
+        channels 等长的 epoch毫秒数组。
+        """
+        index = self.index_of(channels)
+        values = np.asarray(values, dtype=np.float64)
+        ts = self._timestamps_for(index, timestamps)
+        flags = np.zeros(len(index), dtype=np.uint8)
+        if not len(index):
+            return flags
+
+        invalid = np.isnan(values) | (values < self._low[index]) | (values > self._high[index])
+        valid = ~invalid
+        flags[invalid] |= FLAG_INVALID
+
+        # 尖峰：与滚动中位数的偏差 / (1.4826 * MAD)，MAD 过小时用 min_deviation 兜底
+        window = self._window[index]
+        filled = self._filled[index]
+        median, mad = self._median_mad(window, filled)
+        scale = np.maximum(MAD_SCALE * mad, self._min_deviation[index])
+        with np.errstate(invalid='ignore'):
+            spike = valid & (filled >= self.min_samples) & (
+                np.abs(values - median) > self.mad_threshold * scale)
+        flags[spike] |= FLAG_SPIKE
+
+        # 卡值：连续不变的读数个数；停在量程上下限（传感器饱和）不算卡值
+        with np.errstate(invalid='ignore'):
+            same = np.abs(values - self._last[index]) <= self._stuck_tolerance[index]
+        run = np.where(valid, np.where(same, self._run[index] + 1, 1), 0)
+        self._run[index] = run
+        limit = self._stuck_samples[index]
+        saturated = (values == self._low[index]) | (values == self._high[index])
+        flags[(limit > 0) & (run >= limit) & ~saturated] |= FLAG_STUCK
+
+        # 变化率：相对上一个正常样本，时间越久允许的变化越大
+        last_good_ts = self._last_good_ts[index]
+        dt = (ts - last_good_ts) / 1000.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.abs(values - self._last_good[index]) / dt
+        fast = valid & (last_good_ts > 0) & (dt > 0) & (rate > self._max_rate[index])
+        flags[fast] |= FLAG_RATE
+
+        # 更新状态：有效读数进入窗口，正常样本成为变化率的参考点
+        rows = index[valid]
+        positions = self._position[rows]
+        self._window[rows, positions] = values[valid]
+        self._position[rows] = (positions + 1) % self.window
+        self._filled[rows] = np.minimum(self._filled[rows] + 1, self.window)
+        self._last[rows] = values[valid]
+
+        accepted = flags == FLAG_OK
+        self._last_good[index[accepted]] = values[accepted]
+        self._last_good_ts[index[accepted]] = ts[accepted]
+        self._rejected[index[~accepted]] += 1
+        return flags
+
+    def filter(self, channels: ChannelSelector, values: Sequence[float],
+               timestamps: Union[TimestampLike, Sequence[int]] = None
+               ) -> Tuple[np.ndarray, np.ndarray]:
+        """检查一批样本，返回 (被标记样本置为 NaN 的数值, 标记位)"""
+        flags = self.check(channels, values, timestamps)
+        cleaned = np.array(values, dtype=np.float64)
+        cleaned[flags != FLAG_OK] = np.nan
+        return cleaned, flags
+
+    def check_one(self, channel: Hashable, value: float, timestamp: TimestampLike = None) -> int:
+        """检查单个样本，未知通道自动加入"""
+        if channel not in self._index:
+            self.add_channels([channel])
+        return int(self.check([channel], [value], timestamp)[0])
+
+    @staticmethod
+    def _median_mad(window: np.ndarray, filled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """各行前 filled 个有效值的中位数与 MAD
+
+        按行排序后 NaN 位于行尾，中位数直接按有效个数取位置；
+        对短窗口比 np.nanmedian 的逐行 partition 快得多。
+        """
+        k = np.maximum(filled, 1)[:, None]
+        lower, upper = (k - 1) // 2, k // 2
+
+        def row_median(values):
+            ordered = np.sort(values, axis=1)
+            return (np.take_along_axis(ordered, lower, axis=1)[:, 0]
+                    + np.take_along_axis(ordered, upper, axis=1)[:, 0]) / 2
+
+        median = row_median(window)
+        mad = row_median(np.abs(window - median[:, None]))
+        empty = filled == 0
+        median[empty] = np.nan
+        mad[empty] = np.nan
+        return median, mad
+
+    def _timestamps_for(self, index: np.ndarray, timestamps) -> np.ndarray:
+        if isinstance(timestamps, (np.ndarray, list, tuple)):
+            return np.asarray(timestamps, dtype=np.int64)
+        ts = now_ms() if timestamps is None else to_epoch_ms(timestamps)
+        return np.full(len(index), ts, dtype=np.int64)
+
+    def _allocate(self, capacity: int):
+        count = getattr(self, '_count', 0)
+        arrays = {
+            '_window': ((self.window,), np.float64, np.nan),
+            '_position': ((), np.intp, 0),
+            '_filled': ((), np.int64, 0),
+            '_last': ((), np.float64, np.nan),
+            '_run': ((), np.int64, 0),
+            '_last_good': ((), np.float64, np.nan),
+            '_last_good_ts': ((), np.int64, 0),
+            '_rejected': ((), np.int64, 0),
+            '_min_deviation': ((), np.float64, 0.0),
+            '_stuck_samples': ((), np.int64, 0),
+            '_stuck_tolerance': ((), np.float64, 0.0),
+            '_max_rate': ((), np.float64, np.inf),
+            '_low': ((), np.float64, -np.inf),
+            '_high': ((), np.float64, np.inf),
+        }
+        for name, (shape, dtype, fill) in arrays.items():
+            grown = np.full((capacity,) + shape, fill, dtype=dtype)
+            if count:
+                grown[:count] = getattr(self, name)[:count]
+            setattr(self, name, grown)
@@ -1,2 +1,40 @@
+# agriculture_system/utils/config_loader.py
+import json
+import os
+from typing import Dict, Optional
+
+# 项目根目录下的默认配置
+DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'config', 'default_config.json'
+)
+
+
 class ConfigLoader:
-    pass
\ No newline at end of file
+    """配置加载器：读取默认配置，再用用户配置覆盖"""
+
+    @staticmethod
+    def load_config(config_path: Optional[str] = None) -> Dict:
+        """加载配置，用户配置中的嵌套段落按键合并到默认配置上"""
+        config = ConfigLoader.read_json(DEFAULT_CONFIG_PATH)
+        if config_path:
+            ConfigLoader.merge(config, ConfigLoader.read_json(config_path))
+        return config
+
+    @staticmethod
+    def read_json(path: str) -> Dict:
+        """读取JSON配置文件，忽略以 # 开头的注释行"""
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if not line.lstrip().startswith('#')]
+        return json.loads(''.join(lines)) if lines else {}
+
+    @staticmethod
+    def merge(base: Dict, override: Dict) -> Dict:
+        for key, value in override.items():
+            if isinstance(value, dict) and isinstance(base.get(key), dict):
+                ConfigLoader.merge(base[key], value)
+            else:
+                base[key] = value
+        return base
@@ -0,0 +1,344 @@
+# agriculture_system/utils/http_client.py
+import email.utils
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 连接超时、读取超时（秒）
+DEFAULT_TIMEOUT = (3.05, 10.0)
+# 自动重试的状态码（限流与网关/服务端临时错误）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Retry-After 超过该秒数时不再等待重试，按请求失败处理
+MAX_RETRY_AFTER = 30.0
+
+_DIRECTIVE = re.compile(r'([a-z-]+)\s*(?:=\s*"?(\d+)"?)?')
+
+
+class QuotaExceeded(requests.RequestException):
+    """上游调用配额已用完，请求未发出"""
+
+
+@dataclass
+class CacheEntry:
+    """缓存的响应：过期前为新鲜，stale_until 前可先返回旧值再后台刷新"""
+    data: object
+    fetched_at: float
+    expires_at: float
+    stale_until: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.stale_until
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+def parse_cache_control(header: Optional[str]) -> Dict[str, Optional[int]]:
+    """Cache-Control 解析为 {指令: 秒数或 None}"""
+    if not header:
+        return {}
+    return {
+        name: int(value) if value else None
+        for name, value in _DIRECTIVE.findall(header.lower())
+    }
+
+
+def response_ttl(headers, default_ttl: float, default_stale: float):
+    """根据响应头计算 (新鲜时长, 过期后可用旧值的时长)，不可缓存时返回 None
+
+    优先 Cache-Control 的 s-maxage/max-age（减去 Age），其次 Expires - Date，
+    都没有时使用调用方的默认值；stale-while-revalidate 覆盖默认的旧值时长。
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives:
+        return None
+    stale = directives.get('stale-while-revalidate')
+    stale = default_stale if stale is None else stale
+    if 'no-cache' in directives:
+        return 0.0, stale
+
+    max_age = directives.get('s-maxage', directives.get('max-age'))
+    if max_age is not None:
+        try:
+            age = float(headers.get('Age') or 0)
+        except ValueError:
+            age = 0.0
+        return max(max_age - age, 0.0), stale
+
+    expires = headers.get('Expires')
+    if expires:
+        expires_at = _http_date(expires)
+        if expires_at is None:
+            return 0.0, stale
+        date = _http_date(headers.get('Date')) or time.time()
+        return max(expires_at - date, 0.0), stale
+    return default_ttl, stale
+
+
+def retry_after(headers) -> Optional[float]:
+    """Retry-After 响应头（秒数或 HTTP 日期）换算为需要等待的秒数，没有时返回 None"""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    retry_at = _http_date(value)
+    return None if retry_at is None else max(retry_at - time.time(), 0.0)
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class SingleFlight:
+    """同一个键的并发调用合并为一次：后到的调用等待正在执行的那次并共享其结果或异常"""
+
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self.shared = 0
+        self._calls: Dict[Hashable, 'SingleFlight._Call'] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class CachedHttpClient:
+    """带连接池、重试与 TTL 缓存的 JSON GET 客户端
+
+    所有请求共用一个 requests.Session，同一主机的连接保持 keep-alive。
+    建立连接失败（请求未到达上游）由连接池自动重试；RETRY_STATUSES 与读取
+    超时由 _send() 重试，按 backoff_factor 指数退避并遵循 Retry-After
+    （超过 max_retry_after 秒时不再重试）。
+
+    响应按调用方给出的键缓存，新鲜时长取自响应的缓存头（见 response_ttl）。
+    过期但仍在 stale-while-revalidate 窗口内时立即返回旧值，并在后台
+    线程中带 If-None-Match / If-Modified-Since 重新验证（同一键同时只有
+    一个刷新）；超出窗口才同步请求，同一键的并发请求经 SingleFlight
+    合并为一次上游调用。请求失败时若有旧值则返回旧值。
+    缓存按最近使用淘汰，最多 max_entries 条。
+
+    quota 为带 try_acquire() 的配额对象（如 QuotaTracker），包括重试在内的
+    每次请求发出前都取一次，取不到时停止重试并按请求失败处理（抛出
+    QuotaExceeded 或返回旧值）。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_size: int = 10, retries: int = 3,
+                 backoff_factor: float = 0.5, default_ttl: float = 600.0,
+                 stale_ttl: float = 3600.0, max_entries: int = 1000,
+                 session: Optional[requests.Session] = None, quota=None,
+                 max_retry_after: float = MAX_RETRY_AFTER):
+        self.timeout = timeout
+        self.quota = quota
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_retry_after = max_retry_after
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.session = session or self._build_session(pool_size, retries, backoff_factor)
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'revalidated': 0,
+                      'not_modified': 0, 'errors': 0, 'stale_errors': 0, 'quota_denied': 0,
+                      'refreshes': 0, 'retries': 0}
+        self._cache: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_session(pool_size: int, retries: int, backoff_factor: float) -> requests.Session:
+        # 连接池只重试建立连接失败（不消耗上游配额），其余重试在 _send() 中按次计入配额
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                      backoff_factor=backoff_factor, allowed_methods=frozenset(['GET']),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_json(self, url: str, params: Optional[Dict] = None, key: Hashable = None,
+                 ttl: Optional[float] = None, refresh: bool = False):
+        """GET 并解析 JSON；key 为缓存键（省略时按 url 与参数），ttl 为无缓存头时的新鲜时长
+
+        refresh 为 True 时不论缓存是否新鲜都向上游（条件）请求一次。
+        请求失败且没有可用旧值时抛出 requests.RequestException 或 ValueError。
+        """
+        if key is None:
+            key = (url, tuple(sorted((params or {}).items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and not refresh:
+                self._cache.move_to_end(key)
+                if entry.is_fresh(now):
+                    self.stats['hits'] += 1
+                    return entry.data
+                if entry.is_usable(now):
+                    self.stats['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._revalidate, args=(url, params, key, ttl),
+                                         name='http-revalidate', daemon=True).start()
+                    return entry.data
+            self.stats['refreshes' if refresh else 'misses'] += 1
+        return self._flight.do(key, lambda: self._fetch(url, params, key, ttl, entry))
+
+    @property
+    def coalesced(self) -> int:
+        """因与进行中的相同请求合并而省下的上游调用数"""
+        return self._flight.shared
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """不论是否过期，返回缓存的条目（不发请求）"""
+        with self._lock:
+            return self._cache.get(key)
+
+    def invalidate(self, key: Hashable = None):
+        """删除一个键，省略时清空缓存"""
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def close(self):
+        self.session.close()
+
+    def _revalidate(self, url: str, params: Optional[Dict], key: Hashable, ttl: Optional[float]):
+        try:
+            self._fetch(url, params, key, ttl, self.peek(key))
+            with self._lock:
+                self.stats['revalidated'] += 1
+        except (requests.RequestException, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _fetch(self, url: str, params: Optional[Dict], key: Hashable,
+               ttl: Optional[float], entry: Optional[CacheEntry]):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        try:
+            response = self._send(url, params, headers)
+            if response.status_code == 304 and entry is not None:
+                data = entry.data
+                with self._lock:
+                    self.stats['not_modified'] += 1
+            else:
+                response.raise_for_status()
+                data = response.json()
+        except (requests.RequestException, ValueError):
+            with self._lock:
+                self.stats['errors'] += 1
+                if entry is not None:
+                    self.stats['stale_errors'] += 1
+                    return entry.data
+            raise
+
+        lifetime = response_ttl(response.headers, self.default_ttl if ttl is None else ttl,
+                                self.stale_ttl)
+        if lifetime is None:
+            self.invalidate(key)
+            return data
+        fresh, stale = lifetime
+        now = time.monotonic()
+        stored = CacheEntry(
+            data=data,
+            fetched_at=now,
+            expires_at=now + fresh,
+            stale_until=now + fresh + stale,
+            etag=response.headers.get('ETag') or (entry.etag if entry else None),
+            last_modified=(response.headers.get('Last-Modified')
+                           or (entry.last_modified if entry else None)),
+        )
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return data
+
+    def _send(self, url: str, params: Optional[Dict], headers: Dict) -> requests.Response:
+        """发出 GET 请求，RETRY_STATUSES 与读取超时最多重试 retries 次
+
+        每次尝试前都取一次配额；重试次数用完或 Retry-After 过长时返回最后的响应。
+        """
+        attempt = 0
+        while True:
+            if self.quota is not None and not self.quota.try_acquire():
+                with self._lock:
+                    self.stats['quota_denied'] += 1
+                raise QuotaExceeded(f"上游调用配额已用完: {url}")
+            try:
+                response = self.session.get(url, params=params, headers=headers,
+                                            timeout=self.timeout)
+            except requests.ReadTimeout:
+                if attempt >= self.retries:
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                delay = retry_after(response.headers)
+                if delay is not None and delay > self.max_retry_after:
+                    return response
+                response.close()
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            with self._lock:
+                self.stats['retries'] += 1
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,88 @@
+# agriculture_system/utils/ring_buffer.py
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .time_utils import TimestampLike, now_ms, to_epoch_ms
+
+
+class RingBuffer:
+    """定长时间序列环形缓冲区（float64 数值 + int64 epoch毫秒时间戳）
+
+    每个样本同时写入位置 i 与 i + capacity，任意不超过容量的最新窗口
+    在底层数组中都是连续的，latest()/since() 直接返回只读视图而不复制。
+    追加为 O(1)，写满后覆盖最早的样本，内存占用固定。
+    时间戳应按非递减顺序追加。
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于0")
+        self.capacity = capacity
+        self._values = np.zeros(2 * capacity, dtype=np.float64)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._head = 0  # 下一个写入位置
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_full(self) -> bool:
+        return self._size == self.capacity
+
+    def append(self, value: float, timestamp: TimestampLike = None):
+        """追加一个样本，timestamp 省略时使用当前时间"""
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        head = self._head
+        self._values[head] = self._values[head + self.capacity] = value
+        self._timestamps[head] = self._timestamps[head + self.capacity] = ts
+        self._head = (head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, values: Sequence[float], timestamps: Sequence[int]):
+        """批量追加，timestamps 为 epoch毫秒"""
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if values.shape != timestamps.shape:
+            raise ValueError("数值与时间戳的数量不一致")
+        if len(values) > self.capacity:
+            values, timestamps = values[-self.capacity:], timestamps[-self.capacity:]
+        count = len(values)
+        positions = (self._head + np.arange(count)) % self.capacity
+        for offset in (0, self.capacity):
+            self._values[positions + offset] = values
+            self._timestamps[positions + offset] = timestamps
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def last(self) -> Optional[Tuple[int, float]]:
+        """最新样本 (epoch毫秒, 数值)，缓冲区为空时返回 None"""
+        if not self._size:
+            return None
+        index = self._head - 1 + self.capacity
+        return int(self._timestamps[index]), float(self._values[index])
+
+    def latest(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最近 n 个样本（按时间升序）的 (时间戳, 数值) 只读视图，n 省略时返回全部"""
+        n = self._size if n is None else max(0, min(n, self._size))
+        end = self._head + self.capacity
+        return self._view(self._timestamps, end - n, end), self._view(self._values, end - n, end)
+
+    def since(self, seconds: float, now: TimestampLike = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最近 seconds 秒内（时间戳大于 now - seconds）样本的只读视图"""
+        timestamps, values = self.latest()
+        reference = now_ms() if now is None else to_epoch_ms(now)
+        start = int(np.searchsorted(timestamps, reference - int(seconds * 1000), side='right'))
+        return timestamps[start:], values[start:]
+
+    @staticmethod
+    def _view(array: np.ndarray, start: int, end: int) -> np.ndarray:
+        view = array[start:end]
+        view.flags.writeable = False
+        return view
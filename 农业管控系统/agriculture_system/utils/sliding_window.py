@@ -0,0 +1,107 @@
+# agriculture_system/utils/sliding_window.py
+from collections import deque
+from typing import Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+from .time_utils import TimestampLike, now_ms, to_epoch_ms
+
+HOUR_MS = 3_600_000
+DEFAULT_WINDOWS_MS = (24 * HOUR_MS, 7 * 24 * HOUR_MS)
+
+
+class SlidingExtremes:
+    """时间窗口 (now - window_ms, now] 内的滑动最大/最小值
+
+    两个单调队列分别保存可能成为最大值和最小值的 (时间戳, 数值)：
+    新样本从队尾挤掉被它支配的旧样本，过期样本从队首移出，
+    每个样本至多进出队列各一次，更新与查询均摊 O(1)。
+    时间戳应按非递减顺序到达。
+    """
+
+    __slots__ = ('window_ms', '_max', '_min')
+
+    def __init__(self, window_ms: int):
+        self.window_ms = window_ms
+        self._max = deque()
+        self._min = deque()
+
+    def push(self, timestamp: int, value: float):
+        if value != value:
+            # NaN 无法比较大小，不计入极值
+            return
+        maxq, minq = self._max, self._min
+        while maxq and maxq[-1][1] <= value:
+            maxq.pop()
+        maxq.append((timestamp, value))
+        while minq and minq[-1][1] >= value:
+            minq.pop()
+        minq.append((timestamp, value))
+        self.expire(timestamp)
+
+    def expire(self, now: int):
+        """移出时间戳不晚于 now - window_ms 的样本"""
+        cutoff = now - self.window_ms
+        for queue in (self._max, self._min):
+            while queue and queue[0][0] <= cutoff:
+                queue.popleft()
+
+    @property
+    def maximum(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+    @property
+    def minimum(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+
+class WindowTracker:
+    """多通道、多时间窗口的滑动极值跟踪
+
+    每个通道为每个窗口（默认24小时与7天）维护一组 SlidingExtremes，
+    通道在首次更新时创建，可同时跟踪上千个通道。
+    """
+
+    def __init__(self, windows_ms: Sequence[int] = DEFAULT_WINDOWS_MS):
+        self.windows_ms = tuple(windows_ms)
+        self._channels: Dict[Hashable, Dict[int, SlidingExtremes]] = {}
+
+    @property
+    def channels(self) -> Iterable[Hashable]:
+        return self._channels.keys()
+
+    def update(self, channel: Hashable, value: float, timestamp: TimestampLike = None):
+        """记录一个通道的新样本，timestamp 省略时使用当前时间"""
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        windows = self._channels.get(channel)
+        if windows is None:
+            windows = self._channels[channel] = {
+                window: SlidingExtremes(window) for window in self.windows_ms
+            }
+        for extremes in windows.values():
+            extremes.push(ts, value)
+
+    def update_many(self, channels: Sequence[Hashable], values: Sequence[float],
+                    timestamp: TimestampLike = None):
+        """同一时刻多个通道的样本（如一次硬件轮询的结果）"""
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+        for channel, value in zip(channels, values):
+            self.update(channel, value, ts)
+
+    def extremes(self, channel: Hashable, window_ms: int,
+                 now: TimestampLike = None) -> Tuple[Optional[float], Optional[float]]:
+        """通道在窗口内的 (最小值, 最大值)，窗口内没有样本时为 (None, None)；
+        窗口必须是已跟踪的窗口之一"""
+        if window_ms not in self.windows_ms:
+            raise KeyError(f"未跟踪的时间窗口: {window_ms}ms")
+        windows = self._channels.get(channel)
+        if windows is None:
+            return None, None
+        extremes = windows[window_ms]
+        extremes.expire(now_ms() if now is None else to_epoch_ms(now))
+        return extremes.minimum, extremes.maximum
+
+    def range(self, channel: Hashable, window_ms: int, now: TimestampLike = None) -> float:
+        """通道在窗口内的极差（最大值 - 最小值），窗口内没有样本时为0"""
+        minimum, maximum = self.extremes(channel, window_ms, now)
+        if minimum is None:
+            return 0.0
+        return maximum - minimum
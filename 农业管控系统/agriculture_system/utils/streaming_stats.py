@@ -0,0 +1,262 @@
+# agriculture_system/utils/streaming_stats.py
+import math
+from typing import Dict, Hashable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .time_utils import TimestampLike, now_ms, to_epoch_ms
+
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+
+# 统计窗口：None 为自启动以来的累计统计，其余为按 UTC 对齐的滚动（翻转）窗口
+DEFAULT_STAT_WINDOWS: Dict[str, Optional[int]] = {'total': None, 'hour': HOUR_MS, 'day': DAY_MS}
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+ChannelSelector = Union[Sequence[Hashable], np.ndarray]
+
+
+class ChannelStatistics:
+    """一个统计窗口内 N 个通道的流式统计量
+
+    均值/方差用 Welford 算法，EWMA 按 alpha 指数平滑，分位数用 P² 算法
+    （Jain & Chlamtac 1985）：每个分位数只保存5个标记点，无需保留样本。
+    所有状态都是按通道排列的 NumPy 数组，一次更新对所有参与的通道向量化执行。
+    window_ms 不为 None 时，样本进入新的窗口会先清零该通道的统计量。
+    """
+
+    def __init__(self, capacity: int = 16, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                 alpha: float = 0.1, window_ms: Optional[int] = None):
+        self.quantiles = tuple(quantiles)
+        self.alpha = alpha
+        self.window_ms = window_ms
+        p = np.asarray(self.quantiles, dtype=np.float64)[:, None]
+        # P² 标记点的期望位置增量与初始期望位置（位置从0开始）
+        self._dn = np.hstack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)])
+        self._initial_desired = np.hstack([np.zeros_like(p), 2 * p, 4 * p, 2 + 2 * p, np.full_like(p, 4)])
+        self._capacity = 0
+        self._allocate(capacity)
+
+    def ensure_capacity(self, capacity: int):
+        if capacity > self._capacity:
+            self._allocate(max(capacity, 2 * self._capacity))
+
+    def update(self, index: np.ndarray, values: np.ndarray, timestamp_ms: int):
+        """更新 index 中各通道（不可重复）的统计量，NaN 值被忽略"""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            index, values = index[valid], values[valid]
+        if not len(index):
+            return
+
+        if self.window_ms is not None:
+            window = timestamp_ms - timestamp_ms % self.window_ms
+            expired = index[self.window_start[index] != window]
+            if len(expired):
+                self._reset(expired)
+                self.window_start[expired] = window
+
+        before = self.count[index]
+        count = before + 1
+        self.count[index] = count
+
+        # Welford
+        mean = self.mean[index]
+        delta = values - mean
+        mean = mean + delta / count
+        self.mean[index] = mean
+        self.m2[index] += delta * (values - mean)
+        self.minimum[index] = np.fmin(self.minimum[index], values)
+        self.maximum[index] = np.fmax(self.maximum[index], values)
+
+        ewma = self.ewma[index]
+        self.ewma[index] = np.where(before == 0, values, ewma + self.alpha * (values - ewma))
+
+        warm = before < 5
+        if warm.any():
+            self._p2_warmup(index[warm], values[warm], before[warm])
+        if not warm.all():
+            self._p2_update(index[~warm], values[~warm])
+
+    def snapshot(self, i: int) -> Dict:
+        """第 i 个通道的当前统计量，O(1)"""
+        count = int(self.count[i])
+        if not count:
+            return {'count': 0, 'mean': None, 'variance': None, 'std': None, 'ewma': None,
+                    'min': None, 'max': None,
+                    'quantiles': {q: None for q in self.quantiles},
+                    'window_start': self._window_start_value(i)}
+        variance = float(self.m2[i] / count)
+        return {
+            'count': count,
+            'mean': float(self.mean[i]),
+            'variance': variance,
+            'std': math.sqrt(max(variance, 0.0)),
+            'ewma': float(self.ewma[i]),
+            'min': float(self.minimum[i]),
+            'max': float(self.maximum[i]),
+            'quantiles': self._quantiles(i, count),
+            'window_start': self._window_start_value(i),
+        }
+
+    def _window_start_value(self, i: int) -> Optional[int]:
+        return None if self.window_ms is None else int(self.window_start[i])
+
+    def _quantiles(self, i: int, count: int) -> Dict[float, float]:
+        if count >= 5:
+            return {q: float(self._q[i, k, 2]) for k, q in enumerate(self.quantiles)}
+        # 样本不足5个时标记点就是样本本身，直接取经验分位数
+        samples = np.sort(self._q[i, 0, :count])
+        return {q: float(samples[min(int(q * count), count - 1)]) for q in self.quantiles}
+
+    def _p2_warmup(self, index: np.ndarray, values: np.ndarray, before: np.ndarray):
+        self._q[index, :, before] = values[:, None]
+        full = index[before == 4]
+        if len(full):
+            self._q[full] = np.sort(self._q[full], axis=-1)
+            self._n[full] = np.arange(5, dtype=np.float64)
+            self._desired[full] = self._initial_desired
+
+    def _p2_update(self, index: np.ndarray, values: np.ndarray):
+        q = self._q[index]
+        n = self._n[index]
+        desired = self._desired[index] + self._dn
+        x = np.broadcast_to(values[:, None], q.shape[:2])
+
+        # 落在哪个标记区间，超出两端时更新端点
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        k = np.minimum((q[..., 1:] <= x[..., None]).sum(axis=-1), 3)
+        n += np.arange(5) > k[..., None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in (1, 2, 3):
+                d = desired[..., i] - n[..., i]
+                up = (d >= 1) & (n[..., i + 1] - n[..., i] > 1)
+                down = (d <= -1) & (n[..., i - 1] - n[..., i] < -1)
+                move = up | down
+                if not move.any():
+                    continue
+                s = np.where(up, 1.0, -1.0)
+                qi, qprev, qnext = q[..., i], q[..., i - 1], q[..., i + 1]
+                ni, nprev, nnext = n[..., i], n[..., i - 1], n[..., i + 1]
+                parabolic = qi + s / (nnext - nprev) * (
+                    (ni - nprev + s) * (qnext - qi) / (nnext - ni)
+                    + (nnext - ni - s) * (qi - qprev) / (ni - nprev)
+                )
+                linear = np.where(up, qi + (qnext - qi) / (nnext - ni),
+                                  qi - (qprev - qi) / (nprev - ni))
+                adjusted = np.where((qprev < parabolic) & (parabolic < qnext), parabolic, linear)
+                q[..., i] = np.where(move, adjusted, qi)
+                n[..., i] = np.where(move, ni + s, ni)
+
+        self._q[index] = q
+        self._n[index] = n
+        self._desired[index] = desired
+
+    def _reset(self, index: np.ndarray):
+        self.count[index] = 0
+        self.mean[index] = 0.0
+        self.m2[index] = 0.0
+        self.ewma[index] = 0.0
+        self.minimum[index] = np.nan
+        self.maximum[index] = np.nan
+
+    def _allocate(self, capacity: int):
+        old = self._capacity
+        shapes = {
+            'count': ((), np.int64, 0),
+            'mean': ((), np.float64, 0.0),
+            'm2': ((), np.float64, 0.0),
+            'ewma': ((), np.float64, 0.0),
+            'minimum': ((), np.float64, np.nan),
+            'maximum': ((), np.float64, np.nan),
+            'window_start': ((), np.int64, -1),
+            '_q': ((len(self.quantiles), 5), np.float64, 0.0),
+            '_n': ((len(self.quantiles), 5), np.float64, 0.0),
+            '_desired': ((len(self.quantiles), 5), np.float64, 0.0),
+        }
+        for name, (shape, dtype, fill) in shapes.items():
+            grown = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old:
+                grown[:old] = getattr(self, name)
+            setattr(self, name, grown)
+        self._capacity = capacity
+
+
+class StatisticsEngine:
+    """多通道、多窗口的流式统计引擎
+
+    每个窗口（默认累计、当前小时、当前天）一组 ChannelStatistics，
+    样本到达时增量更新；监控与 Web 接口通过 stats()/snapshot() 以 O(1)
+    读取当前统计量，不再扫描历史数据。
+    """
+
+    def __init__(self, windows: Optional[Dict[str, Optional[int]]] = None,
+                 quantiles: Sequence[float] = DEFAULT_QUANTILES, alpha: float = 0.1):
+        windows = DEFAULT_STAT_WINDOWS if windows is None else windows
+        self.windows = {
+            name: ChannelStatistics(quantiles=quantiles, alpha=alpha, window_ms=window_ms)
+            for name, window_ms in windows.items()
+        }
+        self._index: Dict[Hashable, int] = {}
+        self._names: List[Hashable] = []
+
+    @property
+    def channels(self) -> List[Hashable]:
+        return list(self._names)
+
+    def add_channels(self, channels: Sequence[Hashable]) -> np.ndarray:
+        """加入新通道（已存在的忽略），返回这些通道的下标"""
+        for channel in channels:
+            if channel not in self._index:
+                self._index[channel] = len(self._names)
+                self._names.append(channel)
+        for stats in self.windows.values():
+            stats.ensure_capacity(len(self._names))
+        return self.index_of(channels)
+
+    def index_of(self, channels: ChannelSelector) -> np.ndarray:
+        """通道名换算为下标数组；传入整数数组时原样返回"""
+        if isinstance(channels, np.ndarray) and channels.dtype.kind in 'iu':
+            return channels
+        return np.fromiter((self._index[channel] for channel in channels),
+                           dtype=np.intp, count=len(channels))
+
+    def update(self, channels: ChannelSelector, values: Sequence[float],
+               timestamp: TimestampLike = None):
+        """同一时刻一组通道的新样本；未知的通道名自动加入"""
+        if not (isinstance(channels, np.ndarray) and channels.dtype.kind in 'iu'):
+            unknown = [channel for channel in channels if channel not in self._index]
+            if unknown:
+                self.add_channels(unknown)
+        index = self.index_of(channels)
+        values = np.asarray(values, dtype=np.float64)
+        ts = now_ms() if timestamp is None else to_epoch_ms(timestamp)
+
+        if len(np.unique(index)) != len(index):
+            # 同一通道在一批中出现多次时按顺序逐个更新
+            for i in range(len(index)):
+                self._update_index(index[i:i + 1], values[i:i + 1], ts)
+        else:
+            self._update_index(index, values, ts)
+
+    def update_one(self, channel: Hashable, value: float, timestamp: TimestampLike = None):
+        self.update([channel], [value], timestamp)
+
+    def stats(self, channel: Hashable, window: str = 'total') -> Dict:
+        """通道在指定窗口内的统计量：count/mean/variance/std/ewma/min/max/quantiles"""
+        index = self._index.get(channel)
+        if index is None:
+            return ChannelStatistics(1, self.windows[window].quantiles).snapshot(0)
+        return self.windows[window].snapshot(index)
+
+    def snapshot(self, window: str = 'total') -> Dict[Hashable, Dict]:
+        """所有通道在指定窗口内的统计量"""
+        stats = self.windows[window]
+        return {name: stats.snapshot(i) for i, name in enumerate(self._names)}
+
+    def _update_index(self, index: np.ndarray, values: np.ndarray, ts: int):
+        for stats in self.windows.values():
+            stats.update(index, values, ts)
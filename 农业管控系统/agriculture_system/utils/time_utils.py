@@ -0,0 +1,43 @@
+# agriculture_system/utils/time_utils.py
+import time
+from datetime import datetime
+from typing import Optional, Union
+
+# 小于该值的数字按秒解释，否则按毫秒解释（1e11秒约为公元5138年）
+_EPOCH_MS_THRESHOLD = 1e11
+
+TimestampLike = Union[datetime, int, float, str, None]
+
+
+def now_ms() -> int:
+    """当前时间的epoch毫秒"""
+    return int(time.time() * 1000)
+
+
+def to_epoch_ms(value: TimestampLike) -> Optional[int]:
+    """把datetime、epoch秒/毫秒或ISO时间字符串统一转换为epoch毫秒
+
+    不带时区的datetime按本地时间解释，与 datetime.now() 保持一致。
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(round(value.timestamp() * 1000))
+    if isinstance(value, (int, float)):
+        if abs(value) >= _EPOCH_MS_THRESHOLD:
+            return int(value)
+        return int(round(value * 1000))
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return to_epoch_ms(float(text))
+        except ValueError:
+            return to_epoch_ms(datetime.fromisoformat(text))
+    raise TypeError(f"无法转换为时间戳: {value!r}")
+
+
+def from_epoch_ms(value: Optional[int]) -> Optional[datetime]:
+    """epoch毫秒转换为本地时间的datetime"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1000)
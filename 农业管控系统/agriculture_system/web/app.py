@@ -1,5 +1,5 @@
 # agriculture_system/web/app.py
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 import json
 from datetime import datetime
 
@@ -23,6 +23,52 @@ def create_app(agriculture_system):
         }
         return jsonify(status)
 
+    @app.route('/api/statistics')
+    def get_statistics():
+        """获取温度与各探头的流式统计量（window: total/hour/day）"""
+        system = app.agriculture_system
+        window = request.args.get('window', 'day')
+        if window not in system.temp_monitor.statistics.windows:
+            return jsonify({'error': f'不支持的统计窗口: {window}'}), 400
+
+        probes = system.probe_monitor.statistics
+        return jsonify({
+            'window': window,
+            'temperature': system.temp_monitor.get_temperature_statistics(window),
+            'probes': {str(name): stats for name, stats in probes.snapshot(window).items()}
+        })
+
+    @app.route('/api/alerts')
+    def get_alerts():
+        """最近的报警（limit 默认10，可按 severity/channel 筛选），读取环形缓冲区"""
+        alerts = app.agriculture_system.alert_system.recent.latest(
+            request.args.get('limit', 10, type=int),
+            severity=request.args.get('severity'),
+            channel=request.args.get('channel')
+        )
+        return jsonify(alerts)
+
+    @app.route('/api/alerts/stream')
+    def stream_alerts():
+        """以 Server-Sent Events 推送新报警与解除事件"""
+        sink = app.agriculture_system.alert_stream
+        try:
+            client = sink.subscribe()
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 503
+        return Response(stream_with_context(sink.stream(client)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/api/alerts/reload', methods=['POST'])
+    def reload_alert_rules():
+        """重新加载配置文件中的报警规则"""
+        alert_system = app.agriculture_system.alert_system
+        try:
+            alert_system.reload()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'rules': [rule.name for rule in alert_system.rules]})
+
     @app.route('/api/analyze', methods=['POST'])
     def analyze():
         """执行分析"""
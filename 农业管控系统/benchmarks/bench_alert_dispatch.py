@@ -0,0 +1,97 @@
+# benchmarks/bench_alert_dispatch.py
+"""报警分发基准：评估后同步投递 vs AlertDispatcher 异步分发
+
+各通道读数每周期在阈值两侧交替，每周期都有触发与解除事件；
+webhook 由带人为延迟的本地替身服务器接收。报告每周期评估 + 投递耗时。
+
+用法: python benchmarks/bench_alert_dispatch.py --channels 200 --ticks 20 --latency 0.05
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.core.alert_dispatch import AlertDispatcher, SQLiteSink, WebhookSink  # noqa: E402
+from agriculture_system.core.alert_system import AlertSystem  # noqa: E402
+from agriculture_system.database import AgricultureDatabase  # noqa: E402
+from tests.stand_in_server import StandInServer  # noqa: E402
+
+BASE_MS = 1_700_000_000_000
+CONTROL = {'min_hold_minutes': 0, 'dedup_minutes': 0, 'rate_limits': {}}
+
+
+def run_ticks(alert_system: AlertSystem, channels: int, ticks: int, deliver=None) -> float:
+    names = [f"probe{i}" for i in range(channels)]
+    samples = []
+    for tick in range(ticks):
+        ts = BASE_MS + tick * 60_000
+        alert_system.update_many(names, 'temperature', [40.0 if tick % 2 == 0 else 20.0] * channels, ts)
+        start = time.perf_counter()
+        alerts = alert_system.evaluate(ts)
+        if deliver is not None:
+            deliver(alerts)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def bench_sync(db_path: str, url: str, channels: int, ticks: int) -> float:
+    """旧方式：评估线程内逐条写数据库并 POST webhook"""
+    database = AgricultureDatabase(db_path)
+    sqlite, webhook = SQLiteSink(database), WebhookSink(url)
+    alert_system = AlertSystem({'temperature_high': 35}, control=CONTROL)
+
+    def deliver(alerts):
+        for alert in alerts:
+            event = dict(alert, event='raised', notify=True, epoch_ms=BASE_MS,
+                         key=f"{alert['rule']}:{alert['channel']}")
+            sqlite.deliver([event])
+            webhook.deliver([event])
+
+    try:
+        return run_ticks(alert_system, channels, ticks, deliver)
+    finally:
+        webhook.close()
+
+
+def bench_async(db_path: str, url: str, channels: int, ticks: int):
+    """评估只提交事件，后台线程攒批投递；返回 (每周期耗时, 全部投递完的总耗时)"""
+    database = AgricultureDatabase(db_path)
+    dispatcher = AlertDispatcher([SQLiteSink(database), WebhookSink(url)], max_queue=100000)
+    alert_system = AlertSystem({'temperature_high': 35}, control=CONTROL, dispatcher=dispatcher)
+    start = time.perf_counter()
+    per_tick = run_ticks(alert_system, channels, ticks)
+    dispatcher.flush()
+    drained = time.perf_counter() - start
+    dispatcher.close()
+    return per_tick, drained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=200, help='通道数')
+    parser.add_argument('--ticks', type=int, default=20, help='评估周期数')
+    parser.add_argument('--latency', type=float, default=0.05, help='webhook 每个请求的延迟（秒）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StandInServer(latency=args.latency) as server:
+        url = server.url + '/alerts'
+        sync_ticks = min(args.ticks, 2)
+        sync = bench_sync(os.path.join(tmp, 'sync.db'), url, args.channels, sync_ticks)
+        sync_requests = server.request_count
+        per_tick, drained = bench_async(os.path.join(tmp, 'async.db'), url, args.channels, args.ticks)
+        async_requests = server.request_count - sync_requests
+
+    print(f"{args.channels} 个通道，webhook 延迟 {args.latency * 1000:.0f} ms，每周期评估 + 投递（中位数）")
+    print(f"  同步投递              {sync:>10.1f} ms  ({sync_requests / sync_ticks:.0f} 个请求/周期)")
+    print(f"  AlertDispatcher       {per_tick:>10.1f} ms  ({sync / per_tick:.0f}x)")
+    print(f"  异步全部投递完毕      {drained * 1000:>10.1f} ms  ({args.ticks} 个周期，"
+          f"{async_requests} 个请求)")
+
+
+if __name__ == '__main__':
+    main()
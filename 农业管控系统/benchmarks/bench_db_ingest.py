@@ -0,0 +1,137 @@
+# benchmarks/bench_db_ingest.py
+"""传感器数据写入吞吐基准：每行新建连接 vs 线程长连接 + WAL
+
+用法: python benchmarks/bench_db_ingest.py --rows 2000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.database import AgricultureDatabase  # noqa: E402
+
+
+def make_reading() -> dict:
+    return {
+        'timestamp': datetime.now(),
+        'air_temperature': random.uniform(10, 35),
+        'soil_temperature': random.uniform(10, 30),
+        'air_humidity': random.uniform(30, 90),
+        'soil_humidity': random.uniform(20, 80),
+        'soil_ph': random.uniform(5.5, 7.5),
+        'light_intensity': random.uniform(0, 50000),
+    }
+
+
+def legacy_save_sensor_data(db_path: str, sensor_data: dict):
+    """旧实现：每行 connect/commit/close"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO sensor_data
+        (timestamp, air_temperature, soil_temperature, air_humidity,
+         soil_humidity, soil_ph, light_intensity)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        sensor_data['timestamp'],
+        sensor_data['air_temperature'],
+        sensor_data['soil_temperature'],
+        sensor_data['air_humidity'],
+        sensor_data['soil_humidity'],
+        sensor_data['soil_ph'],
+        sensor_data['light_intensity'],
+    ))
+    conn.commit()
+    conn.close()
+
+
+def bench_legacy(workdir: str, readings: list) -> float:
+    db_path = os.path.join(workdir, 'legacy.db')
+    # 旧结构：单表、默认的 DELETE 日志模式
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE sensor_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+            air_temperature REAL, soil_temperature REAL, air_humidity REAL,
+            soil_humidity REAL, soil_ph REAL, light_intensity REAL
+        )
+    ''')
+    conn.close()
+
+    start = time.perf_counter()
+    for reading in readings:
+        legacy_save_sensor_data(db_path, reading)
+    return len(readings) / (time.perf_counter() - start)
+
+
+def bench_pooled(workdir: str, readings: list, synchronous: str) -> float:
+    db_path = os.path.join(workdir, f'pooled_{synchronous.lower()}.db')
+    db = AgricultureDatabase(db_path, journal_mode='WAL', synchronous=synchronous)
+
+    start = time.perf_counter()
+    for reading in readings:
+        db.save_sensor_data(reading)
+    elapsed = time.perf_counter() - start
+
+    db.close()
+    return len(readings) / elapsed
+
+
+def bench_batched(workdir: str, readings: list, batch_size: int) -> float:
+    db_path = os.path.join(workdir, 'batched.db')
+    db = AgricultureDatabase(db_path, journal_mode='WAL', synchronous='NORMAL')
+
+    start = time.perf_counter()
+    for i in range(0, len(readings), batch_size):
+        db.save_sensor_data_batch(readings[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+
+    db.close()
+    return len(readings) / elapsed
+
+
+def bench_write_behind(workdir: str, readings: list, buffer_rows: int) -> float:
+    db_path = os.path.join(workdir, 'buffered.db')
+    db = AgricultureDatabase(db_path, journal_mode='WAL', synchronous='NORMAL',
+                             buffer_rows=buffer_rows, flush_interval=None)
+
+    start = time.perf_counter()
+    for reading in readings:
+        db.save_sensor_data(reading)
+    db.flush()
+    elapsed = time.perf_counter() - start
+
+    db.close()
+    return len(readings) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000, help='写入行数')
+    args = parser.parse_args()
+
+    readings = [make_reading() for _ in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [
+            ('每行连接 (DELETE, FULL)', bench_legacy(workdir, readings)),
+            ('长连接 (WAL, FULL)', bench_pooled(workdir, readings, 'FULL')),
+            ('长连接 (WAL, NORMAL)', bench_pooled(workdir, readings, 'NORMAL')),
+            ('批量写入 (500行/事务)', bench_batched(workdir, readings, 500)),
+            ('写后缓冲 (200行)', bench_write_behind(workdir, readings, 200)),
+        ]
+
+    baseline = results[0][1]
+    print(f"写入 {args.rows} 行传感器数据")
+    for name, rate in results:
+        print(f"  {name:<24} {rate:>10.0f} 行/秒  ({rate / baseline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
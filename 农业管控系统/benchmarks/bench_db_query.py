@@ -0,0 +1,164 @@
+# benchmarks/bench_db_query.py
+"""历史查询基准：旧结构（DATETIME字符串、无索引）vs 新结构（epoch毫秒 + 覆盖索引）
+
+先按旧结构生成数据，复制一份后由 AgricultureDatabase 原地迁移，再对比
+get_historical_weather(location, 30) 与 get_sensor_statistics(24/720) 的耗时；
+迁移后的统计查询读取分钟/小时/天汇总表。未启用结果缓存的新结构耗时之外，
+另列出缓存命中（重复相同参数的查询）的耗时。
+
+用法: python benchmarks/bench_db_query.py --rows 10000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.database import AgricultureDatabase  # noqa: E402
+
+LOCATIONS = [f"农场{i:03d}" for i in range(200)]
+HISTORY_DAYS = 365
+CHUNK = 100000
+
+
+def build_legacy_database(db_path: str, rows: int):
+    """按旧结构生成一年的传感器与天气数据"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute('''
+        CREATE TABLE sensor_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+            air_temperature REAL, soil_temperature REAL, air_humidity REAL,
+            soil_humidity REAL, soil_ph REAL, light_intensity REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE weather_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+            temperature REAL, humidity REAL, rainfall REAL, wind_speed REAL,
+            location TEXT
+        )
+    ''')
+
+    end = datetime.now()
+    step = timedelta(days=HISTORY_DAYS) / rows
+    start = end - timedelta(days=HISTORY_DAYS)
+    rand = random.random
+
+    for offset in range(0, rows, CHUNK):
+        count = min(CHUNK, rows - offset)
+        stamps = [str(start + step * (offset + i)) for i in range(count)]
+        conn.executemany(
+            "INSERT INTO sensor_data (timestamp, air_temperature, soil_temperature, "
+            "air_humidity, soil_humidity, soil_ph, light_intensity) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((ts, 10 + 25 * rand(), 10 + 20 * rand(), 30 + 60 * rand(),
+              20 + 60 * rand(), 5.5 + 2 * rand(), 50000 * rand()) for ts in stamps)
+        )
+        conn.executemany(
+            "INSERT INTO weather_data (timestamp, temperature, humidity, rainfall, "
+            "wind_speed, location) VALUES (?, ?, ?, ?, ?, ?)",
+            ((ts, 10 + 25 * rand(), 30 + 60 * rand(), 50 * rand(), 15 * rand(),
+              LOCATIONS[i % len(LOCATIONS)]) for i, ts in enumerate(stamps))
+        )
+        conn.commit()
+    conn.close()
+
+
+def legacy_queries(db_path: str, location: str):
+    """旧实现的查询（每次新建连接，字符串比较全表扫描）"""
+    def historical_weather():
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('''
+            SELECT * FROM weather_data
+            WHERE location = ? AND timestamp > ?
+            ORDER BY timestamp DESC
+        ''', (location, datetime.now() - timedelta(days=30))).fetchall()
+        conn.close()
+        return rows
+
+    def sensor_statistics(hours: int):
+        conn = sqlite3.connect(db_path)
+        row = conn.execute('''
+            SELECT AVG(air_temperature), MAX(air_temperature), MIN(air_temperature),
+                   AVG(soil_humidity), AVG(air_humidity)
+            FROM sensor_data WHERE timestamp > ?
+        ''', (datetime.now() - timedelta(hours=hours),)).fetchone()
+        conn.close()
+        return row
+
+    return historical_weather, sensor_statistics
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000, help='每张表的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数')
+    args = parser.parse_args()
+
+    location = LOCATIONS[0]
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        migrated_path = os.path.join(workdir, 'migrated.db')
+
+        start = time.perf_counter()
+        build_legacy_database(legacy_path, args.rows)
+        print(f"生成 {args.rows} 行旧结构数据: {time.perf_counter() - start:.1f}s")
+        shutil.copyfile(legacy_path, migrated_path)
+
+        weather_fn, stats_fn = legacy_queries(legacy_path, location)
+        legacy_weather = timed(weather_fn, args.repeat)
+        legacy_stats = timed(lambda: stats_fn(24), args.repeat)
+        legacy_stats_30d = timed(lambda: stats_fn(24 * 30), args.repeat)
+
+        start = time.perf_counter()
+        db = AgricultureDatabase(migrated_path, cache_ttl=0)
+        print(f"原地迁移到新结构: {time.perf_counter() - start:.1f}s")
+
+        new_weather = timed(lambda: db.get_historical_weather(location, 30), args.repeat)
+        new_stats = timed(lambda: db.get_sensor_statistics(24), args.repeat)
+        new_stats_30d = timed(lambda: db.get_sensor_statistics(24 * 30), args.repeat)
+        db.close()
+
+        db = AgricultureDatabase(migrated_path, cache_ttl=60)
+        queries = [
+            lambda: db.get_historical_weather(location, 30),
+            lambda: db.get_sensor_statistics(24),
+            lambda: db.get_sensor_statistics(24 * 30),
+        ]
+        for query in queries:
+            query()
+        cached_weather, cached_stats, cached_stats_30d = (
+            timed(query, args.repeat) for query in queries
+        )
+        db.close()
+
+    print(f"{'查询':<36}{'旧结构(ms)':>12}{'新结构(ms)':>12}{'加速':>8}{'缓存命中(ms)':>14}")
+    for name, old, new, cached in [
+        ('get_historical_weather(location, 30)', legacy_weather, new_weather, cached_weather),
+        ('get_sensor_statistics(24)', legacy_stats, new_stats, cached_stats),
+        ('get_sensor_statistics(720)', legacy_stats_30d, new_stats_30d, cached_stats_30d),
+    ]:
+        print(f"{name:<36}{old:>12.2f}{new:>12.2f}{old / new:>7.1f}x{cached:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_multichannel.py
+"""多通道监控基准：逐个 TemperatureMonitor vs MultiChannelTemperatureMonitor
+
+每个周期写入全部通道的新读数并做一次阈值检查，报告每周期耗时。
+
+用法: python benchmarks/bench_multichannel.py --channels 10000 --ticks 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.core.multi_channel_monitor import MultiChannelTemperatureMonitor  # noqa: E402
+from agriculture_system.core.temperature_monitor import TemperatureMonitor  # noqa: E402
+from agriculture_system.utils.time_utils import now_ms  # noqa: E402
+
+
+def bench_per_channel(readings: np.ndarray, ticks: int) -> float:
+    """每个通道一个 TemperatureMonitor，逐个写入并检查"""
+    monitors = [TemperatureMonitor(capacity=16) for _ in range(readings.shape[1])]
+    samples = []
+    for tick in range(ticks):
+        row = readings[tick % len(readings)].tolist()
+        timestamp = now_ms()
+        start = time.perf_counter()
+        for monitor, value in zip(monitors, row):
+            monitor.temperature_readings.append(value, timestamp)
+            monitor.check_temperature_alert()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def bench_vectorized(readings: np.ndarray, ticks: int, channels: int) -> float:
+    """批量写入全部通道后一次向量化检查"""
+    monitor = MultiChannelTemperatureMonitor([f"probe{i}" for i in range(channels)])
+    index = np.arange(channels)
+    samples = []
+    for tick in range(ticks):
+        row = readings[tick % len(readings)]
+        start = time.perf_counter()
+        monitor.update(index, row, now_ms())
+        monitor.check_alerts()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=10000, help='通道数')
+    parser.add_argument('--ticks', type=int, default=200, help='检查周期数')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    readings = rng.normal(22, 6, size=(50, args.channels))
+
+    per_channel = bench_per_channel(readings, min(args.ticks, 20))
+    vectorized = bench_vectorized(readings, args.ticks, args.channels)
+
+    print(f"{args.channels} 个通道，每周期写入 + 阈值检查（中位数）")
+    print(f"  逐通道 TemperatureMonitor   {per_channel:>10.3f} ms")
+    print(f"  向量化多通道监控            {vectorized:>10.3f} ms  ({per_channel / vectorized:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_weather_batch.py
+"""多地点天气获取基准：逐个阻塞请求 vs get_weather_for_locations 并发批量获取
+
+本地替身服务器模拟 OpenWeatherMap 并为每个请求加入人为延迟。
+另外模拟多个看板同时请求同一城市，比较单飞合并前后的上游请求数。
+
+用法: python benchmarks/bench_weather_batch.py --locations 40 --latency 0.1 --concurrency 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.core.weather_system import EnhancedWeatherSystem  # noqa: E402
+from tests.stand_in_server import StandInServer, add_openweathermap_routes  # noqa: E402
+
+
+def make_system(url: str, concurrency: int) -> EnhancedWeatherSystem:
+    return EnhancedWeatherSystem('bench', {'base_url': url, 'max_concurrency': concurrency})
+
+
+def bench_sequential(url: str, locations, concurrency: int) -> float:
+    """逐个地点调用 get_real_time_weather（各自冷缓存）"""
+    system = make_system(url, concurrency)
+    start = time.perf_counter()
+    for location in locations:
+        system.get_real_time_weather(location)
+    elapsed = time.perf_counter() - start
+    system.real_weather_service.close()
+    return elapsed
+
+
+def bench_batch(url: str, locations, concurrency: int) -> float:
+    system = make_system(url, concurrency)
+    start = time.perf_counter()
+    system.get_weather_for_locations(locations)
+    elapsed = time.perf_counter() - start
+    system.real_weather_service.close()
+    return elapsed
+
+
+def bench_dashboards(url: str, dashboards: int, concurrency: int) -> int:
+    """dashboards 个线程同时请求同一城市，返回合并掉的请求数"""
+    system = make_system(url, concurrency)
+    barrier = threading.Barrier(dashboards)
+
+    def dashboard():
+        barrier.wait()
+        system.get_real_time_weather('北京')
+
+    threads = [threading.Thread(target=dashboard) for _ in range(dashboards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coalesced = system.real_weather_service.client.coalesced
+    system.real_weather_service.close()
+    return coalesced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=40, help='地点数')
+    parser.add_argument('--latency', type=float, default=0.1, help='替身服务器每个请求的延迟（秒）')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发上限')
+    parser.add_argument('--dashboards', type=int, default=20, help='同时请求同一城市的看板数')
+    args = parser.parse_args()
+
+    locations = [f"县{i}" for i in range(args.locations)]
+    with StandInServer(latency=args.latency) as server:
+        add_openweathermap_routes(server)
+        sequential = bench_sequential(server.url, locations, args.concurrency)
+        before = server.request_count
+        batch = bench_batch(server.url, locations, args.concurrency)
+        batch_requests = server.request_count - before
+        before = server.request_count
+        coalesced = bench_dashboards(server.url, args.dashboards, args.concurrency)
+        dashboard_requests = server.request_count - before
+
+    print(f"{args.locations} 个地点，替身延迟 {args.latency * 1000:.0f} ms，并发上限 {args.concurrency}")
+    print(f"  逐个阻塞请求              {sequential * 1000:>10.1f} ms")
+    print(f"  get_weather_for_locations {batch * 1000:>10.1f} ms  ({sequential / batch:.1f}x，"
+          f"{batch_requests} 个上游请求)")
+    print(f"  {args.dashboards} 个看板同时请求同一城市：{dashboard_requests} 个上游请求（合并 {coalesced} 个）")
+
+
+if __name__ == '__main__':
+    main()
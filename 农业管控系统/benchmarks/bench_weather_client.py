@@ -0,0 +1,73 @@
+# benchmarks/bench_weather_client.py
+"""天气API客户端基准：每次 requests.get vs 连接池 + TTL 缓存的 RealWeatherService
+
+本地替身服务器模拟 OpenWeatherMap（带人为延迟与 Cache-Control），
+对若干城市反复请求实况与预报，报告总耗时与上游请求数。
+
+用法: python benchmarks/bench_weather_client.py --cities 10 --rounds 20 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.core.weather_service import RealWeatherService, parse_current, parse_forecast  # noqa: E402
+from agriculture_system.utils.http_client import CachedHttpClient  # noqa: E402
+from tests.stand_in_server import StandInServer, add_openweathermap_routes  # noqa: E402
+
+
+def legacy_fetch(base_url: str, city: str):
+    """旧实现：每次新建连接，无缓存"""
+    params = {'q': f"{city},CN", 'appid': 'bench', 'units': 'metric', 'lang': 'zh_cn'}
+    current = requests.get(f"{base_url}/weather", params=params, timeout=10)
+    current.raise_for_status()
+    forecast = requests.get(f"{base_url}/forecast", params=params, timeout=10)
+    forecast.raise_for_status()
+    return parse_current(current.json()), parse_forecast(forecast.json(), 3)
+
+
+def run(fetch, cities, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for city in cities:
+            fetch(city)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cities', type=int, default=10, help='城市数')
+    parser.add_argument('--rounds', type=int, default=20, help='每个城市的请求轮数')
+    parser.add_argument('--latency', type=float, default=0.02, help='替身服务器每个请求的延迟（秒）')
+    args = parser.parse_args()
+
+    cities = [f"城市{i}" for i in range(args.cities)]
+    with StandInServer(latency=args.latency) as server:
+        add_openweathermap_routes(server)
+        legacy = run(lambda city: legacy_fetch(server.url, city), cities, args.rounds)
+        legacy_requests = server.request_count
+
+        # 首轮全部未命中缓存，只体现连接复用；其余轮在 max-age 内命中缓存
+        service = RealWeatherService('bench', server.url, CachedHttpClient())
+        pooled = run(lambda city: (service.get_current_weather(city),
+                                   service.get_forecast(city)), cities, 1)
+        cached = run(lambda city: (service.get_current_weather(city),
+                                   service.get_forecast(city)), cities, args.rounds - 1)
+        service_requests = server.request_count - legacy_requests
+        service.close()
+
+    calls = args.cities * args.rounds * 2
+    print(f"{args.cities} 个城市 × {args.rounds} 轮（实况 + 预报），替身延迟 {args.latency * 1000:.0f} ms")
+    print(f"  每次 requests.get        {legacy * 1000:>10.1f} ms  ({legacy_requests} 个上游请求)")
+    print(f"  连接池（首轮）           {pooled * 1000:>10.1f} ms  (每请求 {pooled * 1000 / (2 * args.cities):.2f} ms，"
+          f"旧实现 {legacy * 1000 / calls:.2f} ms)")
+    print(f"  连接池 + 缓存（其余轮）  {cached * 1000:>10.1f} ms  (共 {service_requests} 个上游请求)")
+
+
+if __name__ == '__main__':
+    main()
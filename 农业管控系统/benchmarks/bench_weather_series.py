@@ -0,0 +1,69 @@
+# benchmarks/bench_weather_series.py
+"""多地点长时段预报生成基准：逐日 WeatherData 对象 vs 列式 WeatherSeries
+
+生成 locations × days 条模拟预报并计算各地点平均温度，报告耗时。
+
+用法: python benchmarks/bench_weather_series.py --locations 200 --days 365
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agriculture_system.core.weather_series import WeatherData  # noqa: E402
+from agriculture_system.core.weather_system import WeatherSystem  # noqa: E402
+
+
+def legacy_forecast(days: int):
+    """旧实现：每天一个 dataclass，五次 random.uniform"""
+    current_time = datetime.now()
+    return [
+        WeatherData(
+            temperature=random.uniform(15, 35),
+            humidity=random.uniform(30, 90),
+            rainfall=random.uniform(0, 50),
+            wind_speed=random.uniform(0, 15),
+            timestamp=current_time + timedelta(days=i)
+        )
+        for i in range(days)
+    ]
+
+
+def bench_legacy(locations, days: int) -> float:
+    start = time.perf_counter()
+    for _ in locations:
+        forecast = legacy_forecast(days)
+        sum(weather.temperature for weather in forecast) / days
+    return time.perf_counter() - start
+
+
+def bench_series(locations, days: int) -> float:
+    system = WeatherSystem()
+    start = time.perf_counter()
+    for series in system.get_weather_forecasts(locations, days).values():
+        series.temperature.mean()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=200, help='地点数')
+    parser.add_argument('--days', type=int, default=365, help='预报天数')
+    args = parser.parse_args()
+
+    locations = [f"农场{i}" for i in range(args.locations)]
+    legacy = bench_legacy(locations, args.days)
+    series = bench_series(locations, args.days)
+
+    print(f"{args.locations} 个地点 × {args.days} 天模拟预报 + 平均温度")
+    print(f"  逐日 WeatherData      {legacy * 1000:>10.1f} ms")
+    print(f"  列式 WeatherSeries    {series * 1000:>10.1f} ms  ({legacy / series:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# tests/stand_in_server.py
+import json
+import threading
+import zlib
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# query 为 {参数: 值}（同名参数取第一个），body 为原始请求体
+StandInRequest = namedtuple('StandInRequest', ['method', 'path', 'query', 'headers', 'body'])
+
+# 处理函数返回 (状态码, 响应头, 响应体)，响应体为 bytes 或可 JSON 序列化的对象
+Handler = Callable[[StandInRequest], Tuple[int, Dict[str, str], object]]
+
+
+class StandInServer:
+    """本地 HTTP 替身服务器，在测试与基准中代替 webhook、天气 API 等外部服务
+
+    在后台线程中运行 ThreadingHTTPServer，监听 127.0.0.1 的随机端口。
+    按路径注册处理函数；未注册的路径对 POST 返回 200（webhook 接收端），
+    对其他方法返回 404。latency 为每个请求的人为延迟（秒），
+    fail_next() 让接下来的若干个请求返回错误状态码，用于验证重试逻辑。
+    最近 max_requests 个请求保存在 requests 中。
+    """
+
+    def __init__(self, latency: float = 0.0, max_requests: int = 10000):
+        self.latency = latency
+        self.requests = deque(maxlen=max_requests)
+        self.request_count = 0
+        self._routes: Dict[str, Handler] = {}
+        self._failures = deque()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def route(self, path: str, handler: Handler):
+        self._routes[path] = handler
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("替身服务器尚未启动")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandInServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='stand-in-http', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _respond(self, request: StandInRequest) -> Tuple[int, Dict[str, str], bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests.append(request)
+            self.request_count += 1
+            failure = self._failures.popleft() if self._failures else None
+        if failure is not None:
+            return failure, {}, b''
+
+        handler = self._routes.get(request.path)
+        if handler is not None:
+            status, headers, body = handler(request)
+        elif request.method == 'POST':
+            status, headers, body = 200, {}, {'received': True}
+        else:
+            status, headers, body = 404, {}, {'error': 'not found'}
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            headers = dict(headers, **{'Content-Type': 'application/json; charset=utf-8'})
+        return status, headers, body
+
+    def _handler_class(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # keep-alive 连接上响应头与响应体分开写出，避免 Nagle 与延迟确认叠加的 40ms 停顿
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                request = StandInRequest(
+                    method=self.command,
+                    path=parts.path,
+                    query={k: v[0] for k, v in parse_qs(parts.query).items()},
+                    headers=dict(self.headers),
+                    body=self.rfile.read(length) if length else b'',
+                )
+                status, headers, body = server._respond(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return _Handler
+
+
+def add_openweathermap_routes(server: StandInServer, max_age: int = 600, points: int = 40):
+    """注册模拟 OpenWeatherMap 的 /weather 与 /forecast 接口
+
+    数值由城市名确定性生成；响应带 Cache-Control: max-age 与 ETag，
+    请求携带匹配的 If-None-Match 时返回 304。
+    """
+    def payload(city: str, base_ts: int, offset: int) -> dict:
+        seed = zlib.crc32(city.encode('utf-8')) % 1000
+        return {
+            'dt': base_ts + offset * 3 * 3600,
+            'main': {'temp': 10 + seed % 20 + offset % 8 * 0.5,
+                     'humidity': 40 + seed % 50, 'pressure': 1000 + seed % 30},
+            'weather': [{'description': '多云'}],
+            'wind': {'speed': seed % 10 * 0.8},
+            'rain': {'3h': float(offset % 5 == 0)},
+        }
+
+    def respond(body: object, request: StandInRequest):
+        etag = '"%08x"' % zlib.crc32(json.dumps(body, sort_keys=True).encode('utf-8'))
+        headers = {'Cache-Control': f'max-age={max_age}', 'ETag': etag}
+        if request.headers.get('If-None-Match') == etag:
+            return 304, headers, b''
+        return 200, headers, body
+
+    def current(request: StandInRequest):
+        city = request.query.get('q', '').split(',')[0]
+        base_ts = int(time.time()) // max(max_age, 1) * max(max_age, 1)
+        return respond(payload(city, base_ts, 0), request)
+
+    def forecast(request: StandInRequest):
+        city = request.query.get('q', '').split(',')[0]
+        base_ts = int(time.time()) // 10800 * 10800
+        return respond({'list': [payload(city, base_ts, i) for i in range(points)]}, request)
+
+    server.route('/weather', current)
+    server.route('/forecast', forecast)
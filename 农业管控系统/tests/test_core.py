@@ -0,0 +1,774 @@
+# tests/test_core.py
+import email.utils
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+import requests
+
+from agriculture_system.core.alert_dispatch import AlertDispatcher, SSESink
+from agriculture_system.core.alert_system import AlertSystem
+from agriculture_system.core.humidity_monitor import (
+    HumidityMonitor, MultiChannelHumidityMonitor, dew_point, vapour_pressure_deficit
+)
+from agriculture_system.core.multi_channel_monitor import (
+    STATE_HIGH, STATE_LOW, STATE_NORMAL, MultiChannelMonitor, MultiChannelTemperatureMonitor
+)
+from agriculture_system.core.nowcast import (
+    HOUR_MS, HoltWinters, LocalWeatherForecaster, hour_of_day
+)
+from agriculture_system.core.weather_analytics import WeatherAnalytics
+from agriculture_system.core.weather_scheduler import QuotaTracker, WeatherRefreshScheduler
+from agriculture_system.core.weather_series import SIMULATED_RANGES, WeatherData, WeatherSeries
+from agriculture_system.core.weather_service import RealWeatherService
+from agriculture_system.core.weather_system import WeatherSystem
+from agriculture_system.database.database_manager import AgricultureDatabase
+from agriculture_system.utils.config_loader import ConfigLoader
+from agriculture_system.utils.anomaly_detection import (
+    FLAG_INVALID, FLAG_OK, FLAG_RATE, FLAG_SPIKE, FLAG_STUCK, AnomalyDetector, describe_flags
+)
+from agriculture_system.utils.http_client import (
+    CachedHttpClient, SingleFlight, response_ttl, retry_after
+)
+from agriculture_system.utils.ring_buffer import RingBuffer
+from agriculture_system.utils.sliding_window import WindowTracker
+from agriculture_system.utils.streaming_stats import StatisticsEngine
+from agriculture_system.utils.time_utils import from_epoch_ms, now_ms
+
+from .stand_in_server import StandInServer, add_openweathermap_routes
+
+NOW_MS = 1_760_000_000_000
+MINUTE_MS = 60_000
+HOUR_MINUTES = 60
+
+
+class ScriptedSession:
+    """按顺序返回预设 (状态码, JSON) 响应的会话，最后一个响应重复使用"""
+
+    def __init__(self, *responses):
+        self.responses = responses
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        status, body = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = status
+        response.raw = io.BytesIO(json.dumps(body).encode('utf-8'))
+        if status == 429:
+            response.headers['Retry-After'] = '0'
+        return response
+
+    def close(self):
+        pass
+
+
+CURRENT_WEATHER = {'main': {'temp': 21.5, 'humidity': 60, 'pressure': 1012},
+                   'weather': [{'description': '晴'}], 'wind': {'speed': 2.0}, 'dt': 1_760_000_000}
+
+
+def temperature_alerts(**control):
+    """温度高于30°C报警的系统，control 为 alert_control 配置"""
+    return AlertSystem({'temperature_high': 30}, control=control)
+
+
+def step(system, minute, temperature):
+    """第 minute 分钟写入 greenhouse1 的温度并评估，返回需要通知的报警"""
+    timestamp = NOW_MS + minute * MINUTE_MS
+    system.update('greenhouse1', {'temperature': temperature}, timestamp)
+    return system.evaluate(timestamp)
+
+
+def test_multi_channel_humidity_indicators_match_single_channel():
+    """多通道 (N×T) 的露点、VPD、叶面湿润时长与逐通道单独计算一致"""
+    rng = np.random.default_rng(5)
+    channels = ['zone1', 'zone2', 'zone3']
+    samples = 40
+    start = now_ms() - samples * 10 * MINUTE_MS
+    humidity = rng.uniform(60, 99, size=(len(channels), samples))
+    temperature = rng.uniform(5, 35, size=(len(channels), samples))
+
+    multi = MultiChannelHumidityMonitor(channels, capacity=32)
+    singles = [HumidityMonitor(capacity=32) for _ in channels]
+    for t in range(samples):
+        timestamp = start + t * 10 * MINUTE_MS
+        multi.record(channels, humidity[:, t], temperature[:, t], timestamp)
+        for i, single in enumerate(singles):
+            single.record_air_humidity(humidity[i, t], temperature[i, t], timestamp)
+
+    timestamps, temps, rhs = multi.air_history()
+    assert temps.shape == rhs.shape == (3, 32) and len(timestamps) == 32
+    np.testing.assert_allclose(multi.dew_points(), dew_point(temperature[:, -32:], humidity[:, -32:]))
+    np.testing.assert_allclose(multi.vapour_pressure_deficits(10),
+                               vapour_pressure_deficit(temperature[:, -10:], humidity[:, -10:]))
+    assert multi.leaf_wetness_hours(3).tolist() == pytest.approx(
+        [single.leaf_wetness_hours(3) for single in singles]
+    )
+
+
+def test_multi_channel_humidity_marks_missing_channels_nan():
+    """某次采样未包含的通道在历史中为 NaN，不计入叶面湿润，最新指标为 NaN"""
+    monitor = MultiChannelHumidityMonitor(['a', 'b'])
+    timestamp = now_ms() - 30 * MINUTE_MS
+    monitor.record(['a', 'b'], [95.0, 95.0], [20.0, 20.0], timestamp)
+    monitor.record(['a'], [95.0], [20.0], timestamp + 15 * MINUTE_MS)
+
+    _, _, humidity = monitor.air_history()
+    assert np.isnan(humidity[1, -1])
+    wet = monitor.leaf_wetness_hours(1)
+    assert wet[0] == pytest.approx(0.5, abs=0.01) and wet[1] == pytest.approx(0.25)
+    indicators = monitor.get_humidity_indicators()
+    assert np.isnan(indicators['dew_point'][1]) and not np.isnan(indicators['dew_point'][0])
+
+
+def feed(detector, channel, values, start=NOW_MS):
+    """按分钟依次检查 values，返回各样本的标记位"""
+    return [detector.check_one(channel, value, start + i * MINUTE_MS) for i, value in enumerate(values)]
+
+
+def test_anomaly_detector_flags_spike_but_accepts_step_change():
+    """孤立尖峰被标记且不进入窗口；持续的阶跃在窗口中位数跟上后被接受"""
+    detector = AnomalyDetector(['t'], window=5, min_deviation=0.5)
+    flags = feed(detector, 't', [20.0, 20.1, 19.9, 20.0, 20.1, 35.0, 20.0])
+    assert flags[5] == FLAG_SPIKE and describe_flags(flags[5]) == ['spike']
+    assert flags[6] == FLAG_OK
+
+    flags = feed(detector, 't', [25.0] * 6, start=NOW_MS + 10 * MINUTE_MS)
+    assert flags[:2] == [FLAG_SPIKE] * 2 and set(flags[2:]) == {FLAG_OK}
+    assert detector.rejected.tolist() == [3]
+
+
+def test_anomaly_detector_stuck_detection_is_opt_in():
+    """默认不检测卡值；开启后连续 stuck_samples 个相同读数被标记，读数变化后恢复"""
+    readings = [18.0] * 10 + [18.2]
+    assert set(feed(AnomalyDetector(['t']), 't', readings)) == {FLAG_OK}
+
+    detector = AnomalyDetector(['t'], stuck_samples=5, stuck_tolerance=0.01)
+    flags = feed(detector, 't', readings)
+    assert flags[:4] == [FLAG_OK] * 4
+    assert all(flag == FLAG_STUCK for flag in flags[4:10]) and flags[10] == FLAG_OK
+
+
+def test_anomaly_detector_does_not_flag_saturated_readings_as_stuck():
+    """停在量程上下限的读数（如100%相对湿度）即使开启卡值检测也不标记"""
+    detector = AnomalyDetector(['rh', 'ph'], valid_range=(0.0, 100.0), stuck_samples=5)
+    detector.set_limits(['rh'], min_deviation=10.0)
+    detector.set_limits(['ph'], valid_range=(0.0, 14.0), stuck_samples=0)
+    assert set(feed(detector, 'rh', [100.0] * 20)) == {FLAG_OK}
+    assert set(feed(detector, 'ph', [6.5] * 20)) == {FLAG_OK}
+    assert feed(detector, 'rh', [80.0] * 6, start=NOW_MS + HOUR_MINUTES * MINUTE_MS)[-1] == FLAG_STUCK
+
+
+def test_anomaly_detector_flags_invalid_and_fast_changes():
+    """NaN 与超量程标记为无效；变化速率按距上一个正常样本的时间计算"""
+    detector = AnomalyDetector(['t'], valid_range=(-40.0, 80.0), max_rate=0.05,
+                               min_samples=100)
+    assert feed(detector, 't', [float('nan'), 120.0, 20.0]) == [FLAG_INVALID, FLAG_INVALID, FLAG_OK]
+    assert detector.check_one('t', 26.0, NOW_MS + 3 * MINUTE_MS) == FLAG_RATE
+    assert detector.check_one('t', 26.0, NOW_MS + 10 * MINUTE_MS) == FLAG_OK
+
+    cleaned, flags = detector.filter(['t'], [float('nan')], NOW_MS + 11 * MINUTE_MS)
+    assert np.isnan(cleaned[0]) and flags.tolist() == [FLAG_INVALID]
+
+
+def test_humidity_saturated_at_100_percent_counts_as_leaf_wetness():
+    """相对湿度饱和在100%一小时，读数全部被接受并计入叶面湿润"""
+    monitor = HumidityMonitor()
+    start = now_ms() - HOUR_MINUTES * MINUTE_MS
+    flags = [monitor.record_air_humidity(100.0, 12.0, start + i * MINUTE_MS)
+             for i in range(HOUR_MINUTES)]
+    assert set(flags) == {FLAG_OK}
+    assert monitor.leaf_wetness_hours(24) == pytest.approx(1.0, abs=0.05)
+
+
+def local_noon(day, month=5, year=2026):
+    """本地时间某天中午的 epoch毫秒（分析按本地日期归日）"""
+    return int(time.mktime((year, month, day, 12, 0, 0, 0, 0, -1)) * 1000)
+
+
+def observe_days(analytics, days, location='北京'):
+    """days 为 (日期, 最低温, 最高温, 降雨量)，每天写入早晚两条观测"""
+    for day, low, high, rain in days:
+        analytics.observe(location, local_noon(day) - 6 * 3600_000, low, rain)
+        analytics.observe(location, local_noon(day), high, 0.0)
+
+
+def test_weather_analytics_growing_degree_days():
+    """积温按 (截断后的最高 + 最低)/2 - 基温 逐日累计，当天结束后才计入"""
+    analytics = WeatherAnalytics(base_temperature=10.0, upper_temperature=30.0)
+    observe_days(analytics, [(1, 15.0, 25.0, 0.0), (2, 21.0, 35.0, 0.0),
+                             (3, 2.0, 8.0, 0.0), (4, 20.0, 20.0, 0.0)])
+    report = analytics.analyze('北京')
+    assert report['days'] == 3
+    assert report['growing_degree_days'] == pytest.approx(10.0 + 15.5)
+    assert report['today']['mean_temperature'] == 20.0
+
+
+def test_weather_analytics_rolling_rainfall():
+    """滚动降雨量包含窗口内已结束的各天与当天，缺测的日子按0计"""
+    analytics = WeatherAnalytics()
+    observe_days(analytics, [(day, 15.0, 25.0, 1.0) for day in range(1, 11)])
+    observe_days(analytics, [(12, 15.0, 25.0, 2.0)])
+    report = analytics.analyze('北京')
+    assert report['rainfall_7d'] == pytest.approx(5.0 + 2.0)
+    assert report['rainfall_30d'] == pytest.approx(10.0 + 2.0)
+
+
+def test_weather_analytics_frost_and_heat_streaks():
+    """霜冻/高温连续天数、最长连续天数与热浪次数，缺测一天以上时连续天数清零"""
+    analytics = WeatherAnalytics(frost_threshold=0.0, heat_threshold=35.0, heat_wave_days=3)
+    observe_days(analytics, [(1, -2.0, 5.0, 0.0), (2, -1.0, 6.0, 0.0), (3, 0.0, 8.0, 0.0),
+                             (4, 5.0, 15.0, 0.0), (5, -3.0, 4.0, 0.0),
+                             (6, 20.0, 36.0, 0.0), (7, 22.0, 37.0, 0.0), (8, 22.0, 38.0, 0.0),
+                             (9, 20.0, 30.0, 0.0)])
+    report = analytics.analyze('北京')
+    assert (report['frost_streak'], report['max_frost_streak']) == (0, 3)
+    assert (report['heat_streak'], report['max_heat_streak'], report['heat_waves']) == (3, 3, 1)
+    assert report['heat_wave']
+
+    observe_days(analytics, [(12, 25.0, 36.0, 0.0), (13, 20.0, 25.0, 0.0)])
+    report = analytics.analyze('北京')
+    assert report['heat_streak'] == 1 and report['heat_waves'] == 1
+
+
+def test_weather_analytics_sync_after_location_sync_reads_only_new_rows(tmp_path):
+    """先按地点同步再同步全部地点时，已同步的行不重复计入也不算迟到，之后只读新行"""
+    database = AgricultureDatabase(str(tmp_path / 'agriculture.db'))
+    try:
+        def save(location, day, temperature):
+            database.save_weather_data({'timestamp': local_noon(day), 'temperature': temperature,
+                                        'humidity': 60, 'rainfall': 1.0, 'wind_speed': 2.0},
+                                       location)
+
+        for day in range(1, 6):
+            save('北京', day, 20.0)
+            save('上海', day, 25.0)
+        analytics = WeatherAnalytics(database)
+        assert analytics.sync('北京') == 5
+        assert analytics.sync() == 5
+        assert analytics.sync() == 0
+        reports = analytics.analyze_all()
+        assert reports['北京']['observations'] == 5 and reports['北京']['late_observations'] == 0
+        assert reports['上海']['observations'] == 5
+
+        save('北京', 6, 21.0)
+        save('上海', 6, 26.0)
+        assert analytics.sync('北京') == 1
+        assert analytics.sync() == 1
+        assert analytics.sync('上海') == 0
+        assert all(report['late_observations'] == 0 for report in analytics.analyze_all().values())
+    finally:
+        database.close()
+
+
+def test_alert_hysteresis_keeps_alert_until_reading_leaves_band():
+    """触发后读数落回阈值但仍在回差内时保持报警，越过回差才解除"""
+    system = temperature_alerts(hysteresis={'temperature': 2.0})
+    assert len(step(system, 0, 31.0)) == 1
+    step(system, 1, 29.5)
+    assert len(system.active_alerts()) == 1
+    step(system, 2, 27.5)
+    assert system.active_alerts() == []
+    assert system.counters == {'raised': 1, 'resolved': 1, 'deduplicated': 0}
+
+
+def test_alert_min_hold_delays_resolution():
+    """触发后未满最短保持时间，条件不再满足也不解除"""
+    system = temperature_alerts(min_hold_minutes=10)
+    step(system, 0, 31.0)
+    step(system, 1, 20.0)
+    step(system, 9, 20.0)
+    assert len(system.active_alerts()) == 1
+    step(system, 10, 20.0)
+    assert system.active_alerts() == []
+
+
+def test_alert_dedup_suppresses_repeat_notifications():
+    """去重窗口内反复触发只记录不通知，窗口过后再次通知"""
+    system = temperature_alerts(dedup_minutes=30)
+    assert len(step(system, 0, 31.0)) == 1
+    for minute in range(1, 20, 2):
+        step(system, minute, 20.0)
+        assert step(system, minute + 1, 31.0) == []
+    assert system.counters == {'raised': 11, 'resolved': 10, 'deduplicated': 10}
+    assert len(system.recent) == 1
+
+    step(system, 40, 20.0)
+    assert len(step(system, 41, 31.0)) == 1
+
+
+def test_reload_keeps_rules_when_config_is_invalid(tmp_path):
+    """配置文件写坏时保留原规则并记录错误，修改时间不变时不重试，修复后重新加载"""
+    path = str(tmp_path / 'config.json')
+    rule = {'name': 'frost', 'all': [{'metric': 'temperature', 'op': '<', 'value': 0}]}
+
+    def write(text, mtime):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+
+    write(json.dumps({'alert_rules': [rule]}), 1_000_000)
+    system = AlertSystem.from_config(ConfigLoader.load_config(path), config_path=path)
+    names = [r.name for r in system.rules]
+    assert 'frost' in names
+
+    write('{"alert_rules": [', 1_000_100)
+    assert system.reload_if_changed() is False
+    assert [r.name for r in system.rules] == names
+    assert isinstance(system.last_reload_error, ValueError)
+    assert system.reload_if_changed() is False
+
+    write(json.dumps({'alert_rules': [dict(rule, name='frost_warning')]}), 1_000_200)
+    assert system.reload_if_changed() is True
+    assert 'frost_warning' in [r.name for r in system.rules]
+    assert system.last_reload_error is None
+
+
+def test_sse_stream_receives_resolved_events():
+    """SSE 客户端收到需要通知的报警及其解除事件，去重窗口内的重复触发不推送"""
+    sink = SSESink()
+    client = sink.subscribe()
+    dispatcher = AlertDispatcher([sink], batch_interval=0.01)
+    system = AlertSystem({'temperature_high': 30}, control={'dedup_minutes': 30},
+                         dispatcher=dispatcher)
+    for minute, temperature in enumerate([31.0, 20.0, 31.0, 20.0]):
+        step(system, minute, temperature)
+    assert dispatcher.flush(timeout=5)
+    dispatcher.close(timeout=5)
+
+    events = []
+    while not client.empty():
+        events.append(client.get_nowait()['event'])
+    assert events == ['raised', 'resolved', 'resolved']
+
+
+def test_http_client_charges_quota_for_each_retry():
+    """429 后的每次重试都计入配额，重试成功后返回数据"""
+    quota = QuotaTracker(per_minute=10, per_day=100)
+    session = ScriptedSession((429, {}), (429, {}), (200, CURRENT_WEATHER))
+    client = CachedHttpClient(session=session, quota=quota, backoff_factor=0)
+    assert client.get_json('http://weather.test/weather') == CURRENT_WEATHER
+    assert session.calls == 3 and client.stats['retries'] == 2
+    assert quota.remaining()[0] == 7
+
+
+def test_response_ttl_from_cache_headers():
+    """新鲜时长取 max-age 减去 Age，其次 Expires - Date；no-store 不缓存，无缓存头用默认值"""
+    assert response_ttl({'Cache-Control': 'max-age=60, stale-while-revalidate=30', 'Age': '10'},
+                        600, 3600) == (50.0, 30)
+    assert response_ttl({'Cache-Control': 's-maxage=20, max-age=60'}, 600, 3600) == (20.0, 3600)
+    date = 1_760_000_000
+    assert response_ttl({'Date': email.utils.formatdate(date, usegmt=True),
+                         'Expires': email.utils.formatdate(date + 120, usegmt=True)},
+                        600, 3600) == (120.0, 3600)
+    assert response_ttl({'Cache-Control': 'no-store'}, 600, 3600) is None
+    assert response_ttl({'Cache-Control': 'no-cache'}, 600, 3600) == (0.0, 3600)
+    assert response_ttl({}, 600, 3600) == (600, 3600)
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    """Retry-After 可以是秒数或 HTTP 日期，无法解析时返回 None"""
+    assert retry_after({'Retry-After': '5'}) == 5.0
+    assert retry_after({'Retry-After': email.utils.formatdate(time.time() + 20, usegmt=True)}) \
+        == pytest.approx(20, abs=2)
+    assert retry_after({'Retry-After': 'soon'}) is None and retry_after({}) is None
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+def test_http_client_serves_stale_while_single_background_refresh_runs():
+    """过期但在 stale-while-revalidate 窗口内时立即返回旧值，同一键只有一个后台刷新"""
+    release = threading.Event()
+
+    def weather(request):
+        if server.request_count > 1:
+            release.wait(5)
+        return 200, {'Cache-Control': 'max-age=0, stale-while-revalidate=60'}, \
+            {'n': server.request_count}
+
+    with StandInServer() as server:
+        server.route('/weather', weather)
+        client = CachedHttpClient(backoff_factor=0)
+        url = server.url + '/weather'
+        assert client.get_json(url) == {'n': 1}
+        assert [client.get_json(url) for _ in range(5)] == [{'n': 1}] * 5
+        wait_for(lambda: server.request_count == 2)
+        assert client.stats['stale_hits'] == 5
+
+        release.set()
+        wait_for(lambda: client.stats['revalidated'] == 1)
+        assert server.request_count == 2
+        assert client.peek((url, ())).data == {'n': 2}
+        client.close()
+
+
+def test_http_client_revalidates_with_etag_and_keeps_data_on_304():
+    """强制刷新时带 If-None-Match 发出条件请求，304 时沿用缓存的数据并重新计算有效期"""
+    with StandInServer() as server:
+        add_openweathermap_routes(server, max_age=600)
+        client = CachedHttpClient(backoff_factor=0)
+        url = server.url + '/weather'
+        first = client.get_json(url, {'q': '北京,CN'})
+        assert client.get_json(url, {'q': '北京,CN'}) == first
+        assert server.request_count == 1 and client.stats['hits'] == 1
+
+        assert client.get_json(url, {'q': '北京,CN'}, refresh=True) == first
+        assert server.request_count == 2 and client.stats['not_modified'] == 1
+        assert server.requests[-1].headers['If-None-Match'] == client.peek(
+            (url, (('q', '北京,CN'),))).etag
+        client.close()
+
+
+def test_http_client_honours_retry_after():
+    """按 Retry-After 等待后重试；要求等待超过 max_retry_after 时不重试，直接按失败处理"""
+    delays = iter(['0', '120'])
+
+    def flaky(request):
+        if server.request_count == 1:
+            return 503, {'Retry-After': next(delays)}, {}
+        if server.request_count == 3:
+            return 429, {'Retry-After': next(delays)}, {}
+        return 200, {}, {'ok': True}
+
+    with StandInServer() as server:
+        server.route('/weather', flaky)
+        client = CachedHttpClient(backoff_factor=0, max_retry_after=30)
+        assert client.get_json(server.url + '/weather', key='a') == {'ok': True}
+        assert server.request_count == 2 and client.stats['retries'] == 1
+
+        with pytest.raises(requests.HTTPError):
+            client.get_json(server.url + '/weather', key='b')
+        assert server.request_count == 3 and client.stats['retries'] == 1
+        client.close()
+
+
+def test_single_flight_coalesces_concurrent_cold_requests():
+    """同一键的并发冷请求只发出一次上游调用，其余调用共享结果"""
+    release = threading.Event()
+
+    def slow(request):
+        release.wait(5)
+        return 200, {}, {'temp': 21.5}
+
+    with StandInServer() as server:
+        server.route('/weather', slow)
+        client = CachedHttpClient(backoff_factor=0)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            client.get_json(server.url + '/weather'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: server.request_count == 1 and client.coalesced == 7)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert results == [{'temp': 21.5}] * 8
+        assert server.request_count == 1
+        client.close()
+
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('k', lambda: int('x'))
+    assert flight.do('k', lambda: 1) == 1
+
+
+def test_weather_scheduler_degrades_to_database_when_rate_limited(tmp_path):
+    """持续 429 时重试在配额用完后停止，调度器退回数据库中的最近记录"""
+    database = AgricultureDatabase(str(tmp_path / 'agriculture.db'))
+    try:
+        database.save_weather_data({'temperature': 18.0, 'humidity': 70, 'rainfall': 0,
+                                    'wind_speed': 3.0}, '北京')
+        quota = QuotaTracker(per_minute=2, per_day=100)
+        session = ScriptedSession((429, {}))
+        client = CachedHttpClient(session=session, quota=quota, retries=5, backoff_factor=0)
+        scheduler = WeatherRefreshScheduler(RealWeatherService('key', client=client), quota, database)
+
+        weather = scheduler.get_weather('北京')
+        assert weather['stale'] and weather['temperature'] == 18.0
+        assert session.calls == 2 and client.stats['quota_denied'] == 1
+        assert scheduler.stats['degraded_database'] == 1
+    finally:
+        database.close()
+
+
+def test_ring_buffer_wraps_around_and_returns_latest_in_order():
+    """写满后覆盖最早的样本，latest() 按时间升序返回连续的只读视图"""
+    buffer = RingBuffer(5)
+    for i in range(8):
+        buffer.append(float(i), NOW_MS + i * MINUTE_MS)
+    timestamps, values = buffer.latest()
+    assert values.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0] and buffer.is_full
+    assert timestamps.tolist() == [NOW_MS + i * MINUTE_MS for i in range(3, 8)]
+    assert buffer.latest(2)[1].tolist() == [6.0, 7.0] and buffer.latest(0)[1].tolist() == []
+    assert buffer.last() == (NOW_MS + 7 * MINUTE_MS, 7.0)
+    with pytest.raises(ValueError):
+        values[0] = 1.0
+
+    buffer.extend([10.0 + i for i in range(7)], [NOW_MS + (10 + i) * MINUTE_MS for i in range(7)])
+    assert buffer.latest()[1].tolist() == [12.0, 13.0, 14.0, 15.0, 16.0]
+    buffer.append(17.0, NOW_MS + 17 * MINUTE_MS)
+    assert buffer.latest(3)[1].tolist() == [15.0, 16.0, 17.0]
+
+    with pytest.raises(ValueError):
+        buffer.extend([1.0, 2.0], [NOW_MS])
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_ring_buffer_since_selects_samples_newer_than_cutoff():
+    """since() 返回时间戳大于 now - seconds 的样本，跨越回绕位置时结果仍连续"""
+    buffer = RingBuffer(4)
+    for i in range(6):
+        buffer.append(float(i), NOW_MS + i * MINUTE_MS)
+    now = NOW_MS + 5 * MINUTE_MS
+    assert buffer.since(120, now)[1].tolist() == [4.0, 5.0]
+    assert buffer.since(121, now)[1].tolist() == [3.0, 4.0, 5.0]
+    assert buffer.since(3600, now)[1].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.since(60, now + 10 * MINUTE_MS)[1].tolist() == []
+    assert RingBuffer(3).last() is None
+
+
+def test_window_tracker_expires_samples_outside_window():
+    """窗口内的极值随样本过期更新，与逐个扫描窗口内样本的结果一致"""
+    rng = np.random.default_rng(11)
+    window_ms = 60 * MINUTE_MS
+    tracker = WindowTracker([window_ms, 10 * MINUTE_MS])
+    samples = []
+    ts = NOW_MS
+    for value in rng.normal(20, 5, size=300):
+        ts += int(rng.integers(1, 5)) * MINUTE_MS
+        tracker.update('zone1', float(value), ts)
+        samples.append((ts, float(value)))
+        window = [v for t, v in samples if t > ts - window_ms]
+        assert tracker.extremes('zone1', window_ms, ts) == (min(window), max(window))
+
+    # 查询时刻晚于最新样本时，过期的样本同样移出
+    assert tracker.extremes('zone1', 10 * MINUTE_MS, ts + 10 * MINUTE_MS) == (None, None)
+    assert tracker.range('zone1', 10 * MINUTE_MS, ts + 10 * MINUTE_MS) == 0.0
+    assert tracker.extremes('zone2', window_ms) == (None, None)
+    with pytest.raises(KeyError):
+        tracker.extremes('zone1', 5 * MINUTE_MS)
+
+
+def test_window_tracker_ignores_nan_and_tracks_channels_independently():
+    """NaN 不计入极值，各通道的窗口互不影响"""
+    tracker = WindowTracker([60 * MINUTE_MS])
+    tracker.update_many(['a', 'b'], [10.0, 30.0], NOW_MS)
+    tracker.update_many(['a', 'b'], [float('nan'), 25.0], NOW_MS + MINUTE_MS)
+    now = NOW_MS + 2 * MINUTE_MS
+    assert tracker.extremes('a', 60 * MINUTE_MS, now) == (10.0, 10.0)
+    assert tracker.range('b', 60 * MINUTE_MS, now) == 5.0
+    assert sorted(tracker.channels) == ['a', 'b']
+
+
+def test_multi_channel_monitor_reports_raised_and_cleared_channels():
+    """状态变化时才出现在 raised/cleared 中，持续超限的通道只触发一次"""
+    monitor = MultiChannelMonitor(['a', 'b', 'c'], high_threshold=30.0, low_threshold=5.0)
+    monitor.set_thresholds(['c'], high=40.0)
+
+    monitor.update(['a', 'b', 'c'], [31.0, 2.0, 35.0], NOW_MS)
+    scan = monitor.check_alerts()
+    assert scan.state.tolist() == [STATE_HIGH, STATE_LOW, STATE_NORMAL]
+    assert scan.raised.tolist() == [0, 1] and scan.cleared.tolist() == []
+
+    monitor.update(monitor.index_of(['a', 'b']), [32.0, 10.0], NOW_MS + MINUTE_MS)
+    scan = monitor.check_alerts()
+    assert scan.high.tolist() == [0] and scan.low.tolist() == []
+    assert scan.raised.tolist() == [] and scan.cleared.tolist() == [1]
+    assert monitor.stale_channels(30, NOW_MS + MINUTE_MS).tolist() == [2]
+
+
+def test_multi_channel_monitor_grows_without_losing_state():
+    """通道数超过初始容量时扩容，已有通道的值、阈值与状态保留"""
+    monitor = MultiChannelTemperatureMonitor(['probe0'])
+    monitor.update(['probe0'], [40.0], NOW_MS)
+    monitor.check_alerts()
+    names = [f'probe{i}' for i in range(1, 100)]
+    assert monitor.add_channels(names, high=50.0).tolist() == list(range(1, 100))
+    assert len(monitor) == 100 and monitor.add_channels(['probe0']).tolist() == [0]
+
+    values = np.full(100, 20.0)
+    values[[0, 99]] = [40.0, 55.0]
+    monitor.update_all(values, NOW_MS + MINUTE_MS)
+    scan = monitor.check_alerts()
+    assert scan.high.tolist() == [0, 99] and scan.raised.tolist() == [99]
+    assert monitor.check_temperature_alert() == [
+        'probe0 高温警报！当前温度: 40.0°C', 'probe99 高温警报！当前温度: 55.0°C'
+    ]
+
+
+def test_statistics_engine_matches_exact_moments_and_quantiles():
+    """Welford 均值/方差与精确值一致，EWMA 与逐步平滑一致，P² 分位数误差在容许范围内"""
+    rng = np.random.default_rng(21)
+    samples = rng.normal(20, 4, size=(3, 5000))
+    engine = StatisticsEngine(windows={'total': None}, quantiles=(0.5, 0.9), alpha=0.2)
+    channels = ['a', 'b', 'c']
+    for t in range(samples.shape[1]):
+        engine.update(channels, samples[:, t], NOW_MS + t * 1000)
+
+    for i, channel in enumerate(channels):
+        stats = engine.stats(channel)
+        values = samples[i]
+        assert stats['count'] == 5000
+        assert stats['mean'] == pytest.approx(values.mean())
+        assert stats['variance'] == pytest.approx(values.var())
+        assert (stats['min'], stats['max']) == (values.min(), values.max())
+        ewma = values[0]
+        for value in values[1:]:
+            ewma += 0.2 * (value - ewma)
+        assert stats['ewma'] == pytest.approx(ewma)
+        for q, estimate in stats['quantiles'].items():
+            assert estimate == pytest.approx(np.quantile(values, q), abs=0.25)
+
+
+def test_statistics_engine_resets_rolling_windows_and_ignores_nan():
+    """样本进入新的小时窗口时清零该通道的小时统计，累计统计不受影响；NaN 被忽略"""
+    engine = StatisticsEngine()
+    hour = NOW_MS - NOW_MS % 3_600_000
+    engine.update(['a', 'b'], [10.0, 1.0], hour + MINUTE_MS)
+    engine.update(['a', 'b'], [20.0, float('nan')], hour + 2 * MINUTE_MS)
+    assert engine.stats('a', 'hour')['mean'] == 15.0 and engine.stats('b', 'hour')['count'] == 1
+
+    engine.update_one('a', 40.0, hour + 61 * MINUTE_MS)
+    hourly = engine.stats('a', 'hour')
+    assert (hourly['count'], hourly['mean'], hourly['window_start']) == (1, 40.0, hour + 3_600_000)
+    assert engine.stats('a', 'total')['count'] == 3
+    # b 在新窗口还没有样本，小时统计保留上一窗口的值直到下一个样本到达
+    assert engine.stats('b', 'hour')['window_start'] == hour
+    assert engine.stats('unknown')['count'] == 0
+    assert engine.stats('a', 'total')['quantiles'][0.5] == 20.0
+
+
+def test_weather_for_many_locations_dedups_and_caps_concurrency():
+    """重复的地点只请求一次，同时进行的上游请求不超过 max_concurrency"""
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def current(request):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        city = request.query['q'].split(',')[0]
+        return 200, {}, dict(CURRENT_WEATHER, name=city)
+
+    with StandInServer() as server:
+        server.route('/weather', current)
+        service = RealWeatherService('key', base_url=server.url, max_concurrency=3)
+        cities = ['北京', '上海', '北京', '广州', '深圳', '成都', '上海']
+        weather = service.get_current_weather_many(cities)
+        assert list(weather) == ['北京', '上海', '广州', '深圳', '成都']
+        assert all(data['temperature'] == 21.5 for data in weather.values())
+        assert server.request_count == 5 and 2 <= peak[0] <= 3
+
+        # 缓存命中后不再请求上游
+        assert service.get_current_weather_many(cities) == weather
+        assert server.request_count == 5
+        service.close()
+
+
+def test_weather_series_behaves_like_list_of_weather_data():
+    """迭代、下标、len 与按属性读取与原来的 List[WeatherData] 一致，切片共享内存"""
+    records = [{'timestamp': NOW_MS + i * 3 * 3600_000, 'temperature': 10.0 + i,
+                'humidity': 50.0 + i, 'rainfall': float(i % 2), 'wind_speed': 2.0}
+               for i in range(6)]
+    series = WeatherSeries.from_records(records, '北京')
+    expected = [WeatherData(temperature=r['temperature'], humidity=r['humidity'],
+                            rainfall=r['rainfall'], wind_speed=r['wind_speed'],
+                            timestamp=from_epoch_ms(r['timestamp'])) for r in records]
+    assert list(series) == expected and len(series) == 6
+    assert series[-1] == expected[-1] and isinstance(series[0], WeatherData)
+    assert sum(day.rainfall for day in series) == 3.0
+    assert max(series, key=lambda day: day.temperature).temperature == 15.0
+
+    tail = series[2:]
+    assert isinstance(tail, WeatherSeries) and list(tail) == expected[2:]
+    assert np.shares_memory(tail.temperature, series.temperature)
+    assert [r['temperature'] for r in series.to_records()] == [r['temperature'] for r in records]
+
+
+def test_weather_series_from_forecast_response_and_simulation():
+    """OpenWeatherMap 预报直接解析为列，缺少的风速为 NaN；模拟预报为逐日且在取值范围内"""
+    data = {'list': [{'dt': 1_760_000_000 + i * 10800, 'main': {'temp': 20.0, 'humidity': 60},
+                      'rain': {'3h': 0.5}} for i in range(24)]}
+    series = WeatherSeries.from_openweathermap(data, days=2, location='北京')
+    assert len(series) == 16 and np.isnan(series.wind_speed).all()
+    assert series.rainfall.sum() == 8.0 and series.to_records()[0]['wind_speed'] is None
+
+    forecast = WeatherSystem().get_weather_forecast('北京', 5)
+    assert len(forecast) == 5 and np.all(np.diff(forecast.epoch_ms) == 86_400_000)
+    for day in forecast:
+        low, high = SIMULATED_RANGES['temperature']
+        assert low <= day.temperature <= high
+
+
+def diurnal(hours, mean=20.0, amplitude=6.0, noise=0.0, seed=0):
+    """以24小时为周期的温度曲线（按本地钟点），hours 为 epoch小时数"""
+    phase = 2 * np.pi * hour_of_day(np.asarray(hours)) / 24
+    return mean + amplitude * np.sin(phase) + np.random.default_rng(seed).normal(0, noise, len(hours))
+
+
+def test_holt_winters_needs_two_days_and_tracks_daily_cycle():
+    """不足两天返回 None；拟合后的预测还原日周期，从未观测的变量预测为 NaN，推进后继续准确"""
+    first_hour = NOW_MS // HOUR_MS
+    assert HoltWinters.fit(np.zeros((47, 2)), first_hour) is None
+
+    hours = first_hour + np.arange(10 * 24)
+    values = np.column_stack([diurnal(hours, noise=0.3, seed=2), np.full(len(hours), np.nan)])
+    model = HoltWinters.fit(values[:8 * 24], first_hour)
+    assert model.last_hour == first_hour + 8 * 24 - 1
+
+    truth = diurnal(first_hour + 8 * 24 + np.arange(24))
+    predicted = model.predict(24)
+    assert np.abs(predicted[:, 0] - truth).max() < 1.5
+    assert np.isnan(predicted[:, 1]).all()
+
+    model.advance(values[8 * 24:])
+    assert model.last_hour == hours[-1]
+    truth = diurnal(hours[-1] + 1 + np.arange(24))
+    assert np.abs(model.predict(24)[:, 0] - truth).max() < 1.5
+
+
+def test_local_forecaster_advances_cached_model_and_refits(tmp_path):
+    """历史不足时返回 None；之后的小时只推进缓存的模型，超过 refit_hours 才重新拟合"""
+    database = AgricultureDatabase(str(tmp_path / 'agriculture.db'))
+    try:
+        current_hour = NOW_MS // HOUR_MS
+        hours = np.arange(current_hour - 72, current_hour + 6)
+        temperatures = diurnal(hours)
+        for hour, temperature in zip(hours.tolist(), temperatures.tolist()):
+            database.save_weather_data({'timestamp': hour * HOUR_MS + 60_000,
+                                        'temperature': temperature, 'humidity': 60,
+                                        'rainfall': 0, 'wind_speed': 2.0}, '北京')
+        database.save_weather_data({'timestamp': NOW_MS, 'temperature': 18.0, 'humidity': 60,
+                                    'rainfall': 0, 'wind_speed': 2.0}, '上海')
+
+        forecaster = LocalWeatherForecaster(database, history_days=5, refit_hours=4)
+        now = current_hour * HOUR_MS
+        assert forecaster.forecast('上海', 3, now) is None
+
+        model = forecaster.model('北京', now)
+        assert model is not None and model.last_hour == current_hour - 1
+        assert forecaster.model('北京', now + 30 * 60_000) is model
+        assert forecaster.model('北京', now + 2 * HOUR_MS) is model
+        assert model.last_hour == current_hour + 1
+        assert forecaster.model('北京', now + 5 * HOUR_MS) is not model
+
+        weather = forecaster.nowcast('北京', now + 5 * HOUR_MS)
+        assert weather['temperature'] == pytest.approx(float(diurnal([current_hour + 5])[0]), abs=1.5)
+        assert weather['description'] == '本地预测'
+        daily = forecaster.forecast('北京', 3, now)
+        assert len(daily) == 3 and not np.isnan(daily.temperature).any()
+    finally:
+        database.close()
@@ -0,0 +1,547 @@
+# tests/test_database.py
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from agriculture_system.database.async_writer import AsyncDatabaseWriter
+from agriculture_system.database.columnar_archive import ColumnarArchive
+from agriculture_system.database.connection import ConnectionManager
+from agriculture_system.database.database_manager import AgricultureDatabase
+from agriculture_system.database.gorilla import decode_block, encode_block
+from agriculture_system.database.migrations import (
+    SCHEMA_VERSION, _v1_initial_schema, unparsed_table
+)
+from agriculture_system.database.partitions import month_range
+from agriculture_system.database.result_cache import ResultCache
+from agriculture_system.database.retention import RetentionPolicy
+from agriculture_system.database.rollups import query_rollup_statistics
+from agriculture_system.database.write_buffer import WriteBehindBuffer
+from agriculture_system.utils.time_utils import now_ms
+
+NOW_MS = 1_760_000_123_456
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = AgricultureDatabase(str(tmp_path / 'agriculture.db'))
+    yield db
+    db.close()
+
+
+def sensor_records(days: int, step_ms: int = 421_337, seed: int = 3):
+    """截至 NOW_MS 的 days 天传感器记录，时间点与分钟/小时边界不对齐"""
+    rng = random.Random(seed)
+    return [
+        {'timestamp': NOW_MS - days * DAY_MS + i * step_ms,
+         'air_temperature': rng.uniform(10, 30), 'air_humidity': rng.uniform(40, 90),
+         'soil_humidity': rng.uniform(20, 60)}
+        for i in range(days * DAY_MS // step_ms)
+    ]
+
+
+def assert_matches_raw(stats, records, start_ms, end_ms):
+    values = [r['air_temperature'] for r in records if start_ms <= r['timestamp'] < end_ms]
+    aggregate = stats['air_temperature']
+    assert aggregate.count == len(values)
+    assert aggregate.total == pytest.approx(sum(values))
+    assert aggregate.minimum == min(values)
+    assert aggregate.maximum == max(values)
+
+
+def in_thread(fn):
+    """在新线程中执行 fn 并返回其结果"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_connection_pragmas_and_per_thread_connections(tmp_path):
+    """连接打开时设置 WAL、同步级别与页缓存；同一线程复用长连接，各线程各有一条"""
+    pool = ConnectionManager(str(tmp_path / 'pool.db'), synchronous='normal', cache_size_kb=4096)
+    try:
+        assert pool.pragma('journal_mode') == 'wal'
+        assert pool.pragma('synchronous') == 1
+        assert pool.pragma('cache_size') == -4096
+        conn = pool.connection()
+        assert pool.connection() is conn
+
+        other = in_thread(pool.connection)
+        assert other is not conn and pool.open_connections == 2
+        # 已退出线程的连接在下一个线程取连接时关闭
+        in_thread(pool.connection)
+        assert pool.open_connections == 2
+    finally:
+        pool.close_all()
+    assert pool.open_connections == 0
+
+    with pytest.raises(ValueError):
+        ConnectionManager(str(tmp_path / 'pool.db'), journal_mode='fast')
+
+
+def test_memory_database_is_shared_between_threads():
+    """':memory:' 使用共享缓存，各线程的连接看到同一份数据"""
+    database = AgricultureDatabase(':memory:')
+    try:
+        database.save_sensor_data_batch([{'timestamp': NOW_MS, 'air_temperature': 20.0}])
+        rows = in_thread(lambda: list(database.iter_sensor_data(columns=('air_temperature',))))
+        assert rows == [{'air_temperature': 20.0}]
+    finally:
+        database.close()
+
+
+def test_write_buffer_caps_requeued_rows_on_failure():
+    """写入持续失败时缓冲区不超过 max_rows，丢弃最早的行并计数"""
+    written = []
+    failing = [True]
+
+    def flush_fn(rows):
+        if failing[0]:
+            raise OSError("disk full")
+        written.extend(rows)
+
+    buffer = WriteBehindBuffer(flush_fn, max_rows=3, flush_interval=None)
+    for i in range(10):
+        try:
+            buffer.add((i,))
+        except OSError:
+            pass
+    assert buffer.pending == 3
+    assert buffer.dropped_rows == 7
+
+    failing[0] = False
+    assert buffer.flush() == 3
+    assert written == [(7,), (8,), (9,)]
+
+
+def test_rollup_statistics_match_raw_aggregate(database):
+    """汇总表合并出的统计量与直接聚合原始数据一致（窗口两端不对齐）"""
+    records = sensor_records(10)
+    database.save_sensor_data_batch(records)
+    start_ms, end_ms = NOW_MS - 7 * DAY_MS + 1_812_345, NOW_MS - 1000
+    stats = query_rollup_statistics(database.pool.connection(), database.partitions,
+                                    start_ms, end_ms, ('air_temperature',))
+    assert_matches_raw(stats, records, start_ms, end_ms)
+
+
+def test_nan_measurements_are_stored_as_null(database):
+    """NaN 测量值按缺失处理：存为 NULL，不影响同批其他行与汇总统计"""
+    database.save_sensor_data_batch([
+        {'timestamp': NOW_MS - 1000, 'air_temperature': float('nan'), 'air_humidity': 55.0},
+        {'timestamp': NOW_MS - 500, 'air_temperature': 21.0, 'soil_humidity': np.float64('nan')},
+    ])
+    rows = list(database.iter_sensor_data(columns=('air_temperature', 'air_humidity', 'soil_humidity')))
+    assert rows == [
+        {'air_temperature': None, 'air_humidity': 55.0, 'soil_humidity': None},
+        {'air_temperature': 21.0, 'air_humidity': None, 'soil_humidity': None},
+    ]
+    stats = query_rollup_statistics(database.pool.connection(), database.partitions,
+                                    NOW_MS - HOUR_MS, NOW_MS, ('air_temperature',))
+    assert stats['air_temperature'].count == 1 and stats['air_temperature'].total == 21.0
+
+
+def test_rollup_statistics_beyond_minute_retention(database):
+    """分钟桶被保留策略清理后，超出其保留期的窗口边缘改读原始数据，不少计样本"""
+    records = sensor_records(50)
+    database.save_sensor_data_batch(records)
+    database.apply_retention(now=NOW_MS)
+    start_ms = (NOW_MS - 45 * DAY_MS) // HOUR_MS * HOUR_MS + 1_812_345
+    end_ms = NOW_MS - 1000
+    stats = query_rollup_statistics(database.pool.connection(), database.partitions,
+                                    start_ms, end_ms, ('air_temperature',),
+                                    retained=database.retention.retained_since(NOW_MS))
+    assert_matches_raw(stats, records, start_ms, end_ms)
+
+
+def test_archive_appends_late_rows_to_existing_month(database, tmp_path):
+    """迟到数据重建已归档的月份分区后再次归档，归档文件追加而不是被覆盖"""
+    policy = RetentionPolicy(raw_days=30, archive_dir=str(tmp_path / 'archive'))
+    old_ms = NOW_MS - 120 * DAY_MS
+    database.save_sensor_data_batch(
+        [{'timestamp': old_ms + i * 60_000, 'air_temperature': 20.0} for i in range(10)]
+    )
+    first = database.apply_retention(policy, now=NOW_MS)
+    database.save_sensor_data_batch([{'timestamp': old_ms + 3_600_000, 'air_temperature': 21.0}])
+    second = database.apply_retention(policy, now=NOW_MS)
+
+    assert first['archived'] == second['archived'] and len(first['archived']) == 1
+    with sqlite3.connect(first['archived'][0]) as archive:
+        assert archive.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT id) FROM sensor_data"
+        ).fetchone() == (11, 11)
+
+
+def test_ids_are_unique_across_monthly_partitions(database):
+    """每月的分区各自建表，id 仍由同一序列分配，跨月不重复且按写入顺序递增"""
+    boundary = month_range('202510')[0]
+    for offset in (-2 * HOUR_MS, -HOUR_MS, HOUR_MS, 2 * HOUR_MS):
+        database.save_weather_data({'timestamp': boundary + offset, 'temperature': 15.0,
+                                    'humidity': 60, 'rainfall': 0, 'wind_speed': 1.0}, '北京')
+    database.save_sensor_data_batch(
+        [{'timestamp': boundary + i * HOUR_MS, 'air_temperature': 20.0} for i in (-1, 1)]
+    )
+
+    weather_ids = [row['id'] for row in database.iter_weather_data('北京', columns=('id',))]
+    assert weather_ids == [1, 2, 3, 4]
+    sensor_ids = [row['id'] for row in database.iter_sensor_data(columns=('id',))]
+    assert sensor_ids == [1, 2]
+
+
+def test_cache_drops_entry_computed_during_write():
+    """提交与 update() 之间缓存的结果可能已包含新行，update() 移除它而不是再次合并"""
+    cache = ResultCache(ttl=60)
+    key = ('sensor_statistics', 24)
+    cache.put(key, 'before', cache.version('sensor_statistics'))
+
+    write = cache.begin_write('sensor_statistics')
+    # 写入提交后、update() 之前完成的查询
+    cache.put(('sensor_statistics', 1), 'during', cache.version('sensor_statistics'))
+    merged = []
+    cache.update('sensor_statistics', lambda k, v: merged.append(v) or True, write)
+
+    assert merged == ['before']
+    assert cache.get(key) == 'before'
+    assert cache.get(('sensor_statistics', 1)) is None
+
+
+def test_cached_statistics_consistent_under_concurrent_writes(tmp_path):
+    """多个线程并发写入、且每次提交后立即有查询时，缓存的统计量与重新查询的结果一致"""
+    database = AgricultureDatabase(str(tmp_path / 'agriculture.db'), cache_ttl=60)
+
+    # 每次写入提交后、更新缓存前，让另一个线程完成一次查询并写入缓存
+    update = database.cache.update
+
+    def update_after_concurrent_query(*args):
+        query = threading.Thread(target=database.get_sensor_statistics, args=(24,))
+        query.start()
+        query.join()
+        update(*args)
+
+    database.cache.update = update_after_concurrent_query
+
+    def write(seed):
+        rng = random.Random(seed)
+        for _ in range(10):
+            base = now_ms() - 600_000
+            database.save_sensor_data_batch([
+                {'timestamp': base + rng.randrange(500_000), 'air_temperature': rng.uniform(10, 30)}
+                for _ in range(20)
+            ])
+
+    writers = [threading.Thread(target=write, args=(seed,)) for seed in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    try:
+        cached = database.get_sensor_statistics(24)
+        database.cache.clear()
+        fresh = database.get_sensor_statistics(24)
+        assert cached['sample_count'] == fresh['sample_count'] == 800
+        assert cached['avg_temperature'] == pytest.approx(fresh['avg_temperature'])
+    finally:
+        database.close()
+
+
+def test_migrates_version1_database_to_latest(tmp_path):
+    """版本号之前的旧库（DATETIME 字符串时间戳、单表）打开时升级到最新结构，数据不丢失"""
+    path = str(tmp_path / 'legacy.db')
+    with sqlite3.connect(path) as conn:
+        _v1_initial_schema(conn)
+        conn.executemany(
+            "INSERT INTO sensor_data (timestamp, air_temperature, soil_humidity, air_humidity) "
+            "VALUES (?, ?, ?, ?)",
+            [('2026-01-15T12:00:00', 20.0, 40.0, 60.0), ('2026-02-15 12:00:00', 22.0, 42.0, 62.0),
+             ('15/01/2026 12:00', 21.0, 41.0, 61.0), (None, 23.0, 43.0, 63.0)]
+        )
+        conn.execute(
+            "INSERT INTO weather_data (timestamp, temperature, humidity, rainfall, wind_speed, "
+            "location) VALUES ('2026-02-01T08:00:00', 18.0, 70.0, 1.5, 3.0, '北京')"
+        )
+        conn.execute(
+            "INSERT INTO alert_records (timestamp, alert_type, alert_level, message) "
+            "VALUES ('2026-02-01T08:00:00', 'temperature_high', 'warning', '高温')"
+        )
+
+    database = AgricultureDatabase(path)
+    try:
+        conn = database.pool.connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert database.partitions.partitions(conn, 'sensor_data') == ['202601', '202602']
+
+        rows = list(database.iter_sensor_data(columns=('timestamp', 'air_temperature')))
+        assert [row['air_temperature'] for row in rows] == [20.0, 22.0]
+        assert rows[0]['timestamp'] < rows[1]['timestamp']
+
+        weather = list(database.iter_weather_data('北京'))
+        assert len(weather) == 1 and weather[0]['rainfall'] == 1.5
+
+        # 汇总表由迁移前的原始数据回填
+        count, total = conn.execute(
+            "SELECT SUM(sample_count), SUM(value_sum) FROM sensor_rollup_day "
+            "WHERE metric = 'air_temperature'"
+        ).fetchone()
+        assert (count, total) == (2, 42.0)
+
+        # 时间戳无法解析的行不丢弃，移入隔离表
+        quarantined = conn.execute(
+            f"SELECT timestamp, air_temperature FROM {unparsed_table('sensor_data')} ORDER BY id"
+        ).fetchall()
+        assert quarantined == [(None, 21.0), (None, 23.0)]
+
+        # 迁移保留原有 id，新行的 id 接着旧表分配
+        assert [row['id'] for row in database.iter_sensor_data(columns=('id',))] == [1, 2]
+        march = month_range('202603')[0]
+        database.save_sensor_data_batch([{'timestamp': march, 'air_temperature': 24.0}])
+        assert [row['id'] for row in database.iter_sensor_data(march, columns=('id',))] == [5]
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(alert_records)")}
+        assert {'alert_key', 'resolved_at'} <= columns
+    finally:
+        database.close()
+
+
+def test_gorilla_block_round_trip():
+    """压缩块解码后时间戳与数值（含缺失值、重复值、负数）与编码前完全一致"""
+    rng = random.Random(7)
+    timestamps, values = [], []
+    timestamp = NOW_MS
+    for i in range(500):
+        timestamp += rng.choice([1000, 1000, 1001, 59_999, 3_600_000])
+        timestamps.append(timestamp)
+        values.append(float('nan') if i % 17 == 0 else rng.choice([21.5, -3.25, rng.uniform(-50, 50)]))
+
+    decoded_timestamps, decoded_values = decode_block(encode_block(timestamps, values))
+    assert decoded_timestamps.tolist() == timestamps
+    np.testing.assert_array_equal(decoded_values, np.array(values))
+
+
+def test_gorilla_store_partitions_blocks_by_month(tmp_path):
+    """跨月的数据压缩后按月分区存放、读回与写入一致，保留期满时整月清理"""
+    boundary = month_range('202510')[0]
+    records = [
+        {'timestamp': boundary - 4 * HOUR_MS + i * 420_000, 'air_temperature': 15 + i * 0.1,
+         'soil_humidity': None if i % 5 == 0 else 40.0}
+        for i in range(8 * HOUR_MS // 420_000)
+    ]
+    database = AgricultureDatabase(str(tmp_path / 'agriculture.db'), sensor_storage='gorilla',
+                                   compact_interval=3600)
+    try:
+        database.save_sensor_data_batch(records)
+        conn = database.pool.connection()
+        database.blocks.compact(conn, boundary + 5 * HOUR_MS)
+        assert database.partitions.partitions(conn, 'sensor_blocks') == ['202509', '202510']
+        assert all(conn.execute(f"SELECT COUNT(*) FROM sensor_data_p{key}").fetchone()[0] == 0
+                   for key in database.partitions.partitions(conn, 'sensor_data'))
+
+        columns = ('timestamp', 'air_temperature', 'soil_humidity')
+        rows = list(database.iter_sensor_data(columns=columns))
+        assert [(row['air_temperature'], row['soil_humidity']) for row in rows] == [
+            (r['air_temperature'], r['soil_humidity']) for r in records
+        ]
+
+        result = database.apply_retention(RetentionPolicy(raw_days=5, archive=False),
+                                          now=boundary + 10 * DAY_MS)
+        assert result['blocks_purged'] == 4 * 6
+        assert database.partitions.partitions(conn, 'sensor_blocks') == ['202510']
+        chunks = list(database.iter_sensor_data(columns=('timestamp',), as_arrays=True))
+        assert np.concatenate([chunk['timestamp'] for chunk in chunks]).tolist() == [
+            r['timestamp'] for r in records if r['timestamp'] >= boundary
+        ]
+    finally:
+        database.close()
+
+
+def test_async_writer_flush_waits_for_queued_rows():
+    """flush() 返回时此前提交的行都已写入"""
+    written = []
+    writer = AsyncDatabaseWriter({'sensor_data': written.extend}, batch_rows=10)
+    for i in range(25):
+        writer.submit('sensor_data', (i,))
+    assert writer.flush(timeout=5)
+    assert written == [(i,) for i in range(25)]
+    writer.close(timeout=5)
+    assert writer.metrics()['written'] == 25
+
+
+def test_async_writer_retries_transient_failures():
+    """暂时性失败重试后写入，不产生死信"""
+    written = []
+    failures = [2]
+
+    def write(rows):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        written.extend(rows)
+
+    writer = AsyncDatabaseWriter({'sensor_data': write}, retry_interval=0.01)
+    writer.submit('sensor_data', (1,))
+    assert writer.flush(timeout=5)
+    assert written == [(1,)]
+    metrics = writer.metrics()
+    assert metrics['errors'] == 2 and metrics['dead_letters'] == 0
+    writer.close(timeout=5)
+
+
+def test_async_writer_dead_letters_rows_that_always_fail(tmp_path):
+    """始终写不进的行重试耗尽后转入死信文件，同批的正常行照常写入，刷新屏障放行"""
+    written = []
+
+    def write(rows):
+        if any(row[0] == 'bad' for row in rows):
+            raise sqlite3.InterfaceError("unsupported type")
+        written.extend(rows)
+
+    spill_path = str(tmp_path / 'writes.spill')
+    writer = AsyncDatabaseWriter({'sensor_data': write}, full_policy='spill',
+                                 spill_path=spill_path, retry_interval=0.01, max_retries=2)
+    for row in [(1,), ('bad',), (2,)]:
+        writer.submit('sensor_data', row)
+    assert writer.flush(timeout=5)
+    assert written == [(1,), (2,)]
+    assert writer.metrics()['dead_letters'] == 1
+    with open(spill_path + '.dead', encoding='utf-8') as f:
+        assert json.loads(f.read()) == ['sensor_data', ['bad']]
+
+    writer.submit('sensor_data', (3,))
+    assert writer.flush(timeout=5)
+    assert written[-1] == (3,)
+    writer.close(timeout=5)
+
+
+def test_async_writer_replays_spill_in_batches_until_both_files_drain(tmp_path):
+    """遗留的 .replay 与新的溢出文件都按 batch_rows 分块回放完之后，刷新屏障才放行"""
+    spill_path = str(tmp_path / 'writes.spill')
+    for path, rows in ((spill_path + '.replay', range(0, 7)), (spill_path, range(7, 12))):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(['sensor_data', [i]]) + '\n' for i in rows)
+
+    batches = []
+    writer = AsyncDatabaseWriter({'sensor_data': batches.append}, batch_rows=3,
+                                 full_policy='spill', spill_path=spill_path)
+    assert writer.flush(timeout=5)
+    assert [row[0] for batch in batches for row in batch] == list(range(12))
+    assert max(len(batch) for batch in batches) == 3
+    assert not writer.spill_pending and writer.metrics()['replayed'] == 12
+    writer.close(timeout=5)
+
+
+def test_async_writer_quarantines_only_unreplayed_part_of_corrupt_spill(tmp_path):
+    """损坏行之前已写入的分块不重复写入，也不进入死信文件"""
+    spill_path = str(tmp_path / 'writes.spill')
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        f.write('["sensor_data", [1]]\n["sensor_data", [2]]\nnot json\n["sensor_data", [3]]\n')
+    written = []
+    writer = AsyncDatabaseWriter({'sensor_data': written.extend}, batch_rows=2,
+                                 full_policy='spill', spill_path=spill_path,
+                                 retry_interval=0.01, max_retries=1)
+    assert writer.flush(timeout=5)
+    assert written == [(1,), (2,)]
+    with open(spill_path + '.dead', encoding='utf-8') as f:
+        assert f.read() == 'not json\n["sensor_data", [3]]\n'
+    writer.close(timeout=5)
+
+
+def test_reads_wait_at_most_flush_timeout_for_async_writes(tmp_path):
+    """写入线程被其他连接的写锁阻塞时，流式读取最多等待 flush_timeout 秒后读取已提交的数据"""
+    path = str(tmp_path / 'agriculture.db')
+    database = AgricultureDatabase(path, async_writes=True, flush_timeout=0.2)
+    blocker = sqlite3.connect(path, isolation_level=None)
+    try:
+        blocker.execute('BEGIN IMMEDIATE')
+        database.save_sensor_data({'timestamp': NOW_MS, 'air_temperature': 20.0})
+        started = time.monotonic()
+        assert list(database.iter_sensor_data()) == []
+        assert time.monotonic() - started < 2
+        blocker.execute('ROLLBACK')
+        assert database.flush(timeout=10)
+        assert [row['air_temperature'] for row in database.iter_sensor_data()] == [20.0]
+    finally:
+        blocker.close()
+        database.close()
+
+
+def test_async_writer_releases_barrier_when_spill_file_is_corrupt(tmp_path):
+    """溢出文件损坏导致回放持续失败时，超过重试次数后移入死信并放行刷新屏障"""
+    spill_path = str(tmp_path / 'writes.spill')
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        f.write('not json\n')
+    writer = AsyncDatabaseWriter({'sensor_data': lambda rows: None}, full_policy='spill',
+                                 spill_path=spill_path, retry_interval=0.01, max_retries=1)
+    assert writer.flush(timeout=5)
+    assert not writer.spill_pending
+    assert os.path.exists(spill_path + '.dead')
+    writer.close(timeout=5)
+
+
+def test_iter_sensor_data_streams_chunks_in_time_order(database):
+    """跨月分区按时间升序分块读取 [start, end)，每块不超过 chunk_size 行，只含投影的列"""
+    boundary = month_range('202510')[0]
+    timestamps = [boundary + i * 600_000 for i in range(-30, 30)]
+    shuffled = list(timestamps)
+    random.Random(1).shuffle(shuffled)
+    database.save_sensor_data_batch(
+        [{'timestamp': ts, 'air_temperature': ts % 1000 / 10} for ts in shuffled]
+    )
+    start, end = timestamps[5], timestamps[50]
+
+    chunks = list(database.iter_sensor_data(start, end, columns=('timestamp', 'air_temperature'),
+                                            chunk_size=7, as_arrays=True))
+    assert all(len(chunk['timestamp']) <= 7 for chunk in chunks)
+    assert all(set(chunk) == {'timestamp', 'air_temperature'} for chunk in chunks)
+    read = np.concatenate([chunk['timestamp'] for chunk in chunks])
+    assert read.dtype == np.int64 and read.tolist() == timestamps[5:50]
+
+    rows = list(database.iter_sensor_data(start, end, columns=('soil_ph',), chunk_size=3))
+    assert len(rows) == 45 and set(rows[0]) == {'soil_ph'}
+
+    with pytest.raises(ValueError):
+        next(database.iter_sensor_data(columns=('no_such_column',)))
+    with pytest.raises(ValueError):
+        next(database.iter_sensor_data(chunk_size=0))
+
+
+def test_columnar_archive_exports_complete_days_and_reloads_memory_mapped(database, tmp_path):
+    """只导出已结束的 UTC 日，重新打开后以内存映射读取，与原始数据一致，增量导出只追加新的天"""
+    today = NOW_MS // DAY_MS * DAY_MS
+    records = [r for r in sensor_records(3) if r['timestamp'] >= today - 2 * DAY_MS]
+    database.save_sensor_data_batch(records)
+    for location, offset in (('北京', 0), ('上海', 1)):
+        database.save_weather_data({'timestamp': today - DAY_MS + offset * HOUR_MS,
+                                    'temperature': 18.0 + offset, 'humidity': 60,
+                                    'rainfall': 0, 'wind_speed': 2.0}, location)
+
+    root = str(tmp_path / 'columnar')
+    exported = ColumnarArchive(root).export(database, until=today, chunk_size=100)
+    assert exported == {'sensor_data': 2, 'weather_data': 1}
+
+    archive = ColumnarArchive(root)
+    assert archive.export(database, until=today) == {'sensor_data': 0, 'weather_data': 0}
+    days = list(archive.iter_days('sensor_data', columns=('timestamp', 'air_temperature')))
+    assert [day for day, _ in days] == archive.days('sensor_data') and len(days) == 2
+    assert all(isinstance(arrays['air_temperature'], np.memmap) for _, arrays in days)
+
+    start, end = today - 36 * HOUR_MS, today - 6 * HOUR_MS
+    loaded = archive.load('sensor_data', start, end, columns=('timestamp', 'air_temperature'))
+    expected = [r for r in records if start <= r['timestamp'] < end]
+    assert loaded['timestamp'].tolist() == [r['timestamp'] for r in expected]
+    np.testing.assert_allclose(loaded['air_temperature'], [r['air_temperature'] for r in expected])
+
+    weather = archive.load('weather_data', location='上海', columns=('temperature', 'location'))
+    assert weather['temperature'].tolist() == [19.0] and weather['location'].tolist() == ['上海']
+    with pytest.raises(ValueError):
+        archive.load('sensor_data', columns=('id',))
+
+    assert archive.export(database, until=today + DAY_MS)['sensor_data'] == 1
+    assert len(archive.days('sensor_data')) == 3
@@ -38,7 +38,7 @@ class AgricultureWebInterface:
             """获取天气预报"""
             location = request.args.get('location', '北京')
             forecast = self.agri_system.weather_system.get_weather_forecast(location, 3)
-            return jsonify(forecast)
+            return jsonify(forecast.to_records())
 
         @app.route('/api/crop_recommendation')
         def get_crop_recommendation():
@@ -90,7 +90,7 @@ class AgricultureWebInterface:
         @app.route('/api/alerts')
         def get_alerts():
             """获取报警信息"""
-            alerts = self.agri_system.alert_system.alerts[-10:]  # 最近10条报警
+            alerts = self.agri_system.alert_system.recent.latest(10)  # 最近10条报警
             return jsonify(alerts)
 
 
@@ -6,13 +6,38 @@ from flatbuffers.builder import np
 from 增强系统集成.机器学习模型训练 import EnhancedPestMonitor
 from 增强系统集成.真实传感器硬件接口 import HardwareSensorInterface
 from 增强系统集成.集成真实天气api接口 import EnhancedWeatherSystem
+from agriculture_system.core.temperature_monitor import TEMPERATURE_STUCK_SAMPLES
+from agriculture_system.database import AgricultureDatabase
+from agriculture_system.utils.anomaly_detection import AnomalyDetector, describe_flags
 from typing import Dict, List, Tuple
 
-class AgricultureIntelligentSystem(object):
-    pass
+# 各传感器字段的量程，超出即视为无效读数
+SENSOR_RANGES = {
+    'temperature': (-40.0, 80.0),
+    'humidity': (0.0, 100.0),
+    'soil_moisture': (0.0, 100.0),
+    'ph': (0.0, 14.0),
+}
+
+# 采集字段对应的 sensor_data 表列名
+SENSOR_COLUMNS = {
+    'temperature': 'air_temperature',
+    'humidity': 'air_humidity',
+    'soil_moisture': 'soil_humidity',
+    'ph': 'soil_ph',
+}
 
 
-def AgricultureDatabase(db_path):
+def sensor_record(sensor_data: Dict) -> Dict:
+    """把采集结果的字段名换成 sensor_data 表的列名，供 save_sensor_data 使用"""
+    record = {column: sensor_data[field] for field, column in SENSOR_COLUMNS.items()
+              if field in sensor_data}
+    if 'timestamp' in sensor_data:
+        record['timestamp'] = sensor_data['timestamp']
+    return record
+
+
+class AgricultureIntelligentSystem(object):
     pass
 
 
@@ -28,9 +53,15 @@ class EnhancedAgricultureIntelligentSystem(AgricultureIntelligentSystem):
 
         # 增强的组件
         self.weather_system = EnhancedWeatherSystem(weather_api_key)
-        self.database = AgricultureDatabase(db_path)
+        # 后台线程写库，慢速 fsync 不阻塞传感器采样
+        self.database = AgricultureDatabase(db_path, async_writes=True)
         self.sensor_interface = HardwareSensorInterface()
         self.ml_pest_monitor = EnhancedPestMonitor()
+        self.anomaly_detector = AnomalyDetector(list(SENSOR_RANGES))
+        for channel, valid_range in SENSOR_RANGES.items():
+            self.anomaly_detector.set_limits([channel], valid_range=valid_range)
+        # 湿度、土壤湿度与 pH 可能长时间不变，只对温度检测卡值
+        self.anomaly_detector.set_limits(['temperature'], stuck_samples=TEMPERATURE_STUCK_SAMPLES)
 
         # Web界面
         self.web_interface = AgricultureWebInterface(self)
@@ -70,9 +101,19 @@ class EnhancedAgricultureIntelligentSystem(AgricultureIntelligentSystem):
         if ph_value:
             sensor_data['ph'] = ph_value
 
-        # 保存到数据库
-        if sensor_data:
-            self.database.save_sensor_data(sensor_data)
+        # 尖峰/卡值/超量程的读数不入库，在返回结果中标记原因
+        channels = [channel for channel in SENSOR_RANGES if channel in sensor_data]
+        if channels:
+            flags = self.anomaly_detector.check(channels, [sensor_data[c] for c in channels])
+            for channel, flag in zip(channels, flags):
+                if flag:
+                    sensor_data.pop(channel)
+                    sensor_data.setdefault('anomalies', {})[channel] = describe_flags(int(flag))
+
+        # 至少有一项测量值通过检测时才保存，只剩异常标记时不写入空行
+        record = sensor_record(sensor_data)
+        if any(column in record for column in SENSOR_COLUMNS.values()):
+            self.database.save_sensor_data(record)
 
         return sensor_data
 
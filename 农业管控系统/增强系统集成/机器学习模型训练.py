@@ -92,15 +92,26 @@ class YieldPredictionModel:
         self.model = None
         self.scaler = StandardScaler()
 
-    def prepare_yield_data(self, historical_data: pd.DataFrame) -> tuple:
-        """准备产量预测数据"""
-        features = [
-            'avg_temperature', 'total_rainfall', 'sunlight_hours',
-            'soil_ph', 'fertilizer_amount', 'pest_incidence'
-        ]
-
-        X = historical_data[features]
-        y = historical_data['yield']
+    features = [
+        'avg_temperature', 'total_rainfall', 'sunlight_hours',
+        'soil_ph', 'fertilizer_amount', 'pest_incidence'
+    ]
+
+    def prepare_yield_data(self, historical_data) -> tuple:
+        """准备产量预测数据
+
+        historical_data 可以是 DataFrame，也可以是 {列名: 数组} 的列式数据
+        （如 ColumnarArchive.load 的结果），后者直接拼接为特征矩阵，不经过 pandas。
+        """
+        if isinstance(historical_data, pd.DataFrame):
+            X = historical_data[self.features]
+            y = historical_data['yield']
+        else:
+            X = np.column_stack([
+                np.asarray(historical_data[feature], dtype=np.float64)
+                for feature in self.features
+            ])
+            y = np.asarray(historical_data['yield'], dtype=np.float64)
 
         # 标准化特征
         X_scaled = self.scaler.fit_transform(X)
@@ -129,7 +140,7 @@ class YieldPredictionModel:
             'train_score': train_score,
             'test_score': test_score,
             'feature_importance': dict(zip(
-                historical_data.columns[:-1],  # 排除目标变量
+                self.features,
                 self.model.feature_importances_
             ))
         }
@@ -3,7 +3,7 @@ from random import random
 
 import serial
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 import RPi.GPIO as GPIO  # 树莓派GPIO控制
 
 from agriculture_system.core.humidity_monitor import HumidityMonitor
@@ -51,6 +51,24 @@ class HardwareSensorInterface:
             print(f"读取温湿度传感器失败: {e}")
             return None
 
+    def read_probe_batch(self) -> Tuple[List[str], List[float], List[float]]:
+        """读取串口缓冲区中的全部多探头数据行（格式: 探头编号,温度,湿度）
+
+        返回 (探头编号, 温度, 湿度) 三个等长列表，
+        供 MultiChannelTemperatureMonitor.update 一次性批量写入。
+        """
+        channels, temperatures, humidities = [], [], []
+        try:
+            while self.serial_connection and self.serial_connection.in_waiting:
+                parts = self.serial_connection.readline().decode().strip().split(',')
+                if len(parts) >= 3:
+                    channels.append(parts[0])
+                    temperatures.append(float(parts[1]))
+                    humidities.append(float(parts[2]))
+        except Exception as e:
+            print(f"读取多探头数据失败: {e}")
+        return channels, temperatures, humidities
+
     def read_soil_moisture(self, analog_pin: int = 0) -> Optional[float]:
         """读取土壤湿度传感器数据"""
         try:
@@ -82,11 +100,17 @@ class EnhancedHumidityMonitor(HumidityMonitor):
         """从真实传感器读取空气湿度"""
         if self.sensor_interface:
             data = self.sensor_interface.read_dht22_temperature_humidity()
-            return data['humidity'] if data else None
+            if not data:
+                return None
+            self.record_air_humidity(data['humidity'], data.get('temperature'))
+            return data['humidity']
         return None
 
     def read_real_soil_humidity(self) -> Optional[float]:
         """从真实传感器读取土壤湿度"""
         if self.sensor_interface:
-            return self.sensor_interface.read_soil_moisture()
+            humidity = self.sensor_interface.read_soil_moisture()
+            if humidity is not None:
+                self.record_soil_humidity(humidity)
+            return humidity
         return None
\ No newline at end of file